@@ -5,10 +5,12 @@ import uuid
 # Debug timestamp: 2026-01-27 14:33 - Force reload
 import smtplib
 import secrets
+import hmac
 import base64
 import time
+import marshal
 from datetime import datetime, timedelta, timezone
-from flask import Flask, render_template, request, redirect, url_for, jsonify, send_from_directory, send_file, flash
+from flask import Flask, render_template, request, redirect, url_for, jsonify, send_from_directory, send_file, flash, has_request_context
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -40,18 +42,46 @@ USE_DATABASE = os.environ.get('USE_DATABASE', 'false').lower() == 'true'
 if USE_DATABASE:
     # Import database helpers to override JSON functions
     from database_helpers import (
-        load_users, save_users, load_data, save_data, save_client,
-        load_suppliers, save_suppliers, load_quotes, save_quotes,
-        load_messages, save_messages, load_events, save_events,
+        load_users, save_users, load_data, save_data, save_client, patch_task,
+        load_client, load_clients_by_ids, load_client_summaries, load_client_access_index, query_tasks,
+        load_client_view,
+        load_suppliers, save_suppliers, save_supplier, load_quotes, save_quotes,
+        load_messages, save_messages, save_message, load_events, save_events, save_event,
+        load_suppliers_page, load_quotes_page, load_archived_clients_page, load_conversation_page,
         load_equipment_bank, save_equipment_bank,
         load_checklist_templates, save_checklist_templates,
         load_forms, save_forms, delete_user_record,
-        load_time_tracking, save_time_tracking
+        load_time_tracking, save_time_tracking, get_time_entry, query_time_entries,
+        add_entry, update_entry, delete_entry,
+        load_active_sessions, start_session, stop_session, cancel_session,
+        get_client_write_stats
     )
 
 # Import notifications module
 from backend.utils.notifications import create_notification
 from backend.utils.email import send_charge_notification_email
+from backend.utils.request_cache import (
+    request_cached, write_through, write_through_item, write_through_client, task_patch,
+    invalidate
+)
+from backend.utils.json_store import read_json, write_json, get_stats as get_json_store_stats
+from backend.utils.journal import get_journal
+from backend.utils.presence import get_presence_tracker
+from backend.utils.principal import load_principal, store_principal, clear_principal, invalidate_principals
+from backend.utils.permission_matcher import get_permission_matcher, invalidate_permission_matcher
+from backend.utils.client_access import build_client_access_index, client_ids_for
+from backend.utils.client_view import ClientViewError, parse_client_view, shape_client
+from backend.utils.deadline_index import get_deadline_index, get_deadline_buckets
+from backend.utils.open_tasks import get_open_tasks_view
+from backend.utils.schedule import get_project_schedule
+from backend.utils.versions import conditional_get
+from backend.utils.pagination import (
+    PaginationError, KeysetIndex, page_args, encode_cursor, split_page, sort_key, created_timestamp
+)
+from backend.utils.compression import init_compression, send_precompressed
+from backend.utils.perf import (
+    init_perf, instrument_storage_functions, instrument_engine, get_perf_stats, render_prometheus
+)
 
 app = Flask(__name__)
 # SECRET_KEY מ-environment variable (חובה בפרודקשן!)
@@ -77,6 +107,7 @@ USERS_FILE = os.path.join(BASE_DIR, 'users_db.json')
 SUPPLIERS_FILE = os.path.join(BASE_DIR, 'suppliers_db.json')
 QUOTES_FILE = os.path.join(BASE_DIR, 'quotes_db.json')
 MESSAGES_FILE = os.path.join(BASE_DIR, 'messages_db.json')
+MESSAGES_JOURNAL_FILE = os.path.join(BASE_DIR, 'messages_db.jsonl')
 EVENTS_FILE = os.path.join(BASE_DIR, 'events_db.json')
 EQUIPMENT_BANK_FILE = os.path.join(BASE_DIR, 'equipment_bank.json')
 CHECKLIST_TEMPLATES_FILE = os.path.join(BASE_DIR, 'checklist_templates.json')
@@ -87,6 +118,7 @@ SUPPLIER_FILES_FOLDER = os.path.join(BASE_DIR, 'static', 'supplier_files')
 PERMISSIONS_FILE = os.path.join(BASE_DIR, 'permissions_db.json')
 USER_ACTIVITY_FILE = os.path.join(BASE_DIR, 'user_activity.json')
 ACTIVITY_LOGS_FILE = os.path.join(BASE_DIR, 'activity_logs.json')
+ACTIVITY_LOGS_JOURNAL_FILE = os.path.join(BASE_DIR, 'activity_logs.jsonl')
 TIME_TRACKING_FILE = os.path.join(BASE_DIR, 'time_tracking.json')
 # הגדרת תיקיית העלאות
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
@@ -114,6 +146,12 @@ login_manager.login_view = 'login'
 # הוספת CSRF Protection
 csrf = CSRFProtect(app)
 
+# מדדי ביצועים לכל route (נרשם לפני הדחיסה - after_request רץ בסדר הפוך, כך שגודל התשובה נמדד אחרי הדחיסה)
+init_perf(app)
+
+# דחיסת gzip/brotli לתשובות טקסט/JSON גדולות (לפי Accept-Encoding)
+init_compression(app)
+
 # הוספת Rate Limiting
 limiter = Limiter(
     app=app,
@@ -124,15 +162,14 @@ limiter = Limiter(
 
 # Only define JSON-based functions if NOT using database
 if not USE_DATABASE:
+    @request_cached('users')
     def load_users():
         if not os.path.exists(USERS_FILE):
             # יצירת סיסמה מוצפנת למנהל ברירת מחדל
             u = {'admin': {'password': generate_password_hash('1234'), 'name': 'מנהל המשרד', 'role': 'אדמין'}}
-            with open(USERS_FILE, 'w', encoding='utf-8') as f: json.dump(u, f, ensure_ascii=False, indent=4)
+            write_json(USERS_FILE, u)
             return u
-        users = {}
-        with open(USERS_FILE, 'r', encoding='utf-8') as f: 
-            users = json.load(f)
+        users = read_json(USERS_FILE, {})
         # וידוא שלכל משתמש יש role (ברירת מחדל: עובד)
         needs_update = False
         for uid, user_info in users.items():
@@ -143,28 +180,27 @@ if not USE_DATABASE:
             save_users(users)
         return users
 
+    @write_through('users')
     def save_users(users):
-        with open(USERS_FILE, 'w', encoding='utf-8') as f: 
-            json.dump(users, f, ensure_ascii=False, indent=4)
+        write_json(USERS_FILE, users)
 
 if not USE_DATABASE:
+    @request_cached('data')
     def load_data():
-        if not os.path.exists(DATA_FILE) or os.stat(DATA_FILE).st_size == 0: return []
-        with open(DATA_FILE, 'r', encoding='utf-8') as f: 
-            data = json.load(f)
-            # אם זה רשימה ריקה, החזר
-            if not data:
-                return data
-            # וידוא שלכל לקוח יש client_number
-            needs_update = False
-            for client in data:
-                if 'client_number' not in client:
-                    needs_update = True
-                    break
-            # אם צריך עדכון, עדכן את כל הלקוחות
-            if needs_update:
-                assign_client_numbers(data)
+        data = read_json(DATA_FILE, [])
+        # אם זה רשימה ריקה, החזר
+        if not data:
             return data
+        # וידוא שלכל לקוח יש client_number
+        needs_update = False
+        for client in data:
+            if 'client_number' not in client:
+                needs_update = True
+                break
+        # אם צריך עדכון, עדכן את כל הלקוחות
+        if needs_update:
+            assign_client_numbers(data)
+        return data
 
 def assign_client_numbers(clients):
     """מקצה מספרים ייחודיים ללקוחות שאין להם"""
@@ -318,9 +354,11 @@ def get_next_charge_number(client):
     return charge_number
 
 if not USE_DATABASE:
+    @write_through('data', invalidates=('client_summaries', 'client_access_index'))
     def save_data(data):
-        with open(DATA_FILE, 'w', encoding='utf-8') as f: json.dump(data, f, ensure_ascii=False, indent=4)
+        write_json(DATA_FILE, data)
 
+    @write_through_client
     def save_client(client):
         """JSON-mode single-client save: replace the one client and rewrite the
         file (local file write is cheap). Keeps a unified interface with DB mode."""
@@ -335,49 +373,363 @@ if not USE_DATABASE:
                 break
         if not found:
             all_clients.append(client)
-        save_data(all_clients)
+        # כתיבה ישירה: write_through_client כבר מעדכן את ה-cache ומקדם את גרסת 'data' פעם אחת
+        write_json(DATA_FILE, all_clients)
+
+    @task_patch
+    def patch_task(client_id, project_id, task_id, changes, removed=()):
+        """JSON-mode task patch: the fields are applied to the task in memory and
+        the file is written once. Same interface as DB mode."""
+        all_clients = load_data()
+        for c in all_clients:
+            if c.get('id') != client_id:
+                continue
+            for p in c.get('projects', []):
+                if p.get('id') != project_id:
+                    continue
+                for t in p.get('tasks', []):
+                    if t.get('id') == task_id:
+                        t.update(changes)
+                        for key in removed:
+                            t.pop(key, None)
+                        write_json(DATA_FILE, all_clients)
+                        client = {k: c.get(k) for k in ('id', 'name', 'assigned_user')}
+                        client['archived'] = c.get('archived', False)
+                        return client, {'id': project_id, 'title': p.get('title')}, t
+        return None
+
+    def load_client(client_id):
+        """JSON-mode single-client load: same interface as DB mode (None if missing)."""
+        if not client_id:
+            return None
+        return next((c for c in load_data() if c.get('id') == client_id), None)
+
+    def load_client_view(client_id, view):
+        """JSON-mode: הקובץ נטען בכל מקרה - shape_client חותך לפי ה-view"""
+        return load_client(client_id)
 
+    # הטלה (projection) קלה של agency_db.json - נבנית מחדש רק כשהקובץ משתנה
+    _client_summaries_cache = {'key': None, 'snapshot': None}
+
+    @request_cached('client_summaries')
+    def load_client_summaries():
+        """JSON-mode light client list: id, name, client_number, assigned_user, archived"""
+        try:
+            st = os.stat(DATA_FILE)
+            key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return []
+        if _client_summaries_cache['key'] != key:
+            summaries = [
+                {
+                    'id': c.get('id'),
+                    'name': c.get('name'),
+                    'client_number': c.get('client_number'),
+                    'assigned_user': c.get('assigned_user'),
+                    'archived': c.get('archived', False)
+                }
+                for c in read_json(DATA_FILE, [])
+            ]
+            _client_summaries_cache.update(key=key, snapshot=marshal.dumps(summaries))
+        return marshal.loads(_client_summaries_cache['snapshot'])
+
+    # אינדקס משתמש -> לקוחות משויכים, לפי אותה גרסת קובץ כמו התקציר
+    _client_access_cache = {'key': None, 'index': None}
+
+    @request_cached('client_access_index')
+    def load_client_access_index():
+        """JSON-mode: {'all': client ids, 'by_user': {user_id lower-cased: client ids}}"""
+        summaries = load_client_summaries()
+        key = _client_summaries_cache['key'] if summaries else None
+        if key is None or _client_access_cache['key'] != key:
+            _client_access_cache.update(key=key, index=build_client_access_index(summaries))
+        return _client_access_cache['index']
+
+    def load_clients_by_ids(client_ids):
+        """JSON-mode multi-client load, ordered like client_ids."""
+        ids = [cid for cid in dict.fromkeys(client_ids or []) if cid]
+        if not ids:
+            return []
+        by_id = {c.get('id'): c for c in load_data() if c.get('id') in ids}
+        return [by_id[cid] for cid in ids if cid in by_id]
+
+    def query_tasks(client_id=None, assignee=None, status=None, exclude_status=None,
+                    has_deadline=False):
+        """JSON-mode equivalent of the indexed DB task query (same result shape)."""
+        results = []
+        for client in load_data():
+            if client_id and client.get('id') != client_id:
+                continue
+            for project in client.get('projects', []):
+                for task in project.get('tasks', []):
+                    task_assignee = task.get('assignee')
+                    if not task_assignee:
+                        assigned = task.get('assigned_user')
+                        task_assignee = (assigned[0] if assigned else None) if isinstance(assigned, list) else assigned
+                    if assignee and task_assignee != assignee:
+                        continue
+                    if status and task.get('status') != status:
+                        continue
+                    if exclude_status and task.get('status') == exclude_status:
+                        continue
+                    if has_deadline and not task.get('deadline'):
+                        continue
+                    results.append({
+                        'client_id': client.get('id'),
+                        'client_name': client.get('name'),
+                        'project_id': project.get('id'),
+                        'project_title': project.get('title'),
+                        'task': task
+                    })
+        return results
+
+    @request_cached('suppliers')
     def load_suppliers():
-        if not os.path.exists(SUPPLIERS_FILE) or os.stat(SUPPLIERS_FILE).st_size == 0: return []
-        with open(SUPPLIERS_FILE, 'r', encoding='utf-8') as f: return json.load(f)
+        return read_json(SUPPLIERS_FILE, [])
 
+    @write_through('suppliers')
     def save_suppliers(suppliers):
-        with open(SUPPLIERS_FILE, 'w', encoding='utf-8') as f: json.dump(suppliers, f, ensure_ascii=False, indent=4)
-
+        write_json(SUPPLIERS_FILE, suppliers)
+
+    def _replace_item(items, item):
+        """החלפת פריט ברשימה לפי id (או הוספה אם לא קיים)"""
+        for i, existing in enumerate(items):
+            if existing.get('id') == item.get('id'):
+                items[i] = item
+                return items
+        items.append(item)
+        return items
+
+    @write_through_item('suppliers')
+    def save_supplier(supplier):
+        save_suppliers(_replace_item(load_suppliers(), supplier))
+
+    @request_cached('quotes')
     def load_quotes():
-        if not os.path.exists(QUOTES_FILE) or os.stat(QUOTES_FILE).st_size == 0: return []
-        with open(QUOTES_FILE, 'r', encoding='utf-8') as f: return json.load(f)
+        return read_json(QUOTES_FILE, [])
 
+    @write_through('quotes')
     def save_quotes(quotes):
-        with open(QUOTES_FILE, 'w', encoding='utf-8') as f: json.dump(quotes, f, ensure_ascii=False, indent=4)
+        write_json(QUOTES_FILE, quotes)
+
+    # הודעות נשמרות ביומן JSONL (שורה לכל כתיבה) - messages_db.json מיובא בפעם הראשונה
+    def _messages_journal():
+        return get_journal(MESSAGES_JOURNAL_FILE, legacy_path=MESSAGES_FILE)
 
-    def load_messages():    
-        if not os.path.exists(MESSAGES_FILE) or os.stat(MESSAGES_FILE).st_size == 0: return []
-        with open(MESSAGES_FILE, 'r', encoding='utf-8') as f: return json.load(f)
+    @request_cached('messages')
+    def load_messages():
+        return _messages_journal().all()
 
+    @write_through('messages')
     def save_messages(messages):
-        with open(MESSAGES_FILE, 'w', encoding='utf-8') as f: json.dump(messages, f, ensure_ascii=False, indent=4)
+        # נכתבות רק הודעות חדשות/ששונו
+        _messages_journal().replace_all(messages)
 
+    @write_through_item('messages')
+    def save_message(message):
+        # הודעה בודדת - שורה אחת ביומן
+        _messages_journal().append(message)
+
+    # אינדקסים ממוינים ל-keyset pagination (ראו backend/utils/pagination) -
+    # נבנים מחדש רק כשהקובץ משתנה, כל עמוד הוא bisect + חיתוך
+    _keyset_indexes = {}
+
+    def _file_keyset_index(name, path, load_items, key):
+        try:
+            st = os.stat(path)
+            stat_key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return KeysetIndex([], key)
+        cached = _keyset_indexes.get(name)
+        if cached is None or cached[0] != stat_key:
+            cached = _keyset_indexes[name] = (stat_key, KeysetIndex(load_items(), key))
+        return cached[1]
+
+    def _copied_page(page):
+        """העמוד משתף אובייקטים עם האינדקס - מחזירים עותק"""
+        items, next_key = page
+        return marshal.loads(marshal.dumps(items)), next_key
+
+    def load_suppliers_page(limit, after=None):
+        """(ספקים, next_key) לפי id"""
+        index = _file_keyset_index('suppliers', SUPPLIERS_FILE, lambda: read_json(SUPPLIERS_FILE, []),
+                                   lambda s: sort_key(s.get('id')))
+        return _copied_page(index.page(limit, after))
+
+    def load_quotes_page(limit, after=None):
+        """(הצעות מחיר, next_key) לפי id"""
+        index = _file_keyset_index('quotes', QUOTES_FILE, lambda: read_json(QUOTES_FILE, []),
+                                   lambda q: sort_key(q.get('id')))
+        return _copied_page(index.page(limit, after))
+
+    def load_archived_clients_page(limit, after=None):
+        """(לקוחות בארכיון, next_key) - archived_at החדש ביותר ראשון, ואז id"""
+        index = _file_keyset_index(
+            'archived_clients', DATA_FILE,
+            lambda: [c for c in read_json(DATA_FILE, []) if c.get('archived', False)],
+            lambda c: sort_key(c.get('archived_at'), c.get('id'))
+        )
+        return _copied_page(index.page(limit, after, descending=True))
+
+    def _message_key(message):
+        return sort_key(created_timestamp(message), message.get('id'))
+
+    def _build_conversation_indexes(messages):
+        by_pair = {}
+        for message in messages:
+            pair = frozenset((message.get('from_user'), message.get('to_user')))
+            by_pair.setdefault(pair, []).append(message)
+        return {pair: KeysetIndex(items, _message_key) for pair, items in by_pair.items()}
+
+    def load_conversation_page(user_a, user_b, limit, after=None):
+        """(הודעות בין שני משתמשים, next_key) - החדשה ביותר ראשונה"""
+        indexes = _messages_journal().derived('conversations', _build_conversation_indexes)
+        index = indexes.get(frozenset((user_a, user_b)))
+        if index is None:
+            return [], None
+        return _copied_page(index.page(limit, after, descending=True))
+
+    @request_cached('events')
     def load_events():
-        if not os.path.exists(EVENTS_FILE) or os.stat(EVENTS_FILE).st_size == 0: return []
-        with open(EVENTS_FILE, 'r', encoding='utf-8') as f: return json.load(f)
+        return read_json(EVENTS_FILE, [])
 
+    @write_through('events')
     def save_events(events):
-        with open(EVENTS_FILE, 'w', encoding='utf-8') as f: json.dump(events, f, ensure_ascii=False, indent=4)
+        write_json(EVENTS_FILE, events)
+
+    @write_through_item('events')
+    def save_event(event):
+        save_events(_replace_item(load_events(), event))
 
 if not USE_DATABASE:
+    @request_cached('time_tracking')
     def load_time_tracking():
         """טעינת מדידות זמן מקובץ JSON"""
-        if not os.path.exists(TIME_TRACKING_FILE) or os.stat(TIME_TRACKING_FILE).st_size == 0:
-            return {'entries': [], 'active_sessions': {}}
-        with open(TIME_TRACKING_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return read_json(TIME_TRACKING_FILE, {'entries': [], 'active_sessions': {}})
 
+    @write_through('time_tracking')
     def save_time_tracking(data):
         """שמירת מדידות זמן לקובץ JSON"""
-        with open(TIME_TRACKING_FILE, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
+        write_json(TIME_TRACKING_FILE, data)
+
+    # פעולות ברמת רשומה/מדידה - אותו ממשק כמו ב-database_helpers
+    def get_time_entry(entry_id):
+        """רשומת מדידה בודדת (או None)"""
+        entries = load_time_tracking().get('entries', [])
+        entry = next((e for e in entries if e.get('id') == entry_id), None)
+        return dict(entry) if entry else None
+
+    def add_entry(entry):
+        time_data = load_time_tracking()
+        time_data.setdefault('entries', []).append(entry)
+        save_time_tracking(time_data)
+
+    def update_entry(entry):
+        time_data = load_time_tracking()
+        entries = time_data.setdefault('entries', [])
+        for i, e in enumerate(entries):
+            if e.get('id') == entry.get('id'):
+                entries[i] = entry
+                save_time_tracking(time_data)
+                return True
+        return False
+
+    def delete_entry(entry_id):
+        time_data = load_time_tracking()
+        entries = time_data.get('entries', [])
+        remaining = [e for e in entries if e.get('id') != entry_id]
+        if len(remaining) == len(entries):
+            return False
+        time_data['entries'] = remaining
+        save_time_tracking(time_data)
+        return True
+
+    def load_active_sessions():
+        """המדידות הפעילות בלבד: {user_id: session}"""
+        return dict(load_time_tracking().get('active_sessions', {}))
+
+    def start_session(session):
+        time_data = load_time_tracking()
+        time_data.setdefault('active_sessions', {})[session['user_id']] = session
+        save_time_tracking(time_data)
+
+    def stop_session(user_id, entry):
+        """סגירת המדידה הפעילה ושמירת הרשומה. False אם אין מדידה פעילה."""
+        time_data = load_time_tracking()
+        if user_id not in time_data.get('active_sessions', {}):
+            return False
+        del time_data['active_sessions'][user_id]
+        time_data.setdefault('entries', []).append(entry)
+        save_time_tracking(time_data)
+        return True
+
+    def cancel_session(user_id):
+        time_data = load_time_tracking()
+        if user_id not in time_data.get('active_sessions', {}):
+            return False
+        del time_data['active_sessions'][user_id]
+        save_time_tracking(time_data)
+        return True
+
+    # אינדקס בזיכרון של הרשומות לפי חודש/לקוח/משימה - נבנה מחדש רק כשהקובץ משתנה
+    _time_entries_index = {'key': None}
+
+    def _time_entry_key(entry):
+        return sort_key(entry.get('start_time'), entry.get('id'))
 
+    def _get_time_entries_index():
+        try:
+            st = os.stat(TIME_TRACKING_FILE)
+            key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            key = None
+        if _time_entries_index['key'] != key or key is None:
+            by_month, by_client, by_task = {}, {}, {}
+            entries = load_time_tracking.uncached().get('entries', []) if key else []
+            for entry in entries:
+                by_month.setdefault((entry.get('date') or '')[:7], []).append(entry)
+                by_client.setdefault(entry.get('client_id'), []).append(entry)
+                by_task.setdefault(entry.get('task_id'), []).append(entry)
+            # כל רשימה ממוינת לפי (start_time, id) - בלי מיון בכל בקשה
+            _time_entries_index.update(
+                key=key, all=KeysetIndex(entries, _time_entry_key),
+                by_month={m: KeysetIndex(v, _time_entry_key) for m, v in by_month.items()},
+                by_client={c: KeysetIndex(v, _time_entry_key) for c, v in by_client.items()},
+                by_task={t: KeysetIndex(v, _time_entry_key) for t, v in by_task.items()}
+            )
+        return _time_entries_index
+
+    def query_time_entries(month=None, user_id=None, client_id=None, task_id=None,
+                           order='desc', limit=None, after=None):
+        """רשומות מדידה מסוננות (אותו ממשק כמו ב-database_helpers).
+        מתחיל מהרשימה הקטנה ביותר באינדקס (ממוינת מראש), מתחיל אחרי ה-cursor
+        (after) ועוצר אחרי limit רשומות."""
+        index = _get_time_entries_index()
+        if task_id:
+            candidates = index['by_task'].get(task_id)
+        elif month and len(month) == 7:
+            candidates = index['by_month'].get(month)
+        elif client_id:
+            candidates = index['by_client'].get(client_id)
+        else:
+            candidates = index['all']
+        if candidates is None:
+            return []
+
+        ordered, _ = candidates.page(None, after if order in ('desc', 'asc') else None,
+                                     descending=(order == 'desc'))
+        entries = []
+        for e in ordered:
+            if (not month or (e.get('date') or '').startswith(month)) \
+                    and (not user_id or e.get('user_id') == user_id) \
+                    and (not client_id or e.get('client_id') == client_id) \
+                    and (not task_id or e.get('task_id') == task_id):
+                entries.append(dict(e))
+                if limit and len(entries) >= limit:
+                    break
+        return entries
+
+    @request_cached('equipment_bank')
     def load_equipment_bank():
         if not os.path.exists(EQUIPMENT_BANK_FILE) or os.stat(EQUIPMENT_BANK_FILE).st_size == 0: 
             # יצירת מאגר ציוד בסיסי
@@ -387,11 +739,13 @@ if not USE_DATABASE:
             ]
             save_equipment_bank(default_equipment)
             return default_equipment
-        with open(EQUIPMENT_BANK_FILE, 'r', encoding='utf-8') as f: return json.load(f)
+        return read_json(EQUIPMENT_BANK_FILE, [])
 
+    @write_through('equipment_bank')
     def save_equipment_bank(equipment):
-        with open(EQUIPMENT_BANK_FILE, 'w', encoding='utf-8') as f: json.dump(equipment, f, ensure_ascii=False, indent=4)
+        write_json(EQUIPMENT_BANK_FILE, equipment)
 
+    @request_cached('checklist_templates')
     def load_checklist_templates():
         """טעינת תבניות צ'ק-ליסט מקובץ JSON"""
         if not os.path.exists(CHECKLIST_TEMPLATES_FILE) or os.stat(CHECKLIST_TEMPLATES_FILE).st_size == 0:
@@ -436,25 +790,22 @@ if not USE_DATABASE:
             }
             save_checklist_templates(default_templates)
             return default_templates
-        with open(CHECKLIST_TEMPLATES_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return read_json(CHECKLIST_TEMPLATES_FILE, {})
 
+    @write_through('checklist_templates')
     def save_checklist_templates(templates):
         """שמירת תבניות צ'ק-ליסט לקובץ JSON"""
-        with open(CHECKLIST_TEMPLATES_FILE, 'w', encoding='utf-8') as f:
-            json.dump(templates, f, ensure_ascii=False, indent=4)
+        write_json(CHECKLIST_TEMPLATES_FILE, templates)
 
+    @request_cached('forms')
     def load_forms():
         """טעינת טפסים מקובץ JSON"""
-        if not os.path.exists(FORMS_FILE) or os.stat(FORMS_FILE).st_size == 0:
-            return []
-        with open(FORMS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return read_json(FORMS_FILE, [])
 
+    @write_through('forms')
     def save_forms(forms):
         """שמירת טפסים לקובץ JSON"""
-        with open(FORMS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(forms, f, ensure_ascii=False, indent=4)
+        write_json(FORMS_FILE, forms)
 
 def send_form_email(form_title, client_name, form_submission, uploaded_files, form_token):
     """
@@ -769,15 +1120,22 @@ def get_event_checklist_template(event_type):
     return templates.get(event_type, [])
 
 class User(UserMixin):
-    def __init__(self, id):
+    def __init__(self, id, name=None, role=None):
         self.id = id
-        u = load_users()
-        self.name = u[id]['name'] if id in u else "Unknown"
+        if name is None:
+            u = load_users()
+            name = u[id]['name'] if id in u else "Unknown"
+            role = u[id].get('role', 'עובד') if id in u else 'עובד'
+        self.name = name
+        self.role = role or 'עובד'
 
 @login_manager.user_loader
 def load_user(user_id):
-    u = load_users()
-    return User(user_id) if user_id in u else None
+    # ה-principal נשמר ב-session בהתחברות - בלי גישה לטבלת המשתמשים בכל request
+    principal = load_principal(user_id, load_users)
+    if principal is None:
+        return None
+    return User(user_id, principal['name'], principal['role'])
 
 @app.context_processor
 def inject_sidebar_data():
@@ -787,53 +1145,68 @@ def inject_sidebar_data():
 
 # --- Routes ---
 
-def load_user_activity():
-    """טעינת נתוני פעילות משתמשים"""
-    if not os.path.exists(USER_ACTIVITY_FILE):
-        return {}
-    try:
-        with open(USER_ACTIVITY_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return {}
-
-def save_user_activity(activity):
-    """שמירת נתוני פעילות משתמשים"""
-    with open(USER_ACTIVITY_FILE, 'w', encoding='utf-8') as f:
-        json.dump(activity, f, ensure_ascii=False, indent=4)
-
 def update_user_activity(user_id):
-    """עדכון זמן פעילות אחרון של משתמש"""
-    activity = load_user_activity()
-    activity[user_id] = datetime.now().isoformat()
-    save_user_activity(activity)
+    """עדכון זמן פעילות אחרון של משתמש - בזיכרון בלבד (פעם בדקה למשתמש),
+    הכתיבה לקובץ נעשית במנות"""
+    get_presence_tracker(USER_ACTIVITY_FILE).touch(user_id)
+
+def get_presence(user_ids):
+    """{user_id: True/False} - האם כל משתמש היה פעיל ב-60 הדקות האחרונות"""
+    return get_presence_tracker(USER_ACTIVITY_FILE).get_presence(user_ids)
 
 def is_user_active(user_id):
     """בודק אם משתמש פעיל (פעיל ב-60 דקות האחרונות)"""
-    activity = load_user_activity()
-    if user_id not in activity:
-        return False
-    try:
-        last_activity = datetime.fromisoformat(activity[user_id])
-        time_diff = datetime.now() - last_activity
-        return time_diff.total_seconds() < 3600  # שעה
-    except:
-        return False
+    return get_presence([user_id])[user_id]
 
+def _activity_logs_journal():
+    # activity_logs.json מיובא ליומן בפעם הראשונה
+    return get_journal(ACTIVITY_LOGS_JOURNAL_FILE, legacy_path=ACTIVITY_LOGS_FILE)
+
+@request_cached('activity_logs')
 def load_activity_logs():
     """טעינת לוגי פעילות"""
-    if not os.path.exists(ACTIVITY_LOGS_FILE):
-        return []
     try:
-        with open(ACTIVITY_LOGS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        return _activity_logs_journal().all()
     except:
         return []
 
+@write_through('activity_logs')
 def save_activity_logs(logs):
-    """שמירת לוגי פעילות"""
-    with open(ACTIVITY_LOGS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(logs, f, ensure_ascii=False, indent=4)
+    """שמירת לוגי פעילות (נכתבים רק לוגים חדשים/ששונו)"""
+    _activity_logs_journal().replace_all(logs)
+
+def add_activity_log(log):
+    """הוספת לוג פעילות בודד - שורה אחת ביומן"""
+    _activity_logs_journal().append(log)
+    invalidate(__name__, 'activity_logs')
+    return log
+
+def delete_activity_log(log_id):
+    """מחיקת לוג פעילות בודד"""
+    deleted = _activity_logs_journal().delete(log_id)
+    invalidate(__name__, 'activity_logs')
+    return deleted
+
+def _build_activity_indexes(logs):
+    """{client_id: KeysetIndex לפי (timestamp, id)} - נבנה מחדש רק כשהיומן משתנה"""
+    by_client = {}
+    for log in logs:
+        by_client.setdefault(log.get('client_id'), []).append(log)
+    return {
+        client_id: KeysetIndex(items, lambda log: sort_key(log.get('timestamp'), log.get('id')))
+        for client_id, items in by_client.items()
+    }
+
+def load_client_activity_logs(client_id, limit=None):
+    """לוגי הפעילות של לקוח, מהחדש לישן (limit = רק האחרונים)"""
+    try:
+        index = _activity_logs_journal().derived('by_client', _build_activity_indexes).get(client_id)
+    except:
+        return []
+    if index is None:
+        return []
+    logs, _ = index.page(limit, descending=True)
+    return marshal.loads(marshal.dumps(logs))
 
 @app.before_request
 def track_activity():
@@ -870,8 +1243,9 @@ def login():
                 password_valid = (stored_password == pwd)
             
             if password_valid:
-                user = User(resolved_user_id)
+                user = User(resolved_user_id, u[resolved_user_id].get('name', 'Unknown'), u[resolved_user_id].get('role'))
                 login_user(user, remember=True)
+                store_principal(resolved_user_id, u[resolved_user_id])
                 update_user_activity(resolved_user_id)
                 wants_json = request.headers.get('Accept', '').find('application/json') != -1 or \
                             request.headers.get('X-Requested-With') == 'XMLHttpRequest'
@@ -976,10 +1350,7 @@ def reset_password_request():
     
     # שמירת טוקן איפוס סיסמה (ניתן לשמור בקובץ נפרד או ב-JSON)
     RESET_TOKENS_FILE = os.path.join(BASE_DIR, 'reset_tokens.json')
-    reset_tokens = {}
-    if os.path.exists(RESET_TOKENS_FILE):
-        with open(RESET_TOKENS_FILE, 'r', encoding='utf-8') as f:
-            reset_tokens = json.load(f)
+    reset_tokens = read_json(RESET_TOKENS_FILE, {})
     
     reset_tokens[reset_token] = {
         'user_id': user_id,
@@ -987,8 +1358,7 @@ def reset_password_request():
         'used': False
     }
     
-    with open(RESET_TOKENS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(reset_tokens, f, ensure_ascii=False, indent=4)
+    write_json(RESET_TOKENS_FILE, reset_tokens)
     
     # שליחת מייל
     email_sent = send_password_reset_email(user_email, reset_token)
@@ -1012,8 +1382,7 @@ def reset_password(token):
     if not os.path.exists(RESET_TOKENS_FILE):
         return "קישור לא תקין או פג תוקף", 400
     
-    with open(RESET_TOKENS_FILE, 'r', encoding='utf-8') as f:
-        reset_tokens = json.load(f)
+    reset_tokens = read_json(RESET_TOKENS_FILE, {})
     
     if token not in reset_tokens:
         return "קישור לא תקין או פג תוקף", 400
@@ -1024,8 +1393,7 @@ def reset_password(token):
     created_time = datetime.strptime(token_data['created'], '%Y-%m-%d %H:%M:%S')
     if (datetime.now() - created_time).total_seconds() > 24 * 3600:
         del reset_tokens[token]
-        with open(RESET_TOKENS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(reset_tokens, f, ensure_ascii=False, indent=4)
+        write_json(RESET_TOKENS_FILE, reset_tokens)
         return "קישור פג תוקף. אנא בקש קישור חדש.", 400
     
     if token_data.get('used', False):
@@ -1049,13 +1417,11 @@ def reset_password(token):
         
         if user_id in users:
             users[user_id]['password'] = generate_password_hash(new_password)
-            with open(USERS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(users, f, ensure_ascii=False, indent=4)
+            save_users(users)
             
             # סימון טוקן כמשומש
             reset_tokens[token]['used'] = True
-            with open(RESET_TOKENS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(reset_tokens, f, ensure_ascii=False, indent=4)
+            write_json(RESET_TOKENS_FILE, reset_tokens)
             
             flash('הסיסמה עודכנה בהצלחה! ניתן להתחבר עם הסיסמה החדשה.', 'success')
             return redirect(url_for('login'))
@@ -1096,6 +1462,7 @@ def api_current_user():
 
 @app.route('/api/sidebar_users')
 @login_required
+@conditional_get('users')
 def api_sidebar_users():
     """API endpoint להחזרת משתמשים לסיידבר"""
     try:
@@ -1118,7 +1485,7 @@ def api_sidebar_users():
 # ==================== NOTIFICATIONS API ====================
 
 from backend.utils.notifications import (
-    get_user_notifications, get_unread_count,
+    get_user_notifications, get_user_notifications_page, get_unread_count,
     mark_notifications_read, get_new_notifications_since
 )
 
@@ -1128,18 +1495,22 @@ def api_get_notifications():
     """Get notifications for the current user"""
     try:
         unread_only = request.args.get('unread_only', 'false').lower() == 'true'
-        limit = int(request.args.get('limit', 50))
+        limit, after = page_args(default_limit=50)
         
-        notifications = get_user_notifications(
+        notifications, next_key = get_user_notifications_page(
             current_user.id, 
-            unread_only=unread_only,
-            limit=limit
+            limit=limit,
+            after=after,
+            unread_only=unread_only
         )
         
         return jsonify({
             'success': True,
-            'notifications': notifications
+            'notifications': notifications,
+            'next_cursor': encode_cursor(next_key)
         })
+    except PaginationError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         print(f"Error in api_get_notifications: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -1218,16 +1589,14 @@ def api_mark_notifications_read():
 
 @app.route('/api/clients')
 @login_required
+@conditional_get('data')
 def api_clients():
     """API endpoint להחזרת לקוחות"""
     try:
-        user_role = get_user_role(current_user.id)
-        all_c = load_data()
+        all_c = load_client_summaries()
         all_c = filter_active_clients(all_c)
-        if is_manager_or_admin(current_user.id, user_role):
-            display = all_c
-        else:
-            display = [c for c in all_c if can_user_access_client(current_user.id, user_role, c)]
+        allowed = accessible_client_ids(current_user)
+        display = [c for c in all_c if c['id'] in allowed]
         display = sorted(display, key=lambda x: x.get('name', '').lower())
         return jsonify({
             'success': True,
@@ -1244,7 +1613,7 @@ def api_clients():
 def get_client_projects(client_id):
     """Route להחזרת פרויקטים של לקוח"""
     try:
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         for c in data:
             if c['id'] == client_id:
                 projects = c.get('projects', [])
@@ -1256,62 +1625,42 @@ def get_client_projects(client_id):
 @app.route('/api/tasks/calendar')
 @login_required
 def get_tasks_for_calendar():
-    """API endpoint להחזרת משימות עם deadline ללוח שנה"""
+    """API endpoint להחזרת משימות עם deadline ללוח שנה.
+    start / end (YYYY-MM-DD, end לא כולל) ו-assignee מצמצמים לחלון שמוצג -
+    נקרא מאינדקס ה-deadlines בלי לעבור על כל הלקוחות."""
     try:
-        data = load_data()
+        try:
+            start, end = _iso_day_param('start'), _iso_day_param('end')
+        except ValueError:
+            return jsonify({'success': False, 'error': 'תאריך לא תקין'}), 400
+        assignee = request.args.get('assignee') or None
         users = load_users()
-        user_role = get_user_role(current_user.id)
+        allowed = accessible_client_ids(current_user)
         
         tasks = []
-        for client in data:
-            # בדיקת הרשאות
-            if not is_manager_or_admin(current_user.id, user_role):
-                if not can_user_access_client(current_user.id, user_role, client):
-                    continue
+        for entry in deadline_index().query(start, end, assignee=assignee, client_ids=allowed):
+            # סינון משימות שהושלמו (למעט משימות יומיות)
+            task_status = entry['status'] or 'לביצוע'
+            if task_status == 'הושלם' and not entry['is_daily_task']:
+                continue
             
-            client_name = client.get('name', '')
-            for project in client.get('projects', []):
-                project_title = project.get('title', '')
-                for task in project.get('tasks', []):
-                    deadline = task.get('deadline', '')
-                    if not deadline:
-                        continue
-                    
-                    # סינון משימות שהושלמו (למעט משימות יומיות)
-                    task_status = task.get('status', 'לביצוע')
-                    is_daily_task = task.get('is_daily_task', False)
-                    if task_status == 'הושלם' and not is_daily_task:
-                        continue
-                    
-                    # המרת תאריך לפורמט ISO
-                    try:
-                        if 'T' in deadline:
-                            deadline_date = deadline.split('T')[0]
-                        else:
-                            deadline_date = deadline
-                        
-                        # קבלת שם המשתמש האחראי
-                        assignee_id = task.get('assignee', '')
-                        assignee_name = users.get(assignee_id, {}).get('name', assignee_id) if assignee_id else 'ללא אחראי'
-                        
-                        task_title = task.get('title', 'ללא כותרת')
-                        
-                        tasks.append({
-                            'id': task.get('id', ''),
-                            'title': task_title,
-                            'start': deadline_date,
-                            'client_name': client_name,
-                            'project_title': project_title,
-                            'assignee_name': assignee_name,
-                            'assignee_id': assignee_id,
-                            'status': task_status,
-                            'client_id': client.get('id', ''),
-                            'project_id': project.get('id', ''),
-                            'task_id': task.get('id', '')
-                        })
-                    except Exception as e:
-                        print(f"Error parsing deadline for task: {e}")
-                        continue
+            # קבלת שם המשתמש האחראי
+            assignee_id = entry['assignee']
+            assignee_name = users.get(assignee_id, {}).get('name', assignee_id) if assignee_id else 'ללא אחראי'
+            
+            tasks.append({
+                'id': entry['task_id'] or '',
+                'title': entry['title'] or 'ללא כותרת',
+                'start': entry['date'],
+                'client_name': entry['client_name'] or '',
+                'project_title': entry['project_title'] or '',
+                'assignee_name': assignee_name,
+                'assignee_id': assignee_id,
+                'status': task_status,
+                'client_id': entry['client_id'] or '',
+                'project_id': entry['project_id'] or '',
+                'task_id': entry['task_id'] or ''
+            })
         
         return jsonify({'success': True, 'tasks': tasks})
     except Exception as e:
@@ -1323,47 +1672,46 @@ def get_tasks_for_calendar():
 @app.route('/api/quick_update_tasks')
 @login_required
 def api_quick_update_tasks():
-    """API endpoint להחזרת כל המשימות לעדכון מהיר"""
+    """API endpoint להחזרת כל המשימות לעדכון מהיר.
+    סינון אופציונלי: client_id, assignee, status (ממתין/בביצוע); עמודים עם limit/cursor."""
     try:
-        data = load_data()
+        limit, after = page_args()
+        client_id, assignee = _open_tasks_filters()
+        status = request.args.get('status') or None
         users = load_users()
-        user_role = get_user_role(current_user.id)
+        allowed = accessible_client_ids(current_user)
+        if client_id:
+            allowed = {client_id} & set(allowed)
+        
+        # רק משימות שלא הושלמו (ממתין/בביצוע), החדשות ראשונות
+        rows, next_key = open_tasks_view().select(
+            'quick_update', client_ids=allowed, assignee=assignee, status=status,
+            limit=limit, after=after
+        )
         
         tasks = []
-        for client in data:
-            # בדיקת הרשאות
-            if not is_manager_or_admin(current_user.id, user_role):
-                if not can_user_access_client(current_user.id, user_role, client):
-                    continue
+        for row in rows:
+            # קבלת שם המשתמש האחראי
+            assignee_id = row['assignee']
+            assignee_name = users.get(assignee_id, {}).get('name', assignee_id) if assignee_id else 'ללא אחראי'
             
-            client_name = client.get('name', '')
-            for project in client.get('projects', []):
-                project_title = project.get('title', '')
-                for task in project.get('tasks', []):
-                    # רק משימות שלא הושלמו
-                    task_status = task.get('status', 'ממתין')
-                    if task_status not in ['ממתין', 'בביצוע']:
-                        continue
-                    
-                    # קבלת שם המשתמש האחראי
-                    assignee_id = task.get('assignee', '') or task.get('assigned_to', '')
-                    assignee_name = users.get(assignee_id, {}).get('name', assignee_id) if assignee_id else 'ללא אחראי'
-                    
-                    tasks.append({
-                        'client_id': client.get('id', ''),
-                        'client_name': client_name,
-                        'project_id': project.get('id', ''),
-                        'project_title': project_title,
-                        'task': {
-                            'id': task.get('id', ''),
-                            'desc': task.get('desc', '') or task.get('title', 'ללא כותרת'),
-                            'status': task_status,
-                            'notes': task.get('notes', '') or task.get('note', ''),
-                            'assigned_to_name': assignee_name
-                        }
-                    })
+            tasks.append({
+                'client_id': row['client_id'],
+                'client_name': row['client_name'] or '',
+                'project_id': row['project_id'],
+                'project_title': row['project_title'] or '',
+                'task': {
+                    'id': row['task_id'],
+                    'desc': row['desc'] or row['title'] or 'ללא כותרת',
+                    'status': row['status'] or 'ממתין',
+                    'notes': row['notes'] or row['note'] or '',
+                    'assigned_to_name': assignee_name
+                }
+            })
         
-        return jsonify({'success': True, 'tasks': tasks})
+        return jsonify({'success': True, 'tasks': tasks, 'next_cursor': encode_cursor(next_key)})
+    except PaginationError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         print(f"Error in api_quick_update_tasks: {e}")
         import traceback
@@ -1413,7 +1761,7 @@ def quick_add_task():
         if not assigned_to:
             assigned_to = created_by
         
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         for c in data:
             if c['id'] == client_id:
                 for p in c.get('projects', []):
@@ -1509,7 +1857,7 @@ def quick_add_charge():
                 return jsonify({'success': False, 'error': 'חסרים שדות נדרשים'}), 400
             return redirect(url_for('home'))
         
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         for c in data:
             if c['id'] == client_id:
                 if 'extra_charges' not in c:
@@ -1599,11 +1947,11 @@ def webhook_create_charge():
         return jsonify({'success': False, 'error': 'חסר client_id או client_name'}), 400
 
     try:
-        data = load_data()
         client = None
         if client_id:
-            client = next((c for c in data if c['id'] == client_id), None)
+            client = load_client(client_id)
         else:
+            data = load_data()
             client = next((c for c in data if c.get('name', '').strip() == client_name), None)
             if not client:
                 client = next(
@@ -1650,33 +1998,26 @@ def webhook_create_charge():
 
 @app.route('/api/all_clients')
 @login_required
+@conditional_get('data', 'users', 'permissions')
 def api_all_clients():
     """API endpoint להחזרת לקוחות"""
     try:
         user_role = get_user_role(current_user.id)
-        if not check_permission('/all_clients', user_role):
+        if not authorize(current_user, '/all_clients'):
             return jsonify({'success': False, 'error': 'גישה חסומה'}), 403
         
-        all_clients_data = load_data()
+        all_clients_data = load_client_summaries()
         all_clients_data = filter_active_clients(all_clients_data)
         users = load_users()
         filter_user = request.args.get('user')
         
-        # ארגון לקוחות לפי משתמשים
+        # ארגון לקוחות לפי משתמשים (מהאינדקס, לפי סדר הלקוחות)
+        access_index = load_client_access_index()
+        position = {c['id']: i for i, c in enumerate(all_clients_data)}
         clients_by_user = {}
         for uid in users.keys():
-            clients_by_user[uid] = []
-        
-        for c in all_clients_data:
-            assigned = normalize_assigned_user(c.get('assigned_user', []))
-            for assigned_uid in assigned:
-                assigned_uid_lower = assigned_uid.lower() if isinstance(assigned_uid, str) else str(assigned_uid).lower()
-                for uid in users.keys():
-                    uid_lower = uid.lower() if isinstance(uid, str) else str(uid).lower()
-                    if assigned_uid == uid or assigned_uid_lower == uid_lower:
-                        if c not in clients_by_user[uid]:
-                            clients_by_user[uid].append(c)
-                        break
+            ids = access_index['by_user'].get(uid.lower(), frozenset()) & position.keys()
+            clients_by_user[uid] = [all_clients_data[position[cid]] for cid in sorted(ids, key=position.get)]
         
         if filter_user:
             filter_user_lower = filter_user.lower()
@@ -1717,50 +2058,8 @@ def api_all_clients():
 @app.route('/all_clients')
 @login_required
 def all_clients():
-    user_role = get_user_role(current_user.id)
-    if not check_permission('/all_clients', user_role):
+    if not authorize(current_user, '/all_clients'):
         return "גישה חסומה - אין לך הרשאה לגשת לדף זה", 403
-    all_clients_data = load_data()
-    # סינון לקוחות מאוישים
-    all_clients_data = filter_active_clients(all_clients_data)
-    users = load_users()
-    filter_user = request.args.get('user')
-    
-    # ארגון לקוחות לפי משתמשים
-    clients_by_user = {}
-    for uid in users.keys():
-        clients_by_user[uid] = []
-    
-    for c in all_clients_data:
-        assigned = normalize_assigned_user(c.get('assigned_user', []))
-        
-        # הוסף את הלקוח לכל המשתמשים המשויכים (case-insensitive)
-        for assigned_uid in assigned:
-            assigned_uid_lower = assigned_uid.lower() if isinstance(assigned_uid, str) else str(assigned_uid).lower()
-            # מצא את המשתמש הנכון (case-insensitive)
-            for uid in users.keys():
-                uid_lower = uid.lower() if isinstance(uid, str) else str(uid).lower()
-                if assigned_uid == uid or assigned_uid_lower == uid_lower:
-                    if c not in clients_by_user[uid]:
-                        clients_by_user[uid].append(c)
-                    break
-    
-    # אם יש סינון לפי משתמש ספציפי, החזר רק את הלקוחות שלו
-    if filter_user:
-        filter_user_lower = filter_user.lower()
-        filtered_clients = []
-        for uid, client_list in clients_by_user.items():
-            uid_lower = uid.lower() if isinstance(uid, str) else str(uid).lower()
-            if uid == filter_user or uid_lower == filter_user_lower:
-                filtered_clients = client_list
-                break
-        # מיון לפי שם
-        filtered_clients.sort(key=lambda x: x.get('name', '').lower())
-        clients = filtered_clients
-    else:
-        clients = all_clients_data
-        clients.sort(key=lambda x: x.get('name', '').lower())
-    
     # Redirect to React
     return redirect('/app/clients')
 
@@ -1769,11 +2068,9 @@ def all_clients():
 def project_gantt(client_id, project_id):
     """עמוד תרשים גאנט לפרויקט"""
     user_role = get_user_role(current_user.id)
-    if not check_permission('/client/', user_role):
+    if not authorize(current_user, '/client/'):
         return "גישה חסומה - אין לך הרשאה לגשת לדף זה", 403
-    data = load_data()
-    users = load_users()
-    client = next((c for c in data if c['id'] == client_id), None)
+    client = load_client(client_id)
     if not client:
         return "לקוח לא נמצא", 404
     
@@ -1791,82 +2088,60 @@ def project_gantt(client_id, project_id):
     if not project:
         return "פרויקט לא נמצא", 404
     
-    # חישוב תאריכי יעד אוטומטיים על בסיס תלויות
-    calculate_dependent_deadlines_for_project(project)
-    
-    # הכנת נתוני משימות לתרשים גאנט
-    tasks_data = []
-    for task in project.get('tasks', []):
-        deadline = task.get('deadline', '')
-        start_date = task.get('created_at', datetime.now().isoformat())
-        if 'T' in start_date:
-            start_date = start_date.split('T')[0]
-        if 'T' in deadline:
-            deadline = deadline.split('T')[0]
-        
-        tasks_data.append({
-            'id': task.get('id'),
-            'title': task.get('title', 'ללא שם'),
-            'start_date': start_date,
-            'deadline': deadline,
-            'created_at': task.get('created_at', ''),
-            'status': task.get('status', 'לביצוע'),
-            'priority': task.get('priority', 'medium'),
-            'assignee': task.get('assignee', ''),
-            'dependencies': task.get('dependencies', []),
-            'estimated_hours': task.get('estimated_hours', 8),
-            'progress': 100 if task.get('status') == 'הושלם' else 0
-        })
-    
-    # Redirect to React client page
+    # Redirect to React client page (לוח הזמנים עצמו - /api/project/<client_id>/<project_id>/schedule)
     return redirect(f'/app/client/{client_id}')
 
-def calculate_dependent_deadlines_for_project(project):
-    """מחשב תאריכי יעד אוטומטיים למשימות בפרויקט על בסיס תלויות"""
-    tasks = project.get('tasks', [])
-    task_dict = {t['id']: t for t in tasks}
-    
-    # עבור כל משימה, בדוק אם יש תלויות וחשב תאריך יעד
-    for task in tasks:
-        dependencies = task.get('dependencies', [])
-        if dependencies and not task.get('deadline'):
-            # מצא את התאריך המקסימלי מתוך התלויות
-            max_deadline = None
-            for dep_id in dependencies:
-                dep_task = task_dict.get(dep_id)
-                if dep_task:
-                    dep_deadline = dep_task.get('deadline') or dep_task.get('created_at')
-                    if dep_deadline:
-                        try:
-                            if 'T' in dep_deadline:
-                                dep_date = datetime.fromisoformat(dep_deadline.split('T')[0])
-                            else:
-                                dep_date = datetime.fromisoformat(dep_deadline)
-                            
-                            if not max_deadline or dep_date > max_deadline:
-                                max_deadline = dep_date
-                        except:
-                            continue
-            
-            # אם יש תאריך מקסימלי, הוסף ימים משוערים
-            if max_deadline:
-                estimated_hours = task.get('estimated_hours', 8)
-                # הנחה: 8 שעות = יום עבודה אחד
-                estimated_days = max(1, int(estimated_hours / 8))
-                new_deadline = max_deadline + timedelta(days=estimated_days)
-                task['deadline'] = new_deadline.isoformat().split('T')[0]
+@app.route('/api/project/<client_id>/<project_id>/schedule')
+@login_required
+def api_project_schedule(client_id, project_id):
+    """לוח הזמנים של פרויקט לפי תלויות: תאריכי התחלה/סיום, תאריכי יעד מחושבים,
+    הנתיב הקריטי ומעגלי תלויות (ראו backend/utils/schedule)"""
+    try:
+        if not authorize(current_user, '/client/'):
+            return jsonify({'success': False, 'error': 'גישה חסומה'}), 403
+        if client_id not in accessible_client_ids(current_user):
+            return jsonify({'success': False, 'error': 'גישה חסומה ללקוח זה'}), 403
+        
+        def load_project():
+            client = load_client(client_id) or {}
+            return next((p for p in client.get('projects', []) if p.get('id') == project_id), None)
+        
+        # במטמון לפי גרסת הנתונים - הלקוח נטען רק כשצריך לבנות מחדש
+        schedule = get_project_schedule(client_id, project_id, load_project, get_next_workday)
+        if schedule is None:
+            return jsonify({'success': False, 'error': 'פרויקט לא נמצא'}), 404
+        return jsonify({'success': True, 'schedule': schedule.to_dict()})
+    except Exception as e:
+        print(f"Error in api_project_schedule: {e}")
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/api/client/<client_id>')
 @login_required
 def api_client(client_id):
-    """API endpoint להחזרת פרטי לקוח"""
+    """API endpoint להחזרת פרטי לקוח.
+    fields= / include= (ראו backend/utils/client_view) מחזירים רק את הכותרת
+    והחלקים שהתבקשו, למשל include=projects.summary,charges.open,activities.limit=20"""
     try:
         user_role = get_user_role(current_user.id)
-        if not check_permission('/client/', user_role):
+        if not authorize(current_user, '/client/'):
             return jsonify({'success': False, 'error': 'גישה חסומה'}), 403
         
-        data = load_data()
-        client = next((c for c in data if c['id'] == client_id), None)
+        view = parse_client_view(request.args.get('fields'), request.args.get('include'))
+        if view is not None:
+            client = load_client_view(client_id, view)
+            if not client:
+                return jsonify({'success': False, 'error': 'לקוח לא נמצא'}), 404
+            if client_id not in accessible_client_ids(current_user):
+                return jsonify({'success': False, 'error': 'גישה חסומה ללקוח זה'}), 403
+            client_data = shape_client(client, view)
+            if view.include_activities:
+                client_data['activities'] = load_client_activity_logs(client_id, limit=view.activities_limit or None)
+            return jsonify({
+                'success': True,
+                'client': client_data
+            })
+        
+        client = load_client(client_id)
         if not client:
             return jsonify({'success': False, 'error': 'לקוח לא נמצא'}), 404
         
@@ -1875,9 +2150,7 @@ def api_client(client_id):
             return jsonify({'success': False, 'error': 'גישה חסומה ללקוח זה'}), 403
         
         # טעינת היסטוריית אינטראקציות
-        activity_logs = load_activity_logs()
-        client_activities = [log for log in activity_logs if log.get('client_id') == client_id]
-        client_activities.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+        client_activities = load_client_activity_logs(client_id)
         
         # Add activities to client
         client_copy = client.copy()
@@ -1887,6 +2160,8 @@ def api_client(client_id):
             'success': True,
             'client': client_copy
         })
+    except ClientViewError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         print(f"Error in api_client: {e}")
         import traceback
@@ -1897,10 +2172,9 @@ def api_client(client_id):
 @login_required
 def client_page(client_id):
     user_role = get_user_role(current_user.id)
-    if not check_permission('/client/', user_role):
+    if not authorize(current_user, '/client/'):
         return "גישה חסומה - אין לך הרשאה לגשת לדף זה", 403
-    data = load_data(); users = load_users()
-    client = next((c for c in data if c['id'] == client_id), None)
+    client = load_client(client_id); users = load_users()
     if not client:
         return "לקוח לא נמצא", 404
     
@@ -1939,9 +2213,7 @@ def client_page(client_id):
     assigned_name = ', '.join(assigned_names) if assigned_names else 'לא שויך'
     
     # טעינת היסטוריית אינטראקציות
-    activity_logs = load_activity_logs()
-    client_activities = [log for log in activity_logs if log.get('client_id') == client_id]
-    client_activities.sort(key=lambda x: x.get('timestamp', ''), reverse=True)
+    client_activities = load_client_activity_logs(client_id)
     
     # Cache busting עבור לוגו - הוספת timestamp
     logo_cache_bust = int(datetime.now().timestamp())
@@ -2027,7 +2299,7 @@ def upload_logo(client_id):
         print(f"File size: {os.path.getsize(filepath)} bytes")
         
         # עדכון בבסיס הנתונים
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         client_found = False
         for c in data:
             if c['id'] == client_id:
@@ -2071,7 +2343,7 @@ def upload_logo(client_id):
 @csrf.exempt
 def add_project(client_id):
     try:
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         project_id = str(uuid.uuid4())
         
         # תמיכה ב-JSON וב-form
@@ -2160,7 +2432,7 @@ def add_project(client_id):
 @csrf.exempt
 def add_task(client_id, project_id):
     try:
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         # Support both form and JSON
         if request.is_json:
             req_data = request.get_json()
@@ -2254,7 +2526,7 @@ def add_task(client_id, project_id):
 @csrf.exempt  # פטור מ-CSRF כי זה API call מ-JavaScript
 def update_task_status(client_id, project_id, task_id):
     try:
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         # Support both form and JSON
         if request.is_json:
             new_status = request.json.get('status', 'לביצוע')
@@ -2269,6 +2541,7 @@ def update_task_status(client_id, project_id, task_id):
                     if p['id'] == project_id:
                         for t in p.get('tasks', []):
                             if t['id'] == task_id:
+                                before = dict(t)
                                 # בדיקת תלויות - אם מנסים להשלים משימה
                                 if new_status == 'הושלם':
                                     dependencies = t.get('dependencies', [])
@@ -2335,7 +2608,7 @@ def update_task_status(client_id, project_id, task_id):
                                         t['done'] = False
                                         del t['completed_at']  # הסר את תאריך ההשלמה
                                 
-                                save_client(c)
+                                save_task(client_id, project_id, t, before)
                                 return jsonify({
                                     'status': 'success',
                                     'message': 'סטטוס המשימה עודכן',
@@ -2350,7 +2623,7 @@ def update_task_status(client_id, project_id, task_id):
 def get_task(client_id, project_id, task_id):
     """Route להחזרת פרטי משימה"""
     try:
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         for c in data:
             if c['id'] == client_id:
                 for p in c.get('projects', []):
@@ -2376,7 +2649,7 @@ def get_task(client_id, project_id, task_id):
 def update_task_dates(client_id, project_id, task_id):
     """עדכון תאריכי משימה (מ-Gantt)"""
     try:
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         req_data = request.get_json()
         start_date = req_data.get('start_date')
         deadline = req_data.get('deadline')
@@ -2390,13 +2663,14 @@ def update_task_dates(client_id, project_id, task_id):
                     if p['id'] == project_id:
                         for t in p.get('tasks', []):
                             if t['id'] == task_id:
+                                before = dict(t)
                                 # עדכן תאריכים
                                 if start_date:
                                     t['created_at'] = datetime.fromisoformat(start_date.split('T')[0] + 'T00:00:00').isoformat() if 'T' not in start_date else datetime.fromisoformat(start_date).isoformat()
                                 if deadline:
                                     t['deadline'] = deadline.split('T')[0] if 'T' in deadline else deadline
                                 
-                                save_client(c)
+                                save_task(client_id, project_id, t, before)
                                 return jsonify({'status': 'success', 'message': 'תאריכים עודכנו בהצלחה'})
         
         return jsonify({'status': 'error', 'error': 'משימה לא נמצאה'}), 404
@@ -2407,7 +2681,7 @@ def update_task_dates(client_id, project_id, task_id):
 @login_required
 def update_task(client_id, project_id, task_id):
     try:
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         
         # תמיכה ב-JSON וב-form
         if request.is_json:
@@ -2424,6 +2698,7 @@ def update_task(client_id, project_id, task_id):
                     if p['id'] == project_id:
                         for t in p.get('tasks', []):
                             if t['id'] == task_id:
+                                before = dict(t)
                                 if status:
                                     old_status = t.get('status', 'pending')
                                     t['status'] = status
@@ -2454,7 +2729,7 @@ def update_task(client_id, project_id, task_id):
                                 if notes is not None:
                                     t['note'] = notes
                                 
-                                save_client(c)
+                                save_task(client_id, project_id, t, before)
                                 
                                 # בדיקה אם זה AJAX request
                                 wants_json = request.headers.get('Accept', '').find('application/json') != -1 or \
@@ -2487,7 +2762,7 @@ def update_task(client_id, project_id, task_id):
 @login_required
 def update_task_note(client_id, project_id, task_id):
     try:
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         note = request.json.get('note', '')
         for c in data:
             if c['id'] == client_id:
@@ -2495,8 +2770,9 @@ def update_task_note(client_id, project_id, task_id):
                     if p['id'] == project_id:
                         for t in p.get('tasks', []):
                             if t['id'] == task_id:
+                                before = dict(t)
                                 t['note'] = note
-                                save_client(c)
+                                save_task(client_id, project_id, t, before)
                                 return jsonify({'success': True})
         return jsonify({'success': False, 'error': 'משימה לא נמצאה'}), 404
     except Exception as e:
@@ -2507,7 +2783,7 @@ def update_task_note(client_id, project_id, task_id):
 def delete_project(client_id, project_id):
     try:
         print(f"Delete project called: client_id={client_id}, project_id={project_id}")
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         for c in data:
             if c['id'] == client_id:
                 # שמור את הפרויקט בארכיון במקום למחוק אותו
@@ -2555,7 +2831,7 @@ def delete_project(client_id, project_id):
 @csrf.exempt  # פטור מ-CSRF כי זה API call מ-JavaScript
 def delete_task(client_id, project_id, task_id):
     try:
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         task_found = False
         task_title = None
         
@@ -2586,22 +2862,14 @@ def delete_task(client_id, project_id, task_id):
                 
                 # Cancel any active time tracking sessions for this task
                 try:
-                    time_data = load_time_tracking()
-                    active_sessions = time_data.get('active_sessions', {})
-                    sessions_to_cancel = []
-                    
+                    active_sessions = load_active_sessions()
+
                     for user_id, session in active_sessions.items():
-                        if (session.get('client_id') == client_id and 
-                            session.get('project_id') == project_id and 
+                        if (session.get('client_id') == client_id and
+                            session.get('project_id') == project_id and
                             session.get('task_id') == task_id):
-                            sessions_to_cancel.append(user_id)
-                    
-                    for user_id in sessions_to_cancel:
-                        del active_sessions[user_id]
-                        print(f"Cancelled active time tracking session for user {user_id} on task {task_id}")
-                    
-                    if sessions_to_cancel:
-                        save_time_tracking(time_data)
+                            cancel_session(user_id)
+                            print(f"Cancelled active time tracking session for user {user_id} on task {task_id}")
                 except Exception as time_error:
                     # Don't fail task deletion if time tracking cleanup fails
                     print(f"Warning: Could not clean up time tracking for task {task_id}: {time_error}")
@@ -2652,7 +2920,7 @@ def upload_document(client_id):
         file.save(filepath)
         
         # עדכון הנתונים ב-JSON
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         client_found = False
         for c in data:
             if c['id'] == client_id:
@@ -2696,7 +2964,6 @@ def add_activity(client_id):
         follow_up_date = request.form.get('follow_up_date', '')
         tags = request.form.get('tags', '')
         
-        logs = load_activity_logs()
         new_log = {
             'id': str(uuid.uuid4()),
             'client_id': client_id,
@@ -2711,8 +2978,7 @@ def add_activity(client_id):
             'follow_up_date': follow_up_date,
             'tags': tags
         }
-        logs.append(new_log)
-        save_activity_logs(logs)
+        add_activity_log(new_log)
         
         if request.is_json or request.headers.get('Accept') == 'application/json':
             return jsonify({'success': True, 'activity': new_log})
@@ -2725,9 +2991,7 @@ def add_activity(client_id):
 def delete_activity(activity_id):
     """מחיקת פעילות"""
     try:
-        logs = load_activity_logs()
-        logs = [log for log in logs if log.get('id') != activity_id]
-        save_activity_logs(logs)
+        delete_activity_log(activity_id)
         
         if request.is_json or request.headers.get('Accept') == 'application/json':
             return jsonify({'success': True})
@@ -2740,7 +3004,7 @@ def delete_activity(activity_id):
 def add_contact(client_id):
     """הוספת איש קשר ללקוח"""
     try:
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         for c in data:
             if c['id'] == client_id:
                 if 'contacts' not in c:
@@ -2764,7 +3028,7 @@ def add_contact(client_id):
 def delete_contact(client_id, contact_id):
     """מחיקת איש קשר משל לקוח"""
     try:
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         for c in data:
             if c['id'] == client_id:
                 if 'contacts' in c:
@@ -2825,7 +3089,7 @@ def add_client():
 def delete_document(client_id, doc_id):
     try:
         print(f"DEBUG: delete_document called with client_id={client_id}, doc_id={doc_id}")
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         for c in data:
             if c['id'] == client_id:
                 documents = c.get('documents', [])
@@ -2925,11 +3189,11 @@ def serve_logo(filename):
 
 @app.route('/api/finance')
 @login_required
+@conditional_get('data', 'permissions')
 def api_finance():
     """API endpoint להחזרת נתוני כספים"""
     try:
-        user_role = get_user_role(current_user.id)
-        if not check_permission('/finance', user_role):
+        if not authorize(current_user, '/finance'):
             return jsonify({'success': False, 'error': 'גישה חסומה'}), 403
         
         clients = load_data()
@@ -3011,8 +3275,7 @@ def api_finance():
 @app.route('/finance')
 @login_required
 def finance():
-    user_role = get_user_role(current_user.id)
-    if not check_permission('/finance', user_role):
+    if not authorize(current_user, '/finance'):
         return "גישה חסומה - אין לך הרשאה לגשת לדף זה", 403
     clients = load_data()
     # סינון לקוחות מאוישים
@@ -3078,7 +3341,7 @@ def finance():
 @login_required
 @csrf.exempt  # פטור מ-CSRF כי זה API call מ-JavaScript
 def update_finance(client_id):
-    action, data = request.form.get('action'), load_data()
+    action, data = request.form.get('action'), load_clients_by_ids([client_id])
     wants_json = request.headers.get('Accept', '').find('application/json') != -1 or \
                 request.headers.get('X-Requested-With') == 'XMLHttpRequest'
     
@@ -3125,8 +3388,7 @@ def update_finance(client_id):
 def generate_invoice(client_id):
     """Route ליצירת דו"ח חיוב ב-Excel"""
     try:
-        data = load_data()
-        client = next((c for c in data if c['id'] == client_id), None)
+        client = load_client(client_id)
         if not client:
             return "לקוח לא נמצא", 404
         
@@ -3267,7 +3529,7 @@ def generate_invoice(client_id):
 def toggle_charge_status(client_id, charge_id):
     """עדכון סטטוס חיוב (completed/paid)"""
     try:
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         for c in data:
             if c['id'] == client_id:
                 for charge in c.get('extra_charges', []):
@@ -3293,7 +3555,7 @@ def toggle_retainer_status(client_id, month):
         if normalized_month.isdigit():
             normalized_month = normalized_month.zfill(2)
 
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         for c in data:
             if c['id'] == client_id:
                 if 'retainer_payments' not in c:
@@ -3327,7 +3589,7 @@ def toggle_retainer_status(client_id, month):
 def update_charge_our_cost(client_id, charge_id):
     """עדכון עלות פנימית של חיוב"""
     try:
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         if request.is_json:
             our_cost = float(request.json.get('our_cost', 0) or 0)
         else:
@@ -3355,7 +3617,7 @@ def update_charge_our_cost(client_id, charge_id):
 def delete_charge(client_id, charge_id):
     """מחיקת חיוב מלקוח. מחזיר JSON להתאמה ל-SPA."""
     try:
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         for c in data:
             if c['id'] == client_id:
                 charges = c.get('extra_charges', [])
@@ -3375,7 +3637,7 @@ def archive_client(client_id):
         if not is_manager_or_admin(current_user.id, user_role):
             return jsonify({'success': False, 'error': 'גישה חסומה - אין לך הרשאה לבצע פעולה זו'}), 403
 
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         for c in data:
             if c['id'] == client_id:
                 c['archived'] = True
@@ -3400,7 +3662,7 @@ def toggle_client_active(client_id):
         data = request.get_json()
         is_active = data.get('active', True)
         
-        data_clients = load_data()
+        data_clients = load_clients_by_ids([client_id])
         for c in data_clients:
             if c['id'] == client_id:
                 if is_active:
@@ -3426,20 +3688,23 @@ def api_archive():
     """API endpoint להחזרת לקוחות מאוישים"""
     try:
         user_role = get_user_role(current_user.id)
-        if not check_permission('/archive', user_role):
+        if not authorize(current_user, '/archive'):
             return jsonify({'success': False, 'error': 'גישה חסומה'}), 403
         
         if not is_manager_or_admin(current_user.id, user_role):
             return jsonify({'success': False, 'error': 'גישה חסומה'}), 403
         
-        all_clients = load_data()
-        archived_clients = filter_archived_clients(all_clients)
-        archived_clients.sort(key=lambda x: x.get('archived_at', ''), reverse=True)
+        # מיון לפי תאריך ארכיון (החדש ביותר ראשון), בעמודים אם התבקש limit
+        limit, after = page_args()
+        archived_clients, next_key = load_archived_clients_page(limit, after)
         
         return jsonify({
             'success': True,
-            'clients': archived_clients
+            'clients': archived_clients,
+            'next_cursor': encode_cursor(next_key)
         })
+    except PaginationError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -3448,7 +3713,7 @@ def api_archive():
 def archive():
     """דף ארכיון לקוחות"""
     user_role = get_user_role(current_user.id)
-    if not check_permission('/archive', user_role):
+    if not authorize(current_user, '/archive'):
         return "גישה חסומה - אין לך הרשאה לגשת לדף זה", 403
     
     # רק מנהל ואדמין יכולים לראות את הארכיון
@@ -3468,7 +3733,7 @@ def archive():
 def events_archive():
     """דף ארכיון אירועים"""
     user_role = get_user_role(current_user.id)
-    if not check_permission('/events', user_role):
+    if not authorize(current_user, '/events'):
         return "גישה חסומה - אין לך הרשאה לגשת לדף זה", 403
     
     # רק מנהל ואדמין יכולים לראות את הארכיון
@@ -3610,26 +3875,32 @@ def export_open_charges():
 # --- Suppliers Routes ---
 @app.route('/api/suppliers')
 @login_required
+@conditional_get('suppliers', 'permissions')
 def api_suppliers():
     """API endpoint להחזרת ספקים"""
     try:
-        user_role = get_user_role(current_user.id)
-        if not check_permission('/suppliers', user_role):
+        if not authorize(current_user, '/suppliers'):
             return jsonify({'success': False, 'error': 'גישה חסומה'}), 403
         
-        suppliers_list = load_suppliers()
+        limit, after = page_args()
+        if limit is None:
+            suppliers_list, next_key = load_suppliers(), None
+        else:
+            suppliers_list, next_key = load_suppliers_page(limit, after)
         return jsonify({
             'success': True,
-            'suppliers': suppliers_list
+            'suppliers': suppliers_list,
+            'next_cursor': encode_cursor(next_key)
         })
+    except PaginationError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/suppliers')
 @login_required
 def suppliers():
-    user_role = get_user_role(current_user.id)
-    if not check_permission('/suppliers', user_role):
+    if not authorize(current_user, '/suppliers'):
         return "גישה חסומה - אין לך הרשאה לגשת לדף זה", 403
     suppliers_list = load_suppliers()
     users = load_users()
@@ -3641,7 +3912,6 @@ def suppliers():
 @login_required
 def add_supplier():
     try:
-        suppliers_list = load_suppliers()
         supplier = {
             'id': str(uuid.uuid4()),
             'name': request.form.get('name', ''),
@@ -3652,8 +3922,7 @@ def add_supplier():
             'notes': request.form.get('notes', ''),
             'created_date': datetime.now().strftime('%d/%m/%y')
         }
-        suppliers_list.append(supplier)
-        save_suppliers(suppliers_list)
+        save_supplier(supplier)
         
         if request.is_json or request.headers.get('Accept') == 'application/json':
             return jsonify({'success': True, 'supplier': supplier})
@@ -3676,7 +3945,7 @@ def edit_supplier(supplier_id):
                 s['supplier_type'] = request.form.get('supplier_type', '')
                 s['category'] = request.form.get('category', '')
                 s['notes'] = request.form.get('notes', '')
-                save_suppliers(suppliers_list)
+                save_supplier(s)
                 return redirect(url_for('suppliers'))
         return "ספק לא נמצא", 404
     except Exception as e:
@@ -3697,8 +3966,7 @@ def delete_supplier(supplier_id):
 @login_required
 def supplier_page(supplier_id):
     """עמוד ספק בודד - תיק ספק"""
-    user_role = get_user_role(current_user.id)
-    if not check_permission('/suppliers', user_role):
+    if not authorize(current_user, '/suppliers'):
         return "גישה חסומה - אין לך הרשאה לגשת לדף זה", 403
     
     suppliers_list = load_suppliers()
@@ -3753,7 +4021,7 @@ def upload_supplier_file(supplier_id):
                         'uploaded_by': current_user.id
                     }
                     s['files'].append(file_doc)
-                    save_suppliers(suppliers_list)
+                    save_supplier(s)
                     return redirect(url_for('supplier_page', supplier_id=supplier_id))
             
             return "ספק לא נמצא", 404
@@ -3790,7 +4058,7 @@ def delete_supplier_file(supplier_id, file_id):
                     
                     # מחיקת הרשומה
                     s['files'].remove(file_to_remove)
-                    save_suppliers(suppliers_list)
+                    save_supplier(s)
                     return jsonify({'status': 'success', 'message': 'הקובץ נמחק בהצלחה'})
                 else:
                     return "קובץ לא נמצא", 404
@@ -3823,7 +4091,7 @@ def add_supplier_note(supplier_id):
                     'created_by': current_user.id
                 }
                 s['notes_list'].append(note_doc)
-                save_suppliers(suppliers_list)
+                save_supplier(s)
                 return redirect(url_for('supplier_page', supplier_id=supplier_id))
         
         return "ספק לא נמצא", 404
@@ -3852,7 +4120,7 @@ def delete_supplier_note(supplier_id, note_id):
                 
                 if note_to_remove:
                     s['notes_list'].remove(note_to_remove)
-                    save_suppliers(suppliers_list)
+                    save_supplier(s)
                     return jsonify({'status': 'success', 'message': 'ההערה נמחקה בהצלחה'})
                 else:
                     return "הערה לא נמצאה", 404
@@ -3933,13 +4201,15 @@ def import_suppliers_excel():
 def api_quotes():
     """API endpoint להחזרת הצעות מחיר"""
     try:
-        user_role = get_user_role(current_user.id)
-        if not check_permission('/quotes', user_role):
+        if not authorize(current_user, '/quotes'):
             return jsonify({'success': False, 'error': 'גישה חסומה'}), 403
         
-        quotes_list = load_quotes()
-        clients = load_data()
-        clients_dict = {c['id']: c['name'] for c in clients}
+        limit, after = page_args()
+        if limit is None:
+            quotes_list, next_key = load_quotes(), None
+        else:
+            quotes_list, next_key = load_quotes_page(limit, after)
+        clients_dict = {c['id']: c['name'] for c in load_client_summaries()}
         
         # Add client names to quotes
         for quote in quotes_list:
@@ -3951,16 +4221,18 @@ def api_quotes():
         
         return jsonify({
             'success': True,
-            'quotes': quotes_list
+            'quotes': quotes_list,
+            'next_cursor': encode_cursor(next_key)
         })
+    except PaginationError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @app.route('/quotes')
 @login_required
 def quotes():
-    user_role = get_user_role(current_user.id)
-    if not check_permission('/quotes', user_role):
+    if not authorize(current_user, '/quotes'):
         return "גישה חסומה - אין לך הרשאה לגשת לדף זה", 403
     quotes_list = load_quotes()
     clients = load_data()
@@ -4062,6 +4334,7 @@ def get_chat_conversations():
         messages_list = load_messages()
         users = load_users()
         current_id = current_user.id
+        presence = get_presence(list(users))
         
         # קבל כל השיחות הרלוונטיות למשתמש הנוכחי
         user_conversations = {}
@@ -4084,7 +4357,7 @@ def get_chat_conversations():
                         'last_message': '',
                         'last_message_time': '',
                         'unread_count': 0,
-                        'is_active': is_user_active(other_user)
+                        'is_active': presence.get(other_user, False)
                     }
                 
                 # עדכן הודעה אחרונה
@@ -4112,37 +4385,31 @@ def get_chat_conversations():
 @limiter.exempt  # פטור מ-rate limiting כי זה auto-refresh
 @login_required
 def get_chat_messages(user_id):
-    """מחזיר את כל ההודעות בשיחה עם משתמש מסוים"""
+    """מחזיר את ההודעות בשיחה עם משתמש מסוים.
+    עם limit: העמודים הולכים אחורה מההודעה האחרונה (next_cursor = הודעות ישנות יותר),
+    וההודעות בכל עמוד ממוינות לפי זמן."""
     try:
-        messages_list = load_messages()
-        current_id = current_user.id
-        
-        # סנן הודעות רלוונטיות לשיחה
-        conversation_messages = []
-        for msg in messages_list:
-            from_user = msg.get('from_user')
-            to_user = msg.get('to_user')
-            
-            if (from_user == current_id and to_user == user_id) or \
-               (from_user == user_id and to_user == current_id):
-                conversation_messages.append({
-                    'id': msg.get('id'),
-                    'from_user': from_user,
-                    'to_user': to_user,
-                    'content': msg.get('content', ''),
-                    'created_date': msg.get('created_date', ''),
-                    'read': msg.get('read', False),
-                    'files': msg.get('files', []),
-                    'is_manager_note': msg.get('is_manager_note', False)
-                })
-        
-        # מיון לפי זמן
-        conversation_messages.sort(key=lambda x: x['created_date'])
+        limit, after = page_args()
+        page, next_key = load_conversation_page(current_user.id, user_id, limit, after)
+        
+        conversation_messages = [{
+            'id': msg.get('id'),
+            'from_user': msg.get('from_user'),
+            'to_user': msg.get('to_user'),
+            'content': msg.get('content', ''),
+            'created_date': msg.get('created_date', ''),
+            'read': msg.get('read', False),
+            'files': msg.get('files', []),
+            'is_manager_note': msg.get('is_manager_note', False)
+        } for msg in reversed(page)]
         
         return jsonify({
             'status': 'success',
-            'messages': conversation_messages
+            'messages': conversation_messages,
+            'next_cursor': encode_cursor(next_key)
         })
+    except PaginationError as e:
+        return jsonify({'status': 'error', 'error': str(e)}), 400
     except Exception as e:
         return jsonify({'status': 'error', 'error': str(e)}), 500
 
@@ -4192,7 +4459,6 @@ def send_chat_message():
                     traceback.print_exc()
                     # המשך עם שאר הקבצים
         
-        messages_list = load_messages()
         message = {
             'id': str(uuid.uuid4()),
             'from_user': current_user.id,
@@ -4206,8 +4472,7 @@ def send_chat_message():
             'read': False,
             'files': saved_files if saved_files else []
         }
-        messages_list.append(message)
-        save_messages(messages_list)
+        save_message(message)
         
         return jsonify({
             'status': 'success',
@@ -4251,13 +4516,14 @@ def get_chat_users():
         current_id = current_user.id
         
         # החזר את כל המשתמשים למעט המשתמש הנוכחי
+        presence = get_presence(list(users))
         available_users = []
         for user_id, user_data in users.items():
             if user_id != current_id:
                 available_users.append({
                     'id': user_id,
                     'name': user_data.get('name', user_id),
-                    'is_active': is_user_active(user_id)
+                    'is_active': presence.get(user_id, False)
                 })
         
         return jsonify({
@@ -4307,7 +4573,6 @@ def messages():
 @login_required
 def send_message():
     try:
-        messages_list = load_messages()
         message = {
             'id': str(uuid.uuid4()),
             'from_user': current_user.id,
@@ -4320,8 +4585,7 @@ def send_message():
             'created_date': datetime.now().strftime('%d/%m/%y %H:%M'),
             'read': False
         }
-        messages_list.append(message)
-        save_messages(messages_list)
+        save_message(message)
         return redirect(url_for('messages'))
     except Exception as e:
         return f"שגיאה בשליחת ההודעה: {str(e)}", 500
@@ -4334,7 +4598,7 @@ def mark_message_read(message_id):
         for m in messages_list:
             if m['id'] == message_id and m.get('to_user') == current_user.id:
                 m['read'] = True
-                save_messages(messages_list)
+                save_message(m)
                 break
         return redirect(url_for('messages'))
     except Exception as e:
@@ -4343,15 +4607,15 @@ def mark_message_read(message_id):
 # --- Events Routes ---
 @app.route('/api/events')
 @login_required
+@conditional_get('events', 'data', 'permissions')
 def api_events():
     """API endpoint להחזרת אירועים"""
     try:
-        user_role = get_user_role(current_user.id)
-        if not check_permission('/events', user_role):
+        if not authorize(current_user, '/events'):
             return jsonify({'success': False, 'error': 'גישה חסומה'}), 403
         
         events_list = load_events()
-        clients = load_data()
+        client_names = {c['id']: c.get('name', '') for c in load_client_summaries()}
         events_list = filter_active_events(events_list)
         
         today = datetime.now().date()
@@ -4379,7 +4643,7 @@ def api_events():
         # Add client names
         for event in open_events:
             client_id = event.get('client_id', '')
-            event['client_name'] = next((c.get('name', '') for c in clients if c.get('id') == client_id), '')
+            event['client_name'] = client_names.get(client_id) or ''
         
         return jsonify({
             'success': True,
@@ -4396,8 +4660,7 @@ def api_events():
 def api_event_details(event_id):
     """API endpoint להחזרת פרטי אירוע בודד"""
     try:
-        user_role = get_user_role(current_user.id)
-        if not check_permission('/events', user_role):
+        if not authorize(current_user, '/events'):
             return jsonify({'success': False, 'error': 'גישה חסומה'}), 403
         
         events_list = load_events()
@@ -4406,13 +4669,12 @@ def api_event_details(event_id):
         if not event:
             return jsonify({'success': False, 'error': 'אירוע לא נמצא'}), 404
         
-        clients = load_data()
         suppliers_list = load_suppliers()
         equipment_bank = load_equipment_bank()
         
         # חיבור לקוח לאירוע
         client_id = event.get('client_id', '')
-        client = next((c for c in clients if c.get('id') == client_id), None)
+        client = load_client(client_id)
         event['client'] = client
         event['client_name'] = client.get('name', '') if client else ''
         
@@ -4470,8 +4732,7 @@ def api_event_details(event_id):
 @login_required
 def events():
     """דשבורד אירועים - רשימת אירועים פתוחים"""
-    user_role = get_user_role(current_user.id)
-    if not check_permission('/events', user_role):
+    if not authorize(current_user, '/events'):
         return "גישה חסומה - אין לך הרשאה לגשת לדף זה", 403
     events_list = load_events()
     clients = load_data()
@@ -4515,7 +4776,6 @@ def events():
         client_id = event.get('client_id', '')
         event['client_name'] = next((c.get('name', '') for c in clients if c.get('id') == client_id), 'לא צוין')
     
-    user_role = get_user_role(current_user.id)
     # Redirect to React events page
     return redirect('/app/events')
 
@@ -4529,7 +4789,6 @@ def event_page(event_id):
     if not event:
         return "אירוע לא נמצא", 404
     
-    clients = load_data()
     suppliers_list = load_suppliers()
     equipment_bank = load_equipment_bank()
     users = load_users()
@@ -4539,7 +4798,7 @@ def event_page(event_id):
     
     # חיבור לקוח לאירוע
     client_id = event.get('client_id', '')
-    event['client'] = next((c for c in clients if c.get('id') == client_id), None)
+    event['client'] = load_client(client_id)
     
     # טעינת צ'ק-ליסט לפי סוג האירוע
     event_type = event.get('event_type', '')
@@ -4584,7 +4843,6 @@ def event_page(event_id):
 def add_event():
     """יצירת אירוע חדש"""
     try:
-        events_list = load_events()
         event_type = request.form.get('event_type', '')
         
         # טעינת תבנית צ'ק-ליסט לפי סוג האירוע
@@ -4609,8 +4867,7 @@ def add_event():
             'status': 'active'  # active, completed, cancelled
         }
         
-        events_list.append(event)
-        save_events(events_list)
+        save_event(event)
         wants_json = request.is_json or request.headers.get('Accept', '').find('application/json') != -1 or \
                     request.headers.get('X-Requested-With') == 'XMLHttpRequest'
         if wants_json:
@@ -4637,7 +4894,7 @@ def update_event(event_id):
                 event['location'] = request.form.get('location', event.get('location', ''))
                 event['event_type'] = request.form.get('event_type', event.get('event_type', ''))
                 event['notes'] = request.form.get('notes', event.get('notes', ''))
-                save_events(events_list)
+                save_event(event)
                 tab = request.form.get('tab', 'details')
                 return redirect(url_for('event_page', event_id=event_id, tab=tab))
         return "אירוע לא נמצא", 404
@@ -4655,7 +4912,7 @@ def update_event_checklist(event_id):
                 checklist_data = request.get_json()
                 if checklist_data and 'checklist' in checklist_data:
                     event['checklist'] = checklist_data['checklist']
-                    save_events(events_list)
+                    save_event(event)
                     return jsonify({'success': True})
         return jsonify({'success': False, 'error': 'אירוע לא נמצא'}), 404
     except Exception as e:
@@ -4691,7 +4948,7 @@ def add_checklist_item(event_id):
                 templates[event_type].append(new_item)
                 save_checklist_templates(templates)
         
-        save_events(events_list)
+        save_event(event)
         tab = request.form.get('tab', 'checklist')
         return redirect(url_for('event_page', event_id=event_id, tab=tab))
     except Exception as e:
@@ -4711,7 +4968,7 @@ def remove_checklist_item(event_id, item_index):
             index = int(item_index)
             if 0 <= index < len(event['checklist']):
                 event['checklist'].pop(index)
-                save_events(events_list)
+                save_event(event)
         
         return redirect(url_for('event_page', event_id=event_id))
     except Exception as e:
@@ -4744,8 +5001,7 @@ def add_event_supplier(event_id):
                         'notes': request.form.get('new_supplier_notes', ''),
                         'created_date': datetime.now().strftime('%d/%m/%y')
                     }
-                    suppliers_list.append(new_supplier)
-                    save_suppliers(suppliers_list)
+                    save_supplier(new_supplier)
                     supplier_id = new_supplier['id']
                     supplier = new_supplier
                 else:
@@ -4765,7 +5021,7 @@ def add_event_supplier(event_id):
                         'payment_status': payment_status,  # pending, deposit_paid, fully_paid
                         'notes': request.form.get('notes', '')
                     })
-                    save_events(events_list)
+                    save_event(event)
                 break
         tab = request.form.get('tab', 'suppliers')
         return redirect(url_for('event_page', event_id=event_id, tab=tab))
@@ -4785,7 +5041,7 @@ def remove_event_supplier(event_id, supplier_index):
                 if 0 <= index < len(suppliers):
                     suppliers.pop(index)
                     event['suppliers'] = suppliers
-                    save_events(events_list)
+                    save_event(event)
                 break
         return redirect(url_for('event_page', event_id=event_id))
     except Exception as e:
@@ -4802,7 +5058,7 @@ def update_event_equipment(event_id):
                 equipment_data = request.get_json()
                 if equipment_data and 'equipment' in equipment_data:
                     event['equipment'] = equipment_data['equipment']
-                    save_events(events_list)
+                    save_event(event)
                     return jsonify({'success': True})
         return jsonify({'success': False, 'error': 'אירוע לא נמצא'}), 404
     except Exception as e:
@@ -4835,7 +5091,7 @@ def update_event_management_table(event_id):
                 data = request.get_json()
                 if data and 'management_table' in data:
                     event['management_table'] = data['management_table']
-                    save_events(events_list)
+                    save_event(event)
                     return jsonify({'success': True})
         return jsonify({'success': False, 'error': 'אירוע לא נמצא'}), 404
     except Exception as e:
@@ -4852,7 +5108,7 @@ def update_event_shopping_list(event_id):
                 data = request.get_json()
                 if data and 'shopping_list' in data:
                     event['shopping_list'] = data['shopping_list']
-                    save_events(events_list)
+                    save_event(event)
                     return jsonify({'success': True})
         return jsonify({'success': False, 'error': 'אירוע לא נמצא'}), 404
     except Exception as e:
@@ -5074,7 +5330,6 @@ def add_event_charge(event_id):
     """הוספת חיוב לאירוע - מסנכרן עם לקוח"""
     try:
         events_list = load_events()
-        data = load_data()
         
         for event in events_list:
             if event['id'] == event_id:
@@ -5085,7 +5340,7 @@ def add_event_charge(event_id):
                 our_cost = float(request.form.get('our_cost', 0) or 0)
                 
                 # מצא את הלקוח ליצירת מספר חיוב
-                client_for_charge = next((cl for cl in data if cl['id'] == client_id), None)
+                client_for_charge = load_client(client_id)
                 charge_number = get_next_charge_number(client_for_charge) if client_for_charge else None
                 
                 charge = {
@@ -5114,15 +5369,12 @@ def add_event_charge(event_id):
                 event['charges'].append(charge)
                 
                 # סנכרון עם הלקוח (רק amount, ללא our_cost)
-                for client in data:
-                    if client['id'] == client_id:
-                        if 'extra_charges' not in client:
-                            client['extra_charges'] = []
-                        client['extra_charges'].append(client_charge)
-                        break
+                if client_for_charge:
+                    client_for_charge.setdefault('extra_charges', []).append(client_charge)
                 
-                save_events(events_list)
-                save_client(client)
+                save_event(event)
+                if client_for_charge:
+                    save_client(client_for_charge)
                 break
         tab = request.form.get('tab', 'charges')
         return redirect(url_for('event_page', event_id=event_id, tab=tab))
@@ -5135,7 +5387,6 @@ def edit_event_charge(event_id):
     """עריכת חיוב באירוע"""
     try:
         events_list = load_events()
-        data = load_data()
         charge_id = request.form.get('charge_id')
         
         if not charge_id:
@@ -5157,18 +5408,17 @@ def edit_event_charge(event_id):
                         charge['our_cost'] = our_cost
                         
                         # עדכון החיוב גם בלקוח (רק amount, ללא our_cost)
-                        for client in data:
-                            if client['id'] == client_id:
-                                if 'extra_charges' in client:
-                                    for client_charge in client['extra_charges']:
-                                        if client_charge.get('id') == charge_id:
-                                            client_charge['title'] = charge['title']
-                                            client_charge['amount'] = charge['amount']
-                                            break
-                                break
+                        client = load_client(client_id)
+                        if client:
+                            for client_charge in client.get('extra_charges', []):
+                                if client_charge.get('id') == charge_id:
+                                    client_charge['title'] = charge['title']
+                                    client_charge['amount'] = charge['amount']
+                                    break
                         
-                        save_events(events_list)
-                        save_client(client)
+                        save_event(event)
+                        if client:
+                            save_client(client)
                         break
                 break
         
@@ -5204,13 +5454,14 @@ def toggle_event_active(event_id):
                     event['archived'] = True
                     event['archived_at'] = datetime.now().isoformat()
                 
-                save_events(events_list)
+                save_event(event)
                 return jsonify({'success': True})
         
         return jsonify({'success': False, 'error': 'אירוע לא נמצא'}), 404
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@request_cached('permissions')
 def load_permissions():
     """טעינת הרשאות דפים"""
     if not os.path.exists(PERMISSIONS_FILE):
@@ -5230,15 +5481,17 @@ def load_permissions():
         }
         save_permissions(default_permissions)
         return default_permissions
-    with open(PERMISSIONS_FILE, 'r', encoding='utf-8') as f: 
-        return json.load(f)
+    return read_json(PERMISSIONS_FILE, {})
 
+@write_through('permissions')
 def save_permissions(permissions):
-    with open(PERMISSIONS_FILE, 'w', encoding='utf-8') as f: 
-        json.dump(permissions, f, ensure_ascii=False, indent=4)
+    write_json(PERMISSIONS_FILE, permissions)
+    invalidate_permission_matcher(PERMISSIONS_FILE)
 
 def get_user_role(user_id):
     """מחזיר את התפקיד של המשתמש"""
+    if has_request_context() and current_user.is_authenticated and current_user.id == user_id:
+        return current_user.role
     users = load_users()
     if user_id in users:
         return users[user_id].get('role', 'עובד')
@@ -5270,6 +5523,55 @@ def can_user_access_client(user_id, user_role, client):
             return True
     return False
 
+def save_task(client_id, project_id, task, before):
+    """שמירת משימה אחת: רק השדות שהשתנו מאז before (עותק המשימה לפני העדכון)
+    נכתבים דרך patch_task, במקום save_client שכותב מחדש את כל הלקוח"""
+    changes = {k: v for k, v in task.items() if k not in before or before[k] != v}
+    removed = [k for k in before if k not in task]
+    if changes or removed:
+        patch_task(client_id, project_id, task['id'], changes, removed)
+
+def accessible_client_ids(user):
+    """מזהי הלקוחות שהמשתמש רשאי לגשת אליהם (כולם למנהל/אדמין).
+    סינון הרשאות = בדיקת שייכות לקבוצה במקום סריקת assigned_user של כל לקוח."""
+    role = getattr(user, 'role', None) or get_user_role(user.id)
+    return client_ids_for(load_client_access_index(), user.id, role)
+
+def deadline_index():
+    """אינדקס המשימות עם deadline (ממוין לפי תאריך, לפי אחראי ולפי לקוח).
+    מתעדכן ב-save_client ונבנה מחדש כשהנתונים השתנו בדרך אחרת."""
+    return get_deadline_index(_deadline_task_rows, _archived_client_ids)
+
+def _deadline_task_rows():
+    return query_tasks(has_deadline=True)
+
+def _archived_client_ids():
+    return [c['id'] for c in load_client_summaries() if c.get('archived')]
+
+def open_tasks_view():
+    """תצוגת המשימות הפתוחות (עדכון מהיר / משימות פתוחות למנהל), עם אינדקסים לפי אחראי ולפי לקוח.
+    מתעדכנת ב-save_client ונבנית מחדש כשהנתונים השתנו בדרך אחרת."""
+    return get_open_tasks_view(_open_task_rows, load_client_summaries)
+
+def _open_task_rows():
+    return query_tasks(exclude_status='הושלם')
+
+def _open_tasks_filters():
+    """סינון בצד השרת: client_id, assignee (מזהה משתמש, 'none' = ללא אחראי)"""
+    client_id = request.args.get('client_id') or None
+    assignee = request.args.get('assignee') or None
+    if assignee == 'none':
+        assignee = ''
+    return client_id, assignee
+
+def _iso_day_param(name):
+    """פרמטר תאריך (YYYY-MM-DD או ISO datetime) -> 'YYYY-MM-DD' או None"""
+    value = (request.args.get(name) or '')[:10]
+    if not value:
+        return None
+    datetime.strptime(value, '%Y-%m-%d')  # ValueError -> 400
+    return value
+
 def filter_active_clients(clients):
     """מסנן לקוחות פעילים (לא מאוישים)"""
     return [c for c in clients if not c.get('archived', False)]
@@ -5292,14 +5594,8 @@ def check_permission(route_path, user_role):
     מנהל - רק מנהל ואדמין
     אדמין - רק אדמין
     """
-    permissions = load_permissions()
-    
-    # מצא את ההרשאה המתאימה (תמיד בדוק גם routes שמתחילים ב-route_path)
-    required_role = None
-    for route, role in permissions.items():
-        if route_path == route or route_path.startswith(route):
-            required_role = role
-            break
+    # ה-route הארוך ביותר שהנתיב מתחיל בו (עץ מקומפל, נבנה מחדש רק כשהקובץ משתנה)
+    required_role = get_permission_matcher(PERMISSIONS_FILE, load_permissions).required_role(route_path)
     
     # אם לא נמצא, ברירת מחדל - כולם יכולים
     if not required_role:
@@ -5315,6 +5611,11 @@ def check_permission(route_path, user_role):
     
     return False
 
+def authorize(user, route_path):
+    """האם למשתמש יש הרשאה לדף - תפקיד מה-session והרשאות מהזיכרון, בלי גישה לדיסק"""
+    role = getattr(user, 'role', None) or get_user_role(user.id)
+    return check_permission(route_path, role)
+
 
 @app.route('/api/client_assignment')
 @login_required
@@ -5322,7 +5623,7 @@ def api_client_assignment():
     """API endpoint להחזרת נתונים לשיוך לקוחות - פתוח לכל המשתמשים"""
     try:
         users = load_users()
-        clients = load_data()
+        clients = load_client_summaries()
         clients = filter_active_clients(clients)
         
         users_list = [
@@ -5365,7 +5666,7 @@ def api_client_assignment_assign():
         if not client_id:
             return jsonify({'success': False, 'error': 'לא נבחר לקוח'}), 400
         
-        clients = load_data()
+        clients = load_clients_by_ids([client_id])
         users = load_users()
         client_found = False
         client_name = None
@@ -5401,7 +5702,7 @@ def api_admin_users():
             return jsonify({'success': False, 'error': 'גישה חסומה'}), 403
         
         users = load_users()
-        clients = load_data()
+        clients = load_client_summaries()
         permissions = load_permissions()
         
         all_pages = [
@@ -5487,6 +5788,7 @@ def manage_users():
             if user_id in users:
                 users[user_id]['role'] = new_role
                 save_users(users)
+                invalidate_principals()
                 if request.is_json or request.headers.get('Accept') == 'application/json':
                     return jsonify({'success': True, 'message': 'תפקיד עודכן בהצלחה'})
         elif action == 'update_email':
@@ -5541,6 +5843,7 @@ def manage_users():
                     save_users(users)
 
                 if deleted:
+                    invalidate_principals()
                     for c in clients:
                         if 'assigned_user' in c:
                             if isinstance(c['assigned_user'], list):
@@ -5600,8 +5903,7 @@ def manage_users():
 def api_forms():
     """API endpoint להחזרת טפסים"""
     try:
-        user_role = get_user_role(current_user.id)
-        if not check_permission('/forms', user_role):
+        if not authorize(current_user, '/forms'):
             return jsonify({'success': False, 'error': 'גישה חסומה'}), 403
         
         forms_list = load_forms()
@@ -5624,8 +5926,7 @@ def api_forms():
 @login_required
 def forms():
     """עמוד ניהול טפסים"""
-    user_role = get_user_role(current_user.id)
-    if not check_permission('/forms', user_role):
+    if not authorize(current_user, '/forms'):
         return "גישה חסומה - אין לך הרשאה לגשת לדף זה", 403
     forms_list = load_forms()
     clients = load_data()
@@ -5710,8 +6011,7 @@ def public_form(form_token):
     if not form:
         return "טופס לא נמצא", 404
     
-    clients = load_data()
-    client = next((c for c in clients if c['id'] == form.get('client_id')), None)
+    client = load_client(form.get('client_id'))
     client_name = client['name'] if client else 'לא משויך'
     
     return render_template('public_form.html', form=form, client_name=client_name)
@@ -5790,7 +6090,7 @@ def submit_form(form_token):
                 }
         
         # יצירת משימה חדשה ללקוח
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         task_title = f"טופס התקבל: {form.get('title', '')}"
         
         # בניית תוכן המשימה מנתוני הטופס
@@ -5893,7 +6193,7 @@ def update_event_graphics(event_id):
             graphics_items = json.loads(request.form.get('graphics_items', '[]'))
         
         event['graphics_items'] = graphics_items
-        save_events(events_list)
+        save_event(event)
         
         return jsonify({'success': True})
     except Exception as e:
@@ -5993,88 +6293,24 @@ def export_event_graphics(event_id):
 @app.route('/api/tasks/notifications')
 @login_required
 def get_task_notifications():
-    """מחזיר התראות על משימות עם deadlines קרובים"""
+    """מחזיר התראות על משימות עם deadlines קרובים:
+    urgent - deadline עבר או היום, warning - 1-3 ימים, approaching - 4-7 ימים.
+    הדליים מחושבים פעם ביום ומתעדכנים עם אינדקס ה-deadlines.
+    assignee=<id> או mine=true - רק המשימות של אחראי אחד."""
     try:
-        data = load_data()
-        users = load_users()
-        current_date = datetime.now().date()
-        notifications = {
-            'urgent': [],  # deadline עבר או היום
-            'warning': [],  # 1-3 ימים
-            'approaching': []  # 4-7 ימים
-        }
-        
-        for client in data:
-            client_name = client.get('name', 'ללא שם')
-            for project in client.get('projects', []):
-                project_title = project.get('title', 'ללא שם')
-                for task in project.get('tasks', []):
-                    if task.get('status') != 'הושלם' and task.get('deadline'):
-                        try:
-                            deadline_str = task.get('deadline')
-                            if 'T' in deadline_str:
-                                deadline_date = datetime.fromisoformat(deadline_str).date()
-                            else:
-                                deadline_date = datetime.strptime(deadline_str[:10], '%Y-%m-%d').date()
-                            
-                            days_diff = (deadline_date - current_date).days
-                            
-                            if days_diff < 0:
-                                notifications['urgent'].append({
-                                    'client_id': client.get('id'),
-                                    'client_name': client_name,
-                                    'project_id': project.get('id'),
-                                    'project_title': project_title,
-                                    'task_id': task.get('id'),
-                                    'task_title': task.get('title', 'ללא שם'),
-                                    'deadline': deadline_str,
-                                    'days_overdue': abs(days_diff),
-                                    'priority': task.get('priority', 'medium')
-                                })
-                            elif days_diff == 0:
-                                notifications['urgent'].append({
-                                    'client_id': client.get('id'),
-                                    'client_name': client_name,
-                                    'project_id': project.get('id'),
-                                    'project_title': project_title,
-                                    'task_id': task.get('id'),
-                                    'task_title': task.get('title', 'ללא שם'),
-                                    'deadline': deadline_str,
-                                    'days_overdue': 0,
-                                    'priority': task.get('priority', 'medium')
-                                })
-                            elif days_diff <= 3:
-                                notifications['warning'].append({
-                                    'client_id': client.get('id'),
-                                    'client_name': client_name,
-                                    'project_id': project.get('id'),
-                                    'project_title': project_title,
-                                    'task_id': task.get('id'),
-                                    'task_title': task.get('title', 'ללא שם'),
-                                    'deadline': deadline_str,
-                                    'days_remaining': days_diff,
-                                    'priority': task.get('priority', 'medium')
-                                })
-                            elif days_diff <= 7:
-                                notifications['approaching'].append({
-                                    'client_id': client.get('id'),
-                                    'client_name': client_name,
-                                    'project_id': project.get('id'),
-                                    'project_title': project_title,
-                                    'task_id': task.get('id'),
-                                    'task_title': task.get('title', 'ללא שם'),
-                                    'deadline': deadline_str,
-                                    'days_remaining': days_diff,
-                                    'priority': task.get('priority', 'medium')
-                                })
-                        except Exception as e:
-                            print(f"Error processing deadline for task {task.get('id')}: {e}")
-                            continue
+        assignee = request.args.get('assignee') or None
+        if request.args.get('mine', 'false').lower() == 'true':
+            assignee = current_user.id
+        notifications = get_deadline_buckets(
+            _deadline_task_rows, _archived_client_ids,
+            day=datetime.now().date(),
+            assignee=assignee
+        )
         
         return jsonify({
             'status': 'success',
             'notifications': notifications,
-            'total': len(notifications['urgent']) + len(notifications['warning']) + len(notifications['approaching'])
+            'total': sum(len(items) for items in notifications.values())
         })
     except Exception as e:
         return jsonify({'status': 'error', 'error': str(e)}), 500
@@ -6087,48 +6323,55 @@ def admin_open_tasks():
         return jsonify({'error': 'גישה חסומה'}), 403
     
     try:
-        data = load_data()
+        limit, after = page_args()
+        client_id, assignee = _open_tasks_filters()
+        status = request.args.get('status') or None
         users = load_users()
         
+        # משימות פתוחות (לא הושלמו), החדשות ראשונות לפי זמן היצירה - בעמודים אם התבקש limit
+        rows, next_key = open_tasks_view().select(
+            'admin_open', client_ids={client_id} if client_id else None,
+            assignee=assignee, status=status, limit=limit, after=after
+        )
+        
         open_tasks = []
-        for client in data:
-            # תמיכה ב-list או string ישן
-            assigned_users_list = normalize_assigned_user(client.get('assigned_user', []))
-            
-            # צור רשימת שמות
-            assigned_user_names = [users.get(uid, {}).get('name', uid) for uid in assigned_users_list if uid]
-            assigned_user_name = ', '.join(assigned_user_names) if assigned_user_names else 'לא שויך'
+        assignment_by_client = {}
+        for row in rows:
+            if row['client_id'] not in assignment_by_client:
+                # תמיכה ב-list או string ישן
+                assigned_users_list = normalize_assigned_user(row['client_assigned_user'])
+                # צור רשימת שמות
+                assigned_user_names = [users.get(uid, {}).get('name', uid) for uid in assigned_users_list if uid]
+                assigned_user_name = ', '.join(assigned_user_names) if assigned_user_names else 'לא שויך'
+                assignment_by_client[row['client_id']] = (assigned_users_list, assigned_user_name)
+            assigned_users_list, assigned_user_name = assignment_by_client[row['client_id']]
             
-            for project in client.get('projects', []):
-                for task in project.get('tasks', []):
-                    # משימות פתוחות (לא הושלמו)
-                    if not task.get('done', False) and task.get('status') != 'הושלם':
-                        # הוסף משימה אחת עם כל המשתמשים
-                        open_tasks.append({
-                            'task_id': task.get('id', ''),
-                            'task_title': task.get('title', 'ללא שם'),
-                            'task_number': task.get('task_number', ''),
-                            'task_status': task.get('status', 'לביצוע'),
-                            'task_note': task.get('note', ''),
-                            'manager_note': task.get('manager_note', ''),
-                            'created_date': task.get('created_date', ''),
-                            'client_id': client.get('id', ''),
-                            'client_name': client.get('name', 'ללא שם'),
-                            'project_id': project.get('id', ''),
-                            'project_title': project.get('title', 'ללא שם'),
-                            'assigned_user': assigned_users_list[0] if assigned_users_list else 'admin',  # משתמש ראשון לתאימות
-                            'assigned_user_name': assigned_user_name,
-                            'assigned_users': assigned_users_list  # רשימה מלאה
-                        })
-        
-        # מיון לפי תאריך יצירה - החדש ביותר ראשון
-        open_tasks.sort(key=lambda x: x.get('created_date', ''), reverse=True)
+            # הוסף משימה אחת עם כל המשתמשים
+            open_tasks.append({
+                'task_id': row['task_id'],
+                'task_title': row['title'] if row['title'] is not None else 'ללא שם',
+                'task_number': row['task_number'],
+                'task_status': row['status'] if row['status'] is not None else 'לביצוע',
+                'task_note': row['note'],
+                'manager_note': row['manager_note'],
+                'created_date': row['created_date'],
+                'client_id': row['client_id'],
+                'client_name': row['client_name'] if row['client_name'] is not None else 'ללא שם',
+                'project_id': row['project_id'],
+                'project_title': row['project_title'] if row['project_title'] is not None else 'ללא שם',
+                'assigned_user': assigned_users_list[0] if assigned_users_list else 'admin',  # משתמש ראשון לתאימות
+                'assigned_user_name': assigned_user_name,
+                'assigned_users': list(assigned_users_list)  # רשימה מלאה
+            })
         
         return jsonify({
             'success': True,
-            'tasks': open_tasks
+            'tasks': open_tasks,
+            'next_cursor': encode_cursor(next_key)
         })
         
+    except PaginationError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -6142,7 +6385,7 @@ def add_manager_note(client_id, project_id, task_id):
         return jsonify({'error': 'גישה חסומה'}), 403
     
     try:
-        data = load_data()
+        data = load_clients_by_ids([client_id])
         users = load_users()
         messages_list = load_messages()
         
@@ -6154,6 +6397,7 @@ def add_manager_note(client_id, project_id, task_id):
         # מציאת המשימה ועדכון ההערה
         client_found = None
         task_found = None
+        task_before = None
         assigned_users_list = []
         
         for c in data:
@@ -6166,6 +6410,7 @@ def add_manager_note(client_id, project_id, task_id):
                         for t in p.get('tasks', []):
                             if t['id'] == task_id:
                                 task_found = t
+                                task_before = dict(t)
                                 t['manager_note'] = manager_note
                                 # אם יש הערה של מנהל, נוסיף גם timestamp
                                 if manager_note:
@@ -6177,7 +6422,7 @@ def add_manager_note(client_id, project_id, task_id):
         if not task_found:
             return jsonify({'success': False, 'error': 'משימה לא נמצאה'}), 404
         
-        save_client(client_found)
+        save_task(client_id, project_id, task_found, task_before)
         
         # שליחת התראה לכל המשתמשים שויכו ללקוח (אם לא זה admin)
         if assigned_users_list and manager_note and client_found:
@@ -6217,6 +6462,31 @@ def add_manager_note(client_id, project_id, task_id):
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/admin/perf')
+@login_required
+def api_admin_perf():
+    """מדדי ביצועים של ה-worker הנוכחי: זמני תגובה, קריאות load_/save_, SQL ובתים לכל route"""
+    if current_user.id != 'admin':
+        return jsonify({'error': 'גישה חסומה'}), 403
+    stats = get_perf_stats()
+    stats['json_store'] = get_json_store_stats()
+    if USE_DATABASE:
+        stats['client_writes'] = get_client_write_stats()
+    return jsonify(stats)
+
+@app.route('/metrics')
+@limiter.exempt  # נקרא ע"י ה-scraper כל כמה שניות
+@csrf.exempt
+def prometheus_metrics():
+    """אותם מדדים בפורמט Prometheus. עם METRICS_TOKEN - גישה ב-Bearer token, אחרת רק אדמין מחובר"""
+    token = os.environ.get('METRICS_TOKEN')
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return 'Unauthorized', 401
+    elif not (current_user.is_authenticated and current_user.id == 'admin'):
+        return 'Forbidden', 403
+    return app.response_class(render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/admin/stats')
 @login_required
 def admin_stats():
@@ -6225,7 +6495,9 @@ def admin_stats():
         return jsonify({'error': 'גישה חסומה'}), 403
     
     try:
-        data = load_data()
+        clients = load_client_summaries()
+        client_assigned_users = {c['id']: normalize_assigned_user(c.get('assigned_user', [])) for c in clients}
+        client_names = {c['id']: c.get('name') for c in clients}
         users = load_users()
         events_list = load_events()
         
@@ -6242,58 +6514,56 @@ def admin_stats():
         tasks_opened = {i: 0 for i in range(7)}  # 0 = היום, 6 = לפני 6 ימים
         tasks_closed = {i: 0 for i in range(7)}
         
-        for client in data:
+        for row in query_tasks():
             # תמיכה ב-list או string ישן
-            assigned_users_list = normalize_assigned_user(client.get('assigned_user', []))
+            assigned_users_list = client_assigned_users.get(row['client_id'], [])
+            task = row['task']
+            # משימות פעילות (לא הושלמו)
+            if not task.get('done', False) and task.get('status') != 'הושלם':
+                # הוסף את המשימה לכל משתמש שויך
+                for assigned_user in assigned_users_list:
+                    if assigned_user in user_task_counts:
+                        user_task_counts[assigned_user] += 1
             
-            for project in client.get('projects', []):
-                for task in project.get('tasks', []):
-                    # משימות פעילות (לא הושלמו)
-                    if not task.get('done', False) and task.get('status') != 'הושלם':
-                        # הוסף את המשימה לכל משתמש שויך
-                        for assigned_user in assigned_users_list:
-                            if assigned_user in user_task_counts:
-                                user_task_counts[assigned_user] += 1
-                    
-                    # תאריך יצירה
-                    created_at = task.get('created_at')
-                    if created_at:
-                        try:
-                            created_dt = datetime.fromisoformat(created_at.replace('Z', '+00:00') if 'Z' in created_at else created_at)
+            # תאריך יצירה
+            created_at = task.get('created_at')
+            if created_at:
+                try:
+                    created_dt = datetime.fromisoformat(created_at.replace('Z', '+00:00') if 'Z' in created_at else created_at)
+                    if created_dt >= seven_days_ago:
+                        days_ago = (datetime.now() - created_dt).days
+                        if 0 <= days_ago < 7:
+                            tasks_opened[days_ago] += 1
+                except:
+                    pass
+            elif task.get('created_date'):
+                try:
+                    date_str = task['created_date']
+                    if '/' in date_str:
+                        parts = date_str.split('/')
+                        if len(parts) == 3:
+                            day, month, year = parts
+                            year = '20' + year if len(year) == 2 else year
+                            created_dt = datetime(int(year), int(month), int(day))
                             if created_dt >= seven_days_ago:
                                 days_ago = (datetime.now() - created_dt).days
                                 if 0 <= days_ago < 7:
                                     tasks_opened[days_ago] += 1
-                        except:
-                            pass
-                    elif task.get('created_date'):
-                        try:
-                            date_str = task['created_date']
-                            if '/' in date_str:
-                                parts = date_str.split('/')
-                                if len(parts) == 3:
-                                    day, month, year = parts
-                                    year = '20' + year if len(year) == 2 else year
-                                    created_dt = datetime(int(year), int(month), int(day))
-                                    if created_dt >= seven_days_ago:
-                                        days_ago = (datetime.now() - created_dt).days
-                                        if 0 <= days_ago < 7:
-                                            tasks_opened[days_ago] += 1
-                        except:
-                            pass
-                    
-                    # תאריך סגירה
-                    completed_at = task.get('completed_at')
-                    if completed_at:
-                        try:
-                            completed_dt = datetime.fromisoformat(completed_at.replace('Z', '+00:00') if 'Z' in completed_at else completed_at)
-                            if completed_dt >= seven_days_ago:
-                                days_ago = (datetime.now() - completed_dt).days
-                                if 0 <= days_ago < 7:
-                                    tasks_closed[days_ago] += 1
-                        except:
-                            pass
-        
+                except:
+                    pass
+            
+            # תאריך סגירה
+            completed_at = task.get('completed_at')
+            if completed_at:
+                try:
+                    completed_dt = datetime.fromisoformat(completed_at.replace('Z', '+00:00') if 'Z' in completed_at else completed_at)
+                    if completed_dt >= seven_days_ago:
+                        days_ago = (datetime.now() - completed_dt).days
+                        if 0 <= days_ago < 7:
+                            tasks_closed[days_ago] += 1
+                except:
+                    pass
+
         # בניית נתונים לעובדים
         user_loads = []
         for uid, count in user_task_counts.items():
@@ -6334,7 +6604,7 @@ def admin_stats():
                     if today <= event_date <= thirty_days_later:
                         # מציאת שם הלקוח
                         client_id = event.get('client_id', '')
-                        client_name = next((c.get('name', 'לא צוין') for c in data if c.get('id') == client_id), 'לא צוין')
+                        client_name = client_names.get(client_id, 'לא צוין')
                         
                         upcoming_events.append({
                             'id': event.get('id', ''),
@@ -6367,8 +6637,7 @@ def admin_stats():
 def api_admin_dashboard():
     """API endpoint להחזרת נתוני דשבורד מנהלים"""
     try:
-        user_role = get_user_role(current_user.id)
-        if not check_permission('/admin/dashboard', user_role):
+        if not authorize(current_user, '/admin/dashboard'):
             return jsonify({'success': False, 'error': 'גישה חסומה'}), 403
         
         data = load_data()
@@ -6376,6 +6645,8 @@ def api_admin_dashboard():
         events_list = load_events()
         
         # חישוב סטטיסטיקות משימות לפי עובד
+        access_index = load_client_access_index()
+        clients_by_id = {c.get('id'): c for c in data}
         task_stats = []
         for uid, user_info in users.items():
             if uid == 'admin':
@@ -6385,8 +6656,9 @@ def api_admin_dashboard():
             completed_tasks = 0
             pending_tasks = 0
             
-            for client in data:
-                if not can_user_access_client(uid, user_info.get('role', 'עובד'), client):
+            for client_id in client_ids_for(access_index, uid, user_info.get('role', 'עובד')):
+                client = clients_by_id.get(client_id)
+                if client is None:
                     continue
                 
                 for project in client.get('projects', []):
@@ -6432,34 +6704,20 @@ def api_admin_dashboard():
         total_clients = len(active_clients)
         active_projects = sum(len(c.get('projects', [])) for c in active_clients)
         
-        # אירועי לוח שנה
-        calendar_events = []
-        for client in active_clients:
-            for project in client.get('projects', []):
-                for task in project.get('tasks', []):
-                    deadline = task.get('deadline', '')
-                    if deadline:
-                        try:
-                            if '/' in deadline:
-                                parts = deadline.split('/')
-                                if len(parts) == 3:
-                                    event_date = datetime.strptime(deadline, '%d/%m/%Y').strftime('%Y-%m-%d')
-                                else:
-                                    event_date = datetime.strptime(deadline, '%d/%m/%y').strftime('%Y-%m-%d')
-                            else:
-                                event_date = deadline
-                            
-                            calendar_events.append({
-                                'title': task.get('title', 'ללא כותרת'),
-                                'start': event_date,
-                                'color': get_task_status_color(task.get('status', '')),
-                                'extendedProps': {
-                                    'client_name': client.get('name', ''),
-                                    'project_title': project.get('title', ''),
-                                }
-                            })
-                        except:
-                            pass
+        # אירועי לוח שנה (לקוחות פעילים) - מאינדקס ה-deadlines
+        calendar_events = [
+            {
+                'title': entry['title'] if entry['title'] is not None else 'ללא כותרת',
+                'start': entry['date'],
+                'color': get_task_status_color(entry['status'] or ''),
+                'extendedProps': {
+                    'client_name': entry['client_name'] or '',
+                    'project_title': entry['project_title'] or '',
+                }
+            }
+            for entry in deadline_index().query()
+            if not entry['archived']
+        ]
         
         return jsonify({
             'success': True,
@@ -6490,8 +6748,7 @@ def get_task_status_color(status: str) -> str:
 @login_required
 def admin_dashboard():
     """דשבורד מנהל"""
-    user_role = get_user_role(current_user.id)
-    if not check_permission('/admin/dashboard', user_role):
+    if not authorize(current_user, '/admin/dashboard'):
         return "גישה חסומה - אין לך הרשאה לגשת לדף זה", 403
     
     users = load_users()
@@ -6520,10 +6777,9 @@ def _now_for_start(start_dt):
         return datetime.now(timezone.utc)
     return datetime.now()
 
-def _drop_stale_active_sessions(time_data):
-    """מסיר מדידות פעילות ישנות (למשל לא נעצרו – דפדפן נסגר). מונע 'מדידה של שעתיים' תמידית."""
-    changed = False
-    sessions = time_data.get('active_sessions', {})
+def _drop_stale_active_sessions(sessions):
+    """מסיר מדידות פעילות ישנות (למשל לא נעצרו – דפדפן נסגר). מונע 'מדידה של שעתיים' תמידית.
+    sessions: {user_id: session} כפי שהוחזר מ-load_active_sessions (מתעדכן במקום)."""
     for user_id, sess in list(sessions.items()):
         try:
             start = _parse_start_time(sess.get('start_time', '') or '')
@@ -6532,11 +6788,9 @@ def _drop_stale_active_sessions(time_data):
             now = _now_for_start(start)
             if (now - start).total_seconds() >= STALE_SESSION_HOURS * 3600:
                 del sessions[user_id]
-                changed = True
+                cancel_session(user_id)
         except Exception:
             pass
-    if changed:
-        save_time_tracking(time_data)
 
 
 def _enrich_time_tracking_session(session, clients_data=None):
@@ -6550,30 +6804,13 @@ def _enrich_time_tracking_session(session, clients_data=None):
         return
     
     client_id = session.get('client_id')
-    client = None
-    
-    # ניסיון לטעון רק את הלקוח הספציפי אם אפשר (Database mode)
-    if USE_DATABASE and client_id:
-        try:
-            from database import get_db, Client as DbClient
-            db = get_db()
-            db_client = db.query(DbClient).filter(DbClient.id == client_id).first()
-            if db_client:
-                client = {
-                    'id': db_client.id,
-                    'name': db_client.name,
-                    'projects': db_client.projects or []
-                }
-            db.close()
-        except Exception:
-            pass
     
-    # Fallback: אם לא הצלחנו או אם זה JSON mode
-    if client is None:
-        if clients_data is None:
-            clients_data = load_data()
+    if clients_data is not None:
         clients_dict = {c['id']: c for c in clients_data}
         client = clients_dict.get(client_id, {})
+    else:
+        # טעינת הלקוח הספציפי בלבד
+        client = load_client(client_id) or {}
     
     session['client_name'] = client.get('name', 'לא ידוע')
     project = None
@@ -6610,12 +6847,12 @@ def api_time_tracking_start():
         if not all([client_id, project_id, task_id]):
             return jsonify({'success': False, 'error': 'חסרים פרמטרים נדרשים'}), 400
         
-        time_data = load_time_tracking()
-        _drop_stale_active_sessions(time_data)
-        
+        active_sessions = load_active_sessions()
+        _drop_stale_active_sessions(active_sessions)
+
         # בדיקה אם יש מדידה פעילה למשתמש זה
-        if user_id in time_data.get('active_sessions', {}):
-            active_session = time_data['active_sessions'][user_id].copy()
+        if user_id in active_sessions:
+            active_session = active_sessions[user_id].copy()
             _enrich_time_tracking_session(active_session)
             return jsonify({
                 'success': False,
@@ -6636,8 +6873,7 @@ def api_time_tracking_start():
             'start_time': start_time,
         }
         
-        time_data.setdefault('active_sessions', {})[user_id] = session
-        save_time_tracking(time_data)
+        start_session(session)
         
         return jsonify({
             'success': True,
@@ -6659,12 +6895,10 @@ def api_time_tracking_stop():
         user_id = current_user.id
         note = data.get('note', '')
         
-        time_data = load_time_tracking()
-        
-        if user_id not in time_data.get('active_sessions', {}):
+        session = load_active_sessions().get(user_id)
+        if not session:
             return jsonify({'success': False, 'error': 'אין מדידה פעילה'}), 400
-        
-        session = time_data['active_sessions'][user_id]
+
         start_dt = _parse_start_time(session.get('start_time', '') or '')
         if start_dt is None:
             return jsonify({'success': False, 'error': 'שגיאה בתאריך התחלה'}), 400
@@ -6687,9 +6921,9 @@ def api_time_tracking_stop():
             'date': start_dt.date().isoformat(),
         }
         
-        time_data.setdefault('entries', []).append(entry)
-        del time_data['active_sessions'][user_id]
-        save_time_tracking(time_data)
+        if not stop_session(user_id, entry):
+            # המדידה נעצרה/בוטלה במקביל (למשל מלשונית אחרת)
+            return jsonify({'success': False, 'error': 'אין מדידה פעילה'}), 400
         
         return jsonify({
             'success': True,
@@ -6708,14 +6942,10 @@ def api_time_tracking_cancel():
     """ביטול מדידת זמן פעילה (ללא שמירה בהיסטוריה)"""
     try:
         user_id = current_user.id
-        time_data = load_time_tracking()
-        
-        if user_id not in time_data.get('active_sessions', {}):
-            return jsonify({'success': False, 'error': 'אין מדידה פעילה'}), 400
-        
+
         # מחיקת המדידה הפעילה ללא שמירה
-        del time_data['active_sessions'][user_id]
-        save_time_tracking(time_data)
+        if not cancel_session(user_id):
+            return jsonify({'success': False, 'error': 'אין מדידה פעילה'}), 400
         
         return jsonify({
             'success': True,
@@ -6735,10 +6965,10 @@ def api_time_tracking_active():
     """קבלת מדידה פעילה של המשתמש הנוכחי"""
     try:
         user_id = current_user.id
-        time_data = load_time_tracking()
-        _drop_stale_active_sessions(time_data)
-        
-        active_session = time_data.get('active_sessions', {}).get(user_id)
+        active_sessions = load_active_sessions()
+        _drop_stale_active_sessions(active_sessions)
+
+        active_session = active_sessions.get(user_id)
         if active_session:
             active_session = dict(active_session)
             _enrich_time_tracking_session(active_session)
@@ -6753,6 +6983,34 @@ def api_time_tracking_active():
         traceback.print_exc()
         return jsonify({'success': False, 'error': str(e)}), 500
 
+def _add_time_entry_names(entries):
+    """מוסיף לרשומות מדידה שמות לקוח/פרויקט/משימה/משתמש.
+    טוען רק את הלקוחות שמופיעים ברשומות. מחזיר {client_id: client}."""
+    client_ids = list({e.get('client_id') for e in entries if e.get('client_id')})
+    clients_dict = {c['id']: c for c in load_clients_by_ids(client_ids)}
+    users = load_users()
+
+    for entry in entries:
+        client = clients_dict.get(entry['client_id'], {})
+        entry['client_name'] = client.get('name', 'לא ידוע')
+
+        # מציאת פרויקט ומשימה
+        project = None
+        task = None
+        for p in client.get('projects', []):
+            if p.get('id') == entry['project_id']:
+                project = p
+                for t in p.get('tasks', []):
+                    if t.get('id') == entry['task_id']:
+                        task = t
+                        break
+                break
+
+        entry['project_title'] = project.get('title', 'לא ידוע') if project else 'לא ידוע'
+        entry['task_title'] = task.get('title', task.get('desc', 'לא ידוע')) if task else 'לא ידוע'
+        entry['user_name'] = users.get(entry['user_id'], {}).get('name', 'לא ידוע')
+    return clients_dict
+
 @app.route('/api/time_tracking/entries', methods=['GET'])
 @login_required
 @csrf.exempt
@@ -6763,58 +7021,27 @@ def api_time_tracking_entries():
         client_id = request.args.get('client_id')  # אופציונלי
         task_id = request.args.get('task_id')  # אופציונלי
         month = request.args.get('month')  # בפורמט YYYY-MM
-        
-        time_data = load_time_tracking()
-        entries = time_data.get('entries', [])
-        
-        # סינון לפי משתמש
-        if user_id:
-            entries = [e for e in entries if e.get('user_id') == user_id]
-        
-        # סינון לפי לקוח
-        if client_id:
-            entries = [e for e in entries if e.get('client_id') == client_id]
-        
-        # סינון לפי משימה
-        if task_id:
-            entries = [e for e in entries if e.get('task_id') == task_id]
-        
-        # סינון לפי חודש
-        if month:
-            entries = [e for e in entries if e.get('date', '').startswith(month)]
-        
-        # מיון לפי תאריך (החדש ביותר ראשון)
-        entries.sort(key=lambda x: x.get('start_time', ''), reverse=True)
-        
+
+        limit, after = page_args()
+
+        # סינון, מיון (החדש ביותר ראשון) ועימוד בצד האחסון - רשומה אחת מעבר לעמוד
+        # מסמנת שיש עמוד הבא
+        entries = query_time_entries(month=month, user_id=user_id, client_id=client_id,
+                                     task_id=task_id, order='desc',
+                                     limit=limit + 1 if limit else None, after=after)
+        entries, next_key = split_page(entries, limit,
+                                       lambda e: sort_key(e.get('start_time'), e.get('id')))
+
         # הוספת שמות לקוחות, פרויקטים ומשימות
-        clients = load_data()
-        users = load_users()
-        clients_dict = {c['id']: c for c in clients}
-        
-        for entry in entries:
-            client = clients_dict.get(entry['client_id'], {})
-            entry['client_name'] = client.get('name', 'לא ידוע')
-            
-            # מציאת פרויקט ומשימה
-            project = None
-            task = None
-            for p in client.get('projects', []):
-                if p.get('id') == entry['project_id']:
-                    project = p
-                    for t in p.get('tasks', []):
-                        if t.get('id') == entry['task_id']:
-                            task = t
-                            break
-                    break
-            
-            entry['project_title'] = project.get('title', 'לא ידוע') if project else 'לא ידוע'
-            entry['task_title'] = task.get('title', task.get('desc', 'לא ידוע')) if task else 'לא ידוע'
-            entry['user_name'] = users.get(entry['user_id'], {}).get('name', 'לא ידוע')
-        
+        _add_time_entry_names(entries)
+
         return jsonify({
             'success': True,
-            'entries': entries
+            'entries': entries,
+            'next_cursor': encode_cursor(next_key)
         })
+    except PaginationError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         print(f"Error in api_time_tracking_entries: {e}")
         import traceback
@@ -6835,20 +7062,12 @@ def api_time_tracking_report():
             # אם לא הוגדר חודש, משתמש בחודש הנוכחי
             month = datetime.now().strftime('%Y-%m')
         
-        time_data = load_time_tracking()
-        entries = time_data.get('entries', [])
-        
-        # סינון לפי חודש
-        entries = [e for e in entries if e.get('date', '').startswith(month)]
-        
-        # סינון לפי משתמש
-        if user_id:
-            entries = [e for e in entries if e.get('user_id') == user_id]
-        
-        # סינון לפי לקוח
-        if client_id:
-            entries = [e for e in entries if e.get('client_id') == client_id]
-        
+        entries = query_time_entries(month=month, user_id=user_id, client_id=client_id, order=None)
+
+        # הוספת שמות לכל הרשומות
+        clients_dict = _add_time_entry_names(entries)
+        users = load_users()
+
         # חישוב סיכומים
         total_hours = sum(e.get('duration_hours', 0) for e in entries)
         
@@ -6871,38 +7090,13 @@ def api_time_tracking_report():
             by_user[uid]['entries'].append(entry)
         
         # הוספת שמות
-        clients = load_data()
-        users = load_users()
-        clients_dict = {c['id']: c for c in clients}
-        
         for cid, data in by_client.items():
             client = clients_dict.get(cid, {})
             data['client_name'] = client.get('name', 'לא ידוע')
-        
+
         for uid, data in by_user.items():
             data['user_name'] = users.get(uid, {}).get('name', 'לא ידוע')
-        
-        # הוספת שמות לכל הרשומות
-        for entry in entries:
-            client = clients_dict.get(entry['client_id'], {})
-            entry['client_name'] = client.get('name', 'לא ידוע')
-            
-            # מציאת פרויקט ומשימה
-            project = None
-            task = None
-            for p in client.get('projects', []):
-                if p.get('id') == entry['project_id']:
-                    project = p
-                    for t in p.get('tasks', []):
-                        if t.get('id') == entry['task_id']:
-                            task = t
-                            break
-                    break
-            
-            entry['project_title'] = project.get('title', 'לא ידוע') if project else 'לא ידוע'
-            entry['task_title'] = task.get('title', task.get('desc', 'לא ידוע')) if task else 'לא ידוע'
-            entry['user_name'] = users.get(entry['user_id'], {}).get('name', 'לא ידוע')
-        
+
         return jsonify({
             'success': True,
             'month': month,
@@ -6925,22 +7119,11 @@ def api_time_tracking_update(entry_id):
     """עדכון רשומת מדידת זמן קיימת"""
     try:
         data = request.get_json() if request.is_json else request.form.to_dict()
-        
-        time_data = load_time_tracking()
-        entries = time_data.get('entries', [])
-        
-        # מציאת הרשומה
-        entry_index = None
-        for i, entry in enumerate(entries):
-            if entry.get('id') == entry_id:
-                entry_index = i
-                break
-        
-        if entry_index is None:
+
+        entry = get_time_entry(entry_id)
+        if entry is None:
             return jsonify({'success': False, 'error': 'רשומה לא נמצאה'}), 404
-        
-        entry = entries[entry_index]
-        
+
         # בדיקת הרשאות - רק מנהלים או הבעלים יכולים לערוך
         if current_user.role not in ['admin', 'manager'] and entry.get('user_id') != current_user.id:
             return jsonify({'success': False, 'error': 'אין הרשאה לערוך רשומה זו'}), 403
@@ -6963,10 +7146,8 @@ def api_time_tracking_update(entry_id):
                 duration_seconds = (end_dt - start_dt).total_seconds()
                 entry['duration_hours'] = round(duration_seconds / 3600, 2)
                 entry['date'] = start_dt.date().isoformat()
-        
-        entries[entry_index] = entry
-        time_data['entries'] = entries
-        save_time_tracking(time_data)
+
+        update_entry(entry)
         
         return jsonify({
             'success': True,
@@ -6985,19 +7166,8 @@ def api_time_tracking_update(entry_id):
 def api_time_tracking_delete(entry_id):
     """מחיקת רשומת מדידת זמן"""
     try:
-        time_data = load_time_tracking()
-        entries = time_data.get('entries', [])
-        
-        # מציאת הרשומה
-        entry_index = None
-        entry_to_delete = None
-        for i, entry in enumerate(entries):
-            if entry.get('id') == entry_id:
-                entry_index = i
-                entry_to_delete = entry
-                break
-        
-        if entry_index is None:
+        entry_to_delete = get_time_entry(entry_id)
+        if entry_to_delete is None:
             return jsonify({'success': False, 'error': 'רשומה לא נמצאה'}), 404
         
         # בדיקת הרשאות - רק מנהלים או הבעלים יכולים למחוק
@@ -7005,9 +7175,7 @@ def api_time_tracking_delete(entry_id):
             return jsonify({'success': False, 'error': 'אין הרשאה למחוק רשומה זו'}), 403
         
         # מחיקת הרשומה
-        entries.pop(entry_index)
-        time_data['entries'] = entries
-        save_time_tracking(time_data)
+        delete_entry(entry_id)
         
         return jsonify({
             'success': True,
@@ -7066,10 +7234,8 @@ def api_time_tracking_manual():
             'date': date_str,
             'manual_entry': True  # סימון שזו רשומה ידנית
         }
-        
-        time_data = load_time_tracking()
-        time_data.setdefault('entries', []).append(entry)
-        save_time_tracking(time_data)
+
+        add_entry(entry)
         
         return jsonify({
             'success': True,
@@ -7095,22 +7261,11 @@ def api_time_tracking_adjust(entry_id):
             return jsonify({'success': False, 'error': 'חסר פרמטר adjustment_hours'}), 400
         
         adjustment_hours = float(adjustment_hours)
-        
-        time_data = load_time_tracking()
-        entries = time_data.get('entries', [])
-        
-        # מציאת הרשומה
-        entry_index = None
-        for i, entry in enumerate(entries):
-            if entry.get('id') == entry_id:
-                entry_index = i
-                break
-        
-        if entry_index is None:
+
+        entry = get_time_entry(entry_id)
+        if entry is None:
             return jsonify({'success': False, 'error': 'רשומה לא נמצאה'}), 404
         
-        entry = entries[entry_index]
-        
         # בדיקת הרשאות
         if current_user.role not in ['admin', 'manager'] and entry.get('user_id') != current_user.id:
             return jsonify({'success': False, 'error': 'אין הרשאה לערוך רשומה זו'}), 403
@@ -7132,10 +7287,8 @@ def api_time_tracking_adjust(entry_id):
             entry['note'] = f"{entry['note']} | {adjustment_note}"
         else:
             entry['note'] = adjustment_note
-        
-        entries[entry_index] = entry
-        time_data['entries'] = entries
-        save_time_tracking(time_data)
+
+        update_entry(entry)
         
         return jsonify({
             'success': True,
@@ -7152,6 +7305,7 @@ def api_time_tracking_adjust(entry_id):
 @csrf.exempt
 def logout():
     logout_user()
+    clear_principal()
     wants_json = request.headers.get('Accept', '').find('application/json') != -1 or \
                 request.headers.get('X-Requested-With') == 'XMLHttpRequest'
     if wants_json:
@@ -7166,12 +7320,12 @@ REACT_BUILD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stat
 @app.route('/assets/<path:filename>')
 def serve_react_assets(filename):
     """Serve React static assets (JS, CSS, etc.)"""
-    return send_from_directory(os.path.join(REACT_BUILD_DIR, 'assets'), filename)
+    return send_precompressed(os.path.join(REACT_BUILD_DIR, 'assets'), filename)
 
 @app.route('/app/assets/<path:filename>')
 def serve_react_app_assets(filename):
     """Serve React static assets under /app/assets/ path"""
-    return send_from_directory(os.path.join(REACT_BUILD_DIR, 'assets'), filename)
+    return send_precompressed(os.path.join(REACT_BUILD_DIR, 'assets'), filename)
 
 # React SPA catch-all routes - serve index.html for client-side routing
 REACT_ROUTES = ['/dashboard', '/all_clients', '/finance', '/events', '/suppliers', 
@@ -7202,6 +7356,12 @@ def dashboard_redirect():
 def time_tracking_redirect():
     return redirect('/app/time_tracking')
 
+# ספירת קריאות load_*/save_* (ו-SQL במצב DB) לכל request - אחרי שכל הפונקציות הוגדרו
+instrument_storage_functions(globals(), modules=(__name__, 'database_helpers'))
+if USE_DATABASE:
+    from database import engine as _db_engine
+    instrument_engine(_db_engine)
+
 if __name__ == '__main__':
     # Railway deployment configuration
     port = int(os.environ.get('PORT', 5000))
@@ -11,6 +11,7 @@ from werkzeug.security import generate_password_hash
 from backend.extensions import csrf
 from backend.utils.helpers import load_users, save_users, load_forms, save_forms, load_data
 from backend.utils.permissions import get_user_role, is_manager_or_admin
+from backend.utils.principal import invalidate_principals
 
 # Create blueprint
 admin_bp = Blueprint('admin', __name__)
@@ -140,6 +141,7 @@ def edit_user():
     
     users[username]['updated_at'] = datetime.now().isoformat()
     save_users(users)
+    invalidate_principals()
     
     return jsonify({'success': True})
 
@@ -158,6 +160,7 @@ def delete_user():
     
     del users[username]
     save_users(users)
+    invalidate_principals()
     
     return jsonify({'success': True})
 
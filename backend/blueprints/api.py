@@ -8,8 +8,9 @@ from flask_login import login_required, current_user
 from backend.extensions import csrf, limiter
 from backend.utils.helpers import load_users, load_data
 from backend.utils.permissions import get_user_role
+from backend.utils.pagination import PaginationError, page_args, encode_cursor
 from backend.utils.notifications import (
-    get_user_notifications, get_unread_count, 
+    get_user_notifications, get_user_notifications_page, get_unread_count, 
     mark_notifications_read, get_new_notifications_since
 )
 
@@ -136,18 +137,22 @@ def api_get_notifications():
     """Get notifications for the current user"""
     try:
         unread_only = request.args.get('unread_only', 'false').lower() == 'true'
-        limit = int(request.args.get('limit', 50))
+        limit, after = page_args(default_limit=50)
         
-        notifications = get_user_notifications(
+        notifications, next_key = get_user_notifications_page(
             current_user.id, 
-            unread_only=unread_only,
-            limit=limit
+            limit=limit,
+            after=after,
+            unread_only=unread_only
         )
         
         return jsonify({
             'success': True,
-            'notifications': notifications
+            'notifications': notifications,
+            'next_cursor': encode_cursor(next_key)
         })
+    except PaginationError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         print(f"Error in api_get_notifications: {e}")
         return jsonify({'success': False, 'error': str(e)}), 500
@@ -12,6 +12,7 @@ from werkzeug.security import check_password_hash, generate_password_hash
 
 from backend.extensions import csrf, limiter
 from backend.utils.helpers import load_users, save_users, update_user_activity
+from backend.utils.principal import store_principal, clear_principal
 from backend.utils.email import send_password_reset_email
 
 # Create blueprint
@@ -71,8 +72,10 @@ def login():
                 password_valid = (stored_password == pwd)
             
             if password_valid:
-                user = User(resolved_user_id)
+                user = User(resolved_user_id, users[resolved_user_id].get('name', 'Unknown'),
+                            users[resolved_user_id].get('role'))
                 login_user(user, remember=True)
+                store_principal(resolved_user_id, users[resolved_user_id])
                 update_user_activity(resolved_user_id)
                 
                 wants_json = request.headers.get('Accept', '').find('application/json') != -1 or \
@@ -96,6 +99,7 @@ def login():
 def logout():
     """Logout route"""
     logout_user()
+    clear_principal()
     wants_json = request.headers.get('Accept', '').find('application/json') != -1 or \
                 request.headers.get('X-Requested-With') == 'XMLHttpRequest'
     if wants_json:
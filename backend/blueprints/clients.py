@@ -18,6 +18,7 @@ from backend.utils.helpers import (
 )
 from backend.utils.permissions import get_user_role, can_user_access_client, is_manager_or_admin
 from backend.utils.notifications import create_notification
+from backend.utils.client_view import ClientViewError, parse_client_view, shape_client
 
 # Create blueprint
 clients_bp = Blueprint('clients', __name__)
@@ -44,6 +45,11 @@ def api_get_client(client_id):
         if not can_user_access_client(current_user.id, user_role, client):
             return jsonify({'success': False, 'error': 'Access denied'}), 403
         
+        # fields= / include=: only the header and the requested sections
+        view = parse_client_view(request.args.get('fields'), request.args.get('include'))
+        if view is not None:
+            client = shape_client(client, view)
+        
         users = load_users()
         
         return jsonify({
@@ -51,6 +57,8 @@ def api_get_client(client_id):
             'client': client,
             'users': {uid: {'name': u.get('name', uid)} for uid, u in users.items()}
         })
+    except ClientViewError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         print(f"Error in api_get_client: {e}")
         import traceback
@@ -8,19 +8,27 @@ from flask_login import UserMixin
 class User(UserMixin):
     """User model for Flask-Login"""
     
-    def __init__(self, id):
-        from backend.utils.helpers import load_users
+    def __init__(self, id, name=None, role=None):
         self.id = id
-        users = load_users()
-        self.name = users[id]['name'] if id in users else "Unknown"
-        self.role = users[id].get('role', 'עובד') if id in users else 'עובד'
+        if name is None:
+            from backend.utils.helpers import load_users
+            users = load_users()
+            name = users[id]['name'] if id in users else "Unknown"
+            role = users[id].get('role', 'עובד') if id in users else 'עובד'
+        self.name = name
+        self.role = role or 'עובד'
 
 
 def load_user(user_id):
-    """Load user by ID for Flask-Login - used by login_manager"""
+    """Load user by ID for Flask-Login - used by login_manager.
+    Built from the principal stored in the session at login (no users lookup
+    while its version is current)."""
     from backend.utils.helpers import load_users
-    users = load_users()
-    return User(user_id) if user_id in users else None
+    from backend.utils.principal import load_principal
+    principal = load_principal(user_id, load_users)
+    if principal is None:
+        return None
+    return User(user_id, principal['name'], principal['role'])
 
 
 def setup_user_loader(login_manager):
@@ -0,0 +1,42 @@
+"""
+Client Access Index
+Row-level authorization as set lookups: {user_id (lower-cased): client ids}
+built once from the clients' assigned_user fields, instead of comparing every
+assigned user of every client per check. Storage modules cache the index per
+client-data version; see load_client_access_index in app.py / database_helpers.
+"""
+
+MANAGER_ROLES = ('מנהל', 'אדמין')
+
+
+def _normalize_uid(uid):
+    return uid.lower() if isinstance(uid, str) else str(uid).lower()
+
+
+def build_client_access_index(clients):
+    """clients: iterable of dicts with 'id' and 'assigned_user' (summaries are enough)"""
+    all_ids = set()
+    by_user = {}
+    for client in clients:
+        client_id = client.get('id')
+        if not client_id:
+            continue
+        all_ids.add(client_id)
+        assigned = client.get('assigned_user') or []
+        if isinstance(assigned, str):
+            assigned = [assigned]
+        elif not isinstance(assigned, list):
+            assigned = []
+        for uid in assigned:
+            by_user.setdefault(_normalize_uid(uid), set()).add(client_id)
+    return {
+        'all': frozenset(all_ids),
+        'by_user': {uid: frozenset(ids) for uid, ids in by_user.items()},
+    }
+
+
+def client_ids_for(index, user_id, user_role):
+    """Ids of the clients user_id may access (every client for managers/admin)"""
+    if user_id == 'admin' or user_role in MANAGER_ROLES:
+        return index['all']
+    return index['by_user'].get(_normalize_uid(user_id), frozenset())
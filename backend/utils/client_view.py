@@ -0,0 +1,134 @@
+"""
+Client View
+Sparse fieldsets and lazy sections for the client API. The client page asks
+for the header fields it renders first (`fields=`) and only the heavy sections
+it needs now (`include=`), e.g.
+
+    /api/client/<id>?fields=name,logo_url&include=projects.summary,charges.open,activities.limit=20
+
+parse_client_view turns the parameters into a ClientView; the storage layer
+(load_client_view in app.py / database_helpers.py) reads only the columns the
+view needs and shape_client builds the response. Without fields/include the
+API keeps returning the full client.
+"""
+
+# Light top-level client fields (the page header)
+HEADER_FIELDS = (
+    'id', 'name', 'client_number', 'retainer', 'assigned_user', 'logo_url',
+    'active', 'archived', 'archived_at',
+    'calculated_extra', 'calculated_retainer', 'calculated_total',
+    'calculated_open_charges', 'calculated_monthly_revenue',
+)
+
+# include= section -> (client key, allowed modes); the first mode is the default
+SECTIONS = {
+    'projects': ('projects', ('full', 'summary')),
+    'charges': ('extra_charges', ('all', 'open')),
+    'files': ('files', ('all',)),
+    'contacts': ('contacts', ('all',)),
+    'retainer_payments': ('retainer_payments', ('all',)),
+    'documents': ('documents', ('all',)),
+    'activities': (None, ('limit',)),
+}
+
+MAX_ACTIVITIES = 500
+
+
+class ClientViewError(ValueError):
+    """Bad fields / include parameter (-> 400)"""
+
+
+class ClientView:
+    """Which header fields and sections (with their mode) a response needs"""
+
+    def __init__(self, fields, sections, activities_limit=None):
+        self.fields = fields  # tuple of header fields
+        self.sections = sections  # {client key: mode}
+        self.activities_limit = activities_limit  # None = not included, 0 = all
+
+    @property
+    def include_activities(self):
+        return self.activities_limit is not None
+
+    def keys(self):
+        """Top-level client keys the storage layer has to read"""
+        return self.fields + tuple(self.sections)
+
+
+def _split(param):
+    return [part.strip() for part in (param or '').split(',') if part.strip()]
+
+
+def parse_client_view(fields_param, include_param):
+    """ClientView for the request parameters, or None for the full client"""
+    if not fields_param and not include_param:
+        return None
+
+    fields = ['id']
+    sections = {}
+    for name in _split(fields_param):
+        if name in HEADER_FIELDS:
+            if name not in fields:
+                fields.append(name)
+        elif name in SECTIONS and SECTIONS[name][0]:
+            # A section named in fields= is returned whole
+            sections[SECTIONS[name][0]] = SECTIONS[name][1][0]
+        else:
+            raise ClientViewError(f'שדה לא מוכר: {name}')
+    if not fields_param:
+        fields = list(HEADER_FIELDS)
+
+    activities_limit = None
+    for spec in _split(include_param):
+        section, _, mode = spec.partition('.')
+        if section not in SECTIONS:
+            raise ClientViewError(f'חלק לא מוכר: {section}')
+        key, modes = SECTIONS[section]
+        if key is None:
+            # activities / activities.limit=20
+            activities_limit = 0
+            if mode:
+                name, _, value = mode.partition('=')
+                if name != 'limit' or not value.isdigit() or int(value) < 1:
+                    raise ClientViewError(f'פרמטר לא תקין: {spec}')
+                activities_limit = min(int(value), MAX_ACTIVITIES)
+            continue
+        mode = mode or modes[0]
+        if mode not in modes:
+            raise ClientViewError(f'פרמטר לא תקין: {spec}')
+        sections[key] = mode
+
+    return ClientView(tuple(fields), sections, activities_limit)
+
+
+def is_open_task(task):
+    return not task.get('done', False) and task.get('status') != 'הושלם'
+
+
+def project_summary(project, task_count=None, open_task_count=None):
+    """Project without its tasks, with task counts (collapsed project list).
+    The counts are computed from project['tasks'] unless given (SQL)."""
+    summary = {k: v for k, v in project.items() if k != 'tasks'}
+    if task_count is None:
+        tasks = project.get('tasks') or []
+        task_count = len(tasks)
+        open_task_count = sum(1 for t in tasks if is_open_task(t))
+    summary['task_count'] = task_count
+    summary['open_task_count'] = open_task_count or 0
+    return summary
+
+
+def shape_client(client, view):
+    """Response dict for view from a (possibly partial) client dict.
+    Sections already shaped by the storage layer are passed through."""
+    result = {field: client[field] for field in view.fields if field in client}
+    for key, mode in view.sections.items():
+        value = client.get(key)
+        if key == 'projects' and mode == 'summary':
+            value = [p if 'task_count' in p else project_summary(p) for p in value or []]
+        elif key == 'extra_charges' and mode == 'open':
+            value = [ch for ch in value or [] if not ch.get('completed', False)]
+        elif value is None:
+            value = {} if key == 'retainer_payments' else []
+        result[key] = value
+    return result
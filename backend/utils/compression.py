@@ -0,0 +1,132 @@
+"""
+Response Compression
+Negotiated gzip / brotli compression of text responses (JSON, HTML, JS, CSS)
+above a size threshold. Streamed responses are compressed chunk by chunk with
+an incremental encoder. Static build assets can be served from precompressed
+.br / .gz files next to them (see scripts/precompress_static.py).
+Brotli is used only when the `brotli` package is installed.
+"""
+import os
+import gzip
+import zlib
+import mimetypes
+
+from flask import request, send_from_directory
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # optional - gzip only
+    brotli = None
+
+COMPRESS_MIN_SIZE = 1024  # bytes - smaller bodies are not worth the CPU
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # dynamic responses: fast; precompressed assets use 11
+COMPRESSIBLE_MIMETYPES = {
+    'application/json', 'application/javascript', 'application/xml',
+    'image/svg+xml', 'text/html', 'text/css', 'text/plain', 'text/javascript',
+    'text/csv', 'text/xml',
+}
+# Encodings we can produce, in order of preference, with their file suffix
+ENCODINGS = (('br', '.br'), ('gzip', '.gz')) if brotli else (('gzip', '.gz'),)
+
+
+def negotiate_encoding(available=None):
+    """Best encoding the client accepts (None = identity)"""
+    options = [enc for enc, _ in ENCODINGS if available is None or enc in available]
+    if not options:
+        return None
+    return request.accept_encodings.best_match(options)
+
+
+def _compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def _stream_encoder(chunks, encoding):
+    """Compress an iterable of byte chunks incrementally"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        process, finish = compressor.process, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31 = gzip container
+        process, finish = compressor.compress, compressor.flush
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        out = process(chunk)
+        if out:
+            yield out
+    tail = finish()
+    if tail:
+        yield tail
+
+
+def _should_compress(response):
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return False
+    if request.method == 'HEAD':
+        return False
+    return response.mimetype in COMPRESSIBLE_MIMETYPES
+
+
+def compress_response(response):
+    """Compress response in place if the client accepts it (after_request hook)"""
+    if not _should_compress(response):
+        return response
+    encoding = negotiate_encoding()
+    if not encoding:
+        response.vary.add('Accept-Encoding')
+        return response
+
+    if response.is_streamed:
+        response.response = _stream_encoder(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        response.set_data(_compress(data, encoding))
+
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    # A strong ETag identifies the exact bytes - tag the encoded variant
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(f'{etag}-{encoding}')
+    return response
+
+
+def etag_variants(etag):
+    """The ETag plus its encoded variants (as set by compress_response)"""
+    return [etag] + [f'{etag}-{enc}' for enc, _ in ENCODINGS]
+
+
+def send_precompressed(directory, filename):
+    """send_from_directory that prefers a precompressed .br / .gz sibling"""
+    available = {}
+    for enc, suffix in ENCODINGS:
+        path = safe_join(directory, filename + suffix)
+        if path and os.path.isfile(path):
+            available[enc] = filename + suffix
+    encoding = negotiate_encoding(available) if available else None
+    if not encoding:
+        response = send_from_directory(directory, filename)
+        if available:
+            response.vary.add('Accept-Encoding')
+        return response
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    response = send_from_directory(directory, available[encoding], mimetype=mimetype)
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_compression(app):
+    """Register response compression on a Flask app"""
+    app.after_request(compress_response)
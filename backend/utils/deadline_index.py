@@ -0,0 +1,254 @@
+"""
+Deadline Index
+Every task that has a deadline, sorted by date and partitioned by assignee and
+by client, so calendar and deadline views read only the date window they show
+instead of walking every client -> project -> task and re-parsing deadline
+strings on each call. Deadlines are parsed once, when a task is indexed.
+
+The index is per process and maintained like the other client-derived views
+(see maintained_view): a save_client patches just that client's tasks and a
+patch_task just that task, any other change rebuilds it on the next read.
+
+DeadlineBuckets keeps the urgent / warning / approaching lists of open tasks
+per assignee on top of the index: computed once per day and patched together
+with the index, so a poll only copies out the result.
+"""
+from bisect import bisect_left, insort
+from datetime import datetime, date, timedelta
+from heapq import merge
+
+from .maintained_view import MaintainedView
+
+
+def parse_deadline(deadline):
+    """date of a task deadline ('YYYY-MM-DD[THH:MM...]', 'dd/mm/YYYY', 'dd/mm/yy'), or None"""
+    if not deadline or not isinstance(deadline, str):
+        return None
+    try:
+        if '/' in deadline:
+            fmt = '%d/%m/%Y' if len(deadline.split('/')[-1]) == 4 else '%d/%m/%y'
+            return datetime.strptime(deadline, fmt).date()
+        if 'T' in deadline:
+            return datetime.fromisoformat(deadline.replace('Z', '+00:00')).date()
+        return datetime.strptime(deadline[:10], '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def _entry(client_id, client_name, archived, project, task):
+    day = parse_deadline(task.get('deadline'))
+    if day is None:
+        return None
+    return {
+        'date': day.isoformat(),
+        'deadline': task.get('deadline'),
+        'client_id': client_id,
+        'client_name': client_name,
+        'archived': archived,
+        'project_id': project.get('id'),
+        'project_title': project.get('title'),
+        'task_id': task.get('id'),
+        'title': task.get('title'),
+        'status': task.get('status'),
+        'assignee': task.get('assignee') or '',
+        'priority': task.get('priority', 'medium'),
+        'is_daily_task': task.get('is_daily_task', False),
+        'done': task.get('done', False),
+    }
+
+
+def _entry_key(entry):
+    return (entry['date'], entry['client_id'] or '', entry['project_id'] or '', entry['task_id'] or '')
+
+
+# (bucket, last day offset it covers) - overdue/today, 1-3 days, 4-7 days
+BUCKETS = (('urgent', 0), ('warning', 3), ('approaching', 7))
+BUCKET_DAYS = BUCKETS[-1][1]
+
+
+class DeadlineBuckets:
+    """Open tasks due within BUCKET_DAYS of `day` (or overdue), by assignee and bucket"""
+
+    def __init__(self, day, keyed_entries):
+        self.day = day
+        self.by_assignee = {}  # assignee -> {bucket: {key: item}}
+        for key, entry in keyed_entries:
+            self.add(key, entry)
+
+    def add(self, key, entry):
+        if entry['status'] == 'הושלם':
+            return
+        days_diff = (date.fromisoformat(entry['date']) - self.day).days
+        bucket = next((name for name, last_day in BUCKETS if days_diff <= last_day), None)
+        if bucket is None:
+            return
+        item = {
+            'client_id': entry['client_id'],
+            'client_name': entry['client_name'] or 'ללא שם',
+            'project_id': entry['project_id'],
+            'project_title': entry['project_title'] or 'ללא שם',
+            'task_id': entry['task_id'],
+            'task_title': entry['title'] if entry['title'] is not None else 'ללא שם',
+            'deadline': entry['deadline'],
+            'priority': entry['priority'],
+        }
+        if bucket == 'urgent':
+            item['days_overdue'] = abs(days_diff)
+        else:
+            item['days_remaining'] = days_diff
+        buckets = self.by_assignee.setdefault(entry['assignee'], {name: {} for name, _ in BUCKETS})
+        buckets[bucket][key] = item
+
+    def remove(self, key, entry):
+        for items in self.by_assignee.get(entry['assignee'], {}).values():
+            items.pop(key, None)
+
+    def result(self, assignee=None):
+        """{bucket: [items by deadline]} for one assignee (None = everyone)"""
+        if assignee is not None:
+            sources = [self.by_assignee.get(assignee, {})]
+        else:
+            sources = self.by_assignee.values()
+        result = {}
+        for name, _ in BUCKETS:
+            pairs = [pair for buckets in sources for pair in buckets.get(name, {}).items()]
+            pairs.sort(key=lambda pair: pair[0])
+            result[name] = [item for _, item in pairs]
+        return result
+
+
+class DeadlineIndex:
+    """Entries are shared - callers build their own response dicts from them"""
+
+    def __init__(self):
+        self._clear()
+
+    def _clear(self):
+        self.entries = {}  # key -> entry
+        self.keys = []  # all keys, sorted (key starts with the ISO date)
+        self.by_assignee = {}  # assignee -> sorted keys
+        self.by_client = {}  # client_id -> sorted keys
+        self._buckets = None  # DeadlineBuckets of the current day, built on demand
+
+    def __len__(self):
+        return len(self.entries)
+
+    def _add(self, entry):
+        key = _entry_key(entry)
+        if key in self.entries:
+            self._remove(key)
+        self.entries[key] = entry
+        if self._buckets is not None:
+            self._buckets.add(key, entry)
+        insort(self.keys, key)
+        insort(self.by_assignee.setdefault(entry['assignee'], []), key)
+        insort(self.by_client.setdefault(entry['client_id'], []), key)
+
+    def _remove(self, key):
+        entry = self.entries.pop(key)
+        if self._buckets is not None:
+            self._buckets.remove(key, entry)
+        for keys, owner, partition in ((self.keys, None, None),
+                                       (self.by_assignee.get(entry['assignee']), entry['assignee'], self.by_assignee),
+                                       (self.by_client.get(entry['client_id']), entry['client_id'], self.by_client)):
+            i = bisect_left(keys, key)
+            if i < len(keys) and keys[i] == key:
+                del keys[i]
+            if partition is not None and not keys:
+                del partition[owner]
+
+    def rebuild(self, task_rows, archived_ids=()):
+        """task_rows: query_tasks(has_deadline=True) rows"""
+        self._clear()
+        archived_ids = set(archived_ids)
+        entries = []
+        for row in task_rows:
+            entry = _entry(row['client_id'], row.get('client_name'), row['client_id'] in archived_ids,
+                           {'id': row['project_id'], 'title': row.get('project_title')}, row['task'])
+            if entry is not None:
+                entries.append(entry)
+        # Bulk build: sort once instead of insort per entry
+        entries.sort(key=_entry_key)
+        for entry in entries:
+            key = _entry_key(entry)
+            if key in self.entries:
+                continue
+            self.entries[key] = entry
+            self.keys.append(key)
+            self.by_assignee.setdefault(entry['assignee'], []).append(key)
+            self.by_client.setdefault(entry['client_id'], []).append(key)
+
+    def replace_client(self, client):
+        """Re-index the tasks of one (full) client dict"""
+        client_id = client.get('id')
+        for key in list(self.by_client.get(client_id, [])):
+            self._remove(key)
+        for project in client.get('projects', []) or []:
+            for task in project.get('tasks', []) or []:
+                entry = _entry(client_id, client.get('name'), client.get('archived', False), project, task)
+                if entry is not None:
+                    self._add(entry)
+
+    def replace_task(self, client, project, task):
+        """Re-index one task (client: id, name, archived; project: id, title)"""
+        client_id = client.get('id')
+        ids = (project.get('id') or '', task.get('id') or '')
+        for key in [k for k in self.by_client.get(client_id, []) if k[2:] == ids]:
+            self._remove(key)
+        entry = _entry(client_id, client.get('name'), client.get('archived', False), project, task)
+        if entry is not None:
+            self._add(entry)
+
+    @staticmethod
+    def _window(keys, start, end):
+        """Keys with start <= date < end (ISO date strings, None = open)"""
+        lo = bisect_left(keys, (start,)) if start else 0
+        hi = bisect_left(keys, (end,)) if end else len(keys)
+        return keys[lo:hi]
+
+    def buckets(self, day):
+        """DeadlineBuckets for day - recomputed only when the day changes"""
+        if self._buckets is None or self._buckets.day != day:
+            keys = self._window(self.keys, None, (day + timedelta(days=BUCKET_DAYS + 1)).isoformat())
+            self._buckets = DeadlineBuckets(day, ((key, self.entries[key]) for key in keys))
+        return self._buckets
+
+    def query(self, start=None, end=None, assignee=None, client_ids=None):
+        """Entries with start <= date < end, sorted by date.
+        assignee / client_ids narrow the result (None = everyone / all clients)."""
+        if assignee is not None:
+            keys = self._window(self.by_assignee.get(assignee, []), start, end)
+            if client_ids is not None:
+                keys = [k for k in keys if k[1] in client_ids]
+        elif client_ids is not None and len(client_ids) < len(self.by_client) // 2:
+            # Few clients (a regular employee) - merge their partitions
+            keys = list(merge(*(self._window(self.by_client[cid], start, end)
+                                for cid in client_ids if cid in self.by_client)))
+        else:
+            keys = self._window(self.keys, start, end)
+            if client_ids is not None:
+                keys = [k for k in keys if k[1] in client_ids]
+        return [self.entries[k] for k in keys]
+
+
+_view = MaintainedView('deadline_index')
+
+
+def _build(load_task_rows, load_archived_ids):
+    index = DeadlineIndex()
+    index.rebuild(load_task_rows(), load_archived_ids())
+    return index
+
+
+def get_deadline_index(load_task_rows, load_archived_ids):
+    """The up-to-date index of this process.
+    load_task_rows() -> query_tasks(has_deadline=True) rows; load_archived_ids() -> ids"""
+    return _view.get(lambda: _build(load_task_rows, load_archived_ids))
+
+
+def get_deadline_buckets(load_task_rows, load_archived_ids, day=None, assignee=None):
+    """{'urgent'|'warning'|'approaching': [items]} of open tasks, for one
+    assignee (None = everyone). Arguments as in get_deadline_index."""
+    with _view.lock:
+        index = get_deadline_index(load_task_rows, load_archived_ids)
+        return index.buckets(day or date.today()).result(assignee)
@@ -3,10 +3,14 @@ Data Helpers
 Contains functions for loading and saving data from JSON files
 """
 import os
-import json
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash
 from flask import current_app
+from .request_cache import request_cached, write_through
+from .json_store import read_json, write_json
+from .journal import get_journal
+from .presence import get_presence_tracker
+from .permission_matcher import invalidate_permission_matcher
 
 
 def get_config():
@@ -19,6 +23,7 @@ def get_config():
         return Config
 
 
+@request_cached('users')
 def load_users():
     """Load users from JSON file"""
     config = get_config()
@@ -30,12 +35,10 @@ def load_users():
     if not os.path.exists(users_file):
         # Create default admin user with hashed password
         u = {'admin': {'password': generate_password_hash('1234'), 'name': 'מנהל המשרד', 'role': 'אדמין'}}
-        with open(users_file, 'w', encoding='utf-8') as f:
-            json.dump(u, f, ensure_ascii=False, indent=4)
+        write_json(users_file, u)
         return u
     
-    with open(users_file, 'r', encoding='utf-8') as f:
-        users = json.load(f)
+    users = read_json(users_file, {})
     
     # Ensure all users have a role
     needs_update = False
@@ -50,6 +53,7 @@ def load_users():
     return users
 
 
+@write_through('users')
 def save_users(users):
     """Save users to JSON file"""
     config = get_config()
@@ -58,10 +62,10 @@ def save_users(users):
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         users_file = os.path.join(base_dir, 'users_db.json')
     
-    with open(users_file, 'w', encoding='utf-8') as f:
-        json.dump(users, f, ensure_ascii=False, indent=4)
+    write_json(users_file, users)
 
 
+@request_cached('data')
 def load_data():
     """Load agency data (clients) from JSON file"""
     config = get_config()
@@ -70,11 +74,7 @@ def load_data():
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         data_file = os.path.join(base_dir, 'agency_db.json')
     
-    if not os.path.exists(data_file) or os.stat(data_file).st_size == 0:
-        return []
-    
-    with open(data_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = read_json(data_file, [])
     
     if not data:
         return data
@@ -92,6 +92,23 @@ def load_data():
     return data
 
 
+def load_client(client_id):
+    """Load a single client by id (None if not found)"""
+    if not client_id:
+        return None
+    return next((c for c in load_data() if c.get('id') == client_id), None)
+
+
+def load_clients_by_ids(client_ids):
+    """Load only the given clients, ordered like client_ids"""
+    ids = [cid for cid in dict.fromkeys(client_ids or []) if cid]
+    if not ids:
+        return []
+    by_id = {c.get('id'): c for c in load_data() if c.get('id') in ids}
+    return [by_id[cid] for cid in ids if cid in by_id]
+
+
+@write_through('data')
 def save_data(data):
     """Save agency data (clients) to JSON file"""
     config = get_config()
@@ -100,8 +117,7 @@ def save_data(data):
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         data_file = os.path.join(base_dir, 'agency_db.json')
     
-    with open(data_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+    write_json(data_file, data)
 
 
 def assign_client_numbers(clients):
@@ -238,6 +254,7 @@ def get_next_workday(from_date=None):
 
 
 # Additional data loaders
+@request_cached('suppliers')
 def load_suppliers():
     """Load suppliers from JSON file"""
     config = get_config()
@@ -246,12 +263,10 @@ def load_suppliers():
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         suppliers_file = os.path.join(base_dir, 'suppliers_db.json')
     
-    if not os.path.exists(suppliers_file) or os.stat(suppliers_file).st_size == 0:
-        return []
-    with open(suppliers_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return read_json(suppliers_file, [])
 
 
+@write_through('suppliers')
 def save_suppliers(suppliers):
     """Save suppliers to JSON file"""
     config = get_config()
@@ -260,10 +275,10 @@ def save_suppliers(suppliers):
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         suppliers_file = os.path.join(base_dir, 'suppliers_db.json')
     
-    with open(suppliers_file, 'w', encoding='utf-8') as f:
-        json.dump(suppliers, f, ensure_ascii=False, indent=4)
+    write_json(suppliers_file, suppliers)
 
 
+@request_cached('quotes')
 def load_quotes():
     """Load quotes from JSON file"""
     config = get_config()
@@ -272,12 +287,10 @@ def load_quotes():
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         quotes_file = os.path.join(base_dir, 'quotes_db.json')
     
-    if not os.path.exists(quotes_file) or os.stat(quotes_file).st_size == 0:
-        return []
-    with open(quotes_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return read_json(quotes_file, [])
 
 
+@write_through('quotes')
 def save_quotes(quotes):
     """Save quotes to JSON file"""
     config = get_config()
@@ -286,36 +299,34 @@ def save_quotes(quotes):
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         quotes_file = os.path.join(base_dir, 'quotes_db.json')
     
-    with open(quotes_file, 'w', encoding='utf-8') as f:
-        json.dump(quotes, f, ensure_ascii=False, indent=4)
+    write_json(quotes_file, quotes)
 
 
-def load_messages():
-    """Load messages from JSON file"""
+def _journal_for(config_key, default_name):
+    """Journal (.jsonl) stored next to the legacy JSON file it replaces"""
     config = get_config()
-    messages_file = getattr(config, 'MESSAGES_FILE', None)
-    if not messages_file:
+    json_file = getattr(config, config_key, None)
+    if not json_file:
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        messages_file = os.path.join(base_dir, 'messages_db.json')
+        json_file = os.path.join(base_dir, default_name)
     
-    if not os.path.exists(messages_file) or os.stat(messages_file).st_size == 0:
-        return []
-    with open(messages_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    root, ext = os.path.splitext(json_file)
+    return get_journal(root + '.jsonl', legacy_path=json_file)
+
+
+@request_cached('messages')
+def load_messages():
+    """Load messages from the messages journal"""
+    return _journal_for('MESSAGES_FILE', 'messages_db.json').all()
 
 
+@write_through('messages')
 def save_messages(messages):
-    """Save messages to JSON file"""
-    config = get_config()
-    messages_file = getattr(config, 'MESSAGES_FILE', None)
-    if not messages_file:
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        messages_file = os.path.join(base_dir, 'messages_db.json')
-    
-    with open(messages_file, 'w', encoding='utf-8') as f:
-        json.dump(messages, f, ensure_ascii=False, indent=4)
+    """Save messages (only new/changed ones are written)"""
+    _journal_for('MESSAGES_FILE', 'messages_db.json').replace_all(messages)
 
 
+@request_cached('events')
 def load_events():
     """Load events from JSON file"""
     config = get_config()
@@ -324,12 +335,10 @@ def load_events():
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         events_file = os.path.join(base_dir, 'events_db.json')
     
-    if not os.path.exists(events_file) or os.stat(events_file).st_size == 0:
-        return []
-    with open(events_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return read_json(events_file, [])
 
 
+@write_through('events')
 def save_events(events):
     """Save events to JSON file"""
     config = get_config()
@@ -338,10 +347,10 @@ def save_events(events):
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         events_file = os.path.join(base_dir, 'events_db.json')
     
-    with open(events_file, 'w', encoding='utf-8') as f:
-        json.dump(events, f, ensure_ascii=False, indent=4)
+    write_json(events_file, events)
 
 
+@request_cached('time_tracking')
 def load_time_tracking():
     """Load time tracking data from JSON file"""
     config = get_config()
@@ -350,12 +359,10 @@ def load_time_tracking():
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         time_file = os.path.join(base_dir, 'time_tracking.json')
     
-    if not os.path.exists(time_file) or os.stat(time_file).st_size == 0:
-        return {'entries': [], 'active_sessions': {}}
-    with open(time_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return read_json(time_file, {'entries': [], 'active_sessions': {}})
 
 
+@write_through('time_tracking')
 def save_time_tracking(data):
     """Save time tracking data to JSON file"""
     config = get_config()
@@ -364,10 +371,10 @@ def save_time_tracking(data):
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         time_file = os.path.join(base_dir, 'time_tracking.json')
     
-    with open(time_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+    write_json(time_file, data)
 
 
+@request_cached('equipment_bank')
 def load_equipment_bank():
     """Load equipment bank from JSON file"""
     config = get_config()
@@ -383,10 +390,10 @@ def load_equipment_bank():
         ]
         save_equipment_bank(default_equipment)
         return default_equipment
-    with open(equipment_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return read_json(equipment_file, [])
 
 
+@write_through('equipment_bank')
 def save_equipment_bank(equipment):
     """Save equipment bank to JSON file"""
     config = get_config()
@@ -395,10 +402,10 @@ def save_equipment_bank(equipment):
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         equipment_file = os.path.join(base_dir, 'equipment_bank.json')
     
-    with open(equipment_file, 'w', encoding='utf-8') as f:
-        json.dump(equipment, f, ensure_ascii=False, indent=4)
+    write_json(equipment_file, equipment)
 
 
+@request_cached('checklist_templates')
 def load_checklist_templates():
     """Load checklist templates from JSON file"""
     config = get_config()
@@ -415,10 +422,10 @@ def load_checklist_templates():
         }
         save_checklist_templates(default_templates)
         return default_templates
-    with open(templates_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return read_json(templates_file, {})
 
 
+@write_through('checklist_templates')
 def save_checklist_templates(templates):
     """Save checklist templates to JSON file"""
     config = get_config()
@@ -427,10 +434,10 @@ def save_checklist_templates(templates):
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         templates_file = os.path.join(base_dir, 'checklist_templates.json')
     
-    with open(templates_file, 'w', encoding='utf-8') as f:
-        json.dump(templates, f, ensure_ascii=False, indent=4)
+    write_json(templates_file, templates)
 
 
+@request_cached('forms')
 def load_forms():
     """Load forms from JSON file"""
     config = get_config()
@@ -439,12 +446,10 @@ def load_forms():
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         forms_file = os.path.join(base_dir, 'forms_db.json')
     
-    if not os.path.exists(forms_file) or os.stat(forms_file).st_size == 0:
-        return []
-    with open(forms_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return read_json(forms_file, [])
 
 
+@write_through('forms')
 def save_forms(forms):
     """Save forms to JSON file"""
     config = get_config()
@@ -453,17 +458,23 @@ def save_forms(forms):
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         forms_file = os.path.join(base_dir, 'forms_db.json')
     
-    with open(forms_file, 'w', encoding='utf-8') as f:
-        json.dump(forms, f, ensure_ascii=False, indent=4)
+    write_json(forms_file, forms)
 
 
-def load_permissions():
-    """Load page permissions from JSON file"""
+def get_permissions_file():
+    """Path of the page permissions JSON file"""
     config = get_config()
     permissions_file = getattr(config, 'PERMISSIONS_FILE', None)
     if not permissions_file:
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         permissions_file = os.path.join(base_dir, 'permissions_db.json')
+    return permissions_file
+
+
+@request_cached('permissions')
+def load_permissions():
+    """Load page permissions from JSON file"""
+    permissions_file = get_permissions_file()
     
     if not os.path.exists(permissions_file):
         default_permissions = {
@@ -480,22 +491,18 @@ def load_permissions():
         }
         save_permissions(default_permissions)
         return default_permissions
-    with open(permissions_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return read_json(permissions_file, {})
 
 
+@write_through('permissions')
 def save_permissions(permissions):
     """Save page permissions to JSON file"""
-    config = get_config()
-    permissions_file = getattr(config, 'PERMISSIONS_FILE', None)
-    if not permissions_file:
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        permissions_file = os.path.join(base_dir, 'permissions_db.json')
-    
-    with open(permissions_file, 'w', encoding='utf-8') as f:
-        json.dump(permissions, f, ensure_ascii=False, indent=4)
+    permissions_file = get_permissions_file()
+    write_json(permissions_file, permissions)
+    invalidate_permission_matcher(permissions_file)
 
 
+@request_cached('user_activity')
 def load_user_activity():
     """Load user activity data"""
     config = get_config()
@@ -504,12 +511,10 @@ def load_user_activity():
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         activity_file = os.path.join(base_dir, 'user_activity.json')
     
-    if not os.path.exists(activity_file) or os.stat(activity_file).st_size == 0:
-        return {}
-    with open(activity_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return read_json(activity_file, {})
 
 
+@write_through('user_activity')
 def save_user_activity(activity):
     """Save user activity data"""
     config = get_config()
@@ -518,38 +523,35 @@ def save_user_activity(activity):
         base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
         activity_file = os.path.join(base_dir, 'user_activity.json')
     
-    with open(activity_file, 'w', encoding='utf-8') as f:
-        json.dump(activity, f, ensure_ascii=False, indent=4)
+    write_json(activity_file, activity)
+
+
+def _activity_file():
+    config = get_config()
+    activity_file = getattr(config, 'USER_ACTIVITY_FILE', None)
+    if not activity_file:
+        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        activity_file = os.path.join(base_dir, 'user_activity.json')
+    return activity_file
 
 
 def update_user_activity(user_id):
-    """Update last activity time for a user"""
-    activity = load_user_activity()
-    activity[user_id] = datetime.now().isoformat()
-    save_user_activity(activity)
+    """Update last activity time for a user (in memory, flushed in batches)"""
+    get_presence_tracker(_activity_file()).touch(user_id)
+
 
+def get_presence(user_ids):
+    """{user_id: True/False} - whether each user was active in the last hour"""
+    return get_presence_tracker(_activity_file()).get_presence(user_ids)
 
+
+@request_cached('activity_logs')
 def load_activity_logs():
     """Load activity logs"""
-    config = get_config()
-    logs_file = getattr(config, 'ACTIVITY_LOGS_FILE', None)
-    if not logs_file:
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        logs_file = os.path.join(base_dir, 'activity_logs.json')
-    
-    if not os.path.exists(logs_file) or os.stat(logs_file).st_size == 0:
-        return []
-    with open(logs_file, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    return _journal_for('ACTIVITY_LOGS_FILE', 'activity_logs.json').all()
 
 
+@write_through('activity_logs')
 def save_activity_logs(logs):
-    """Save activity logs"""
-    config = get_config()
-    logs_file = getattr(config, 'ACTIVITY_LOGS_FILE', None)
-    if not logs_file:
-        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-        logs_file = os.path.join(base_dir, 'activity_logs.json')
-    
-    with open(logs_file, 'w', encoding='utf-8') as f:
-        json.dump(logs, f, ensure_ascii=False, indent=4)
+    """Save activity logs (only new/changed ones are written)"""
+    _journal_for('ACTIVITY_LOGS_FILE', 'activity_logs.json').replace_all(logs)
@@ -0,0 +1,286 @@
+"""
+Journal Storage
+Append-only JSON-lines storage for history collections (messages, notifications,
+activity logs). Each write appends one line instead of rewriting the whole file;
+later lines for the same id replace earlier ones and {"$delete": id} removes an
+item. Every process keeps an in-memory index of the file and only reads the new
+tail on each access. The file is compacted (rewritten with live items only)
+once dead lines outnumber live items.
+"""
+import os
+import json
+import marshal
+import tempfile
+import threading
+import uuid
+
+try:
+    import fcntl
+except ImportError:  # Windows (local development) - single process, no file lock
+    fcntl = None
+
+DELETE_KEY = '$delete'
+COMPACT_MIN_DEAD_LINES = 1000
+
+_journals = {}
+_journals_lock = threading.Lock()
+
+
+def get_journal(path, legacy_path=None, legacy_key=None):
+    """Return the (per-process) journal for path.
+    legacy_path: old JSON file imported the first time the journal is created.
+    legacy_key: key of the list inside the legacy JSON (if it is a dict)."""
+    with _journals_lock:
+        journal = _journals.get(path)
+        if journal is None:
+            journal = _journals[path] = Journal(path, legacy_path, legacy_key)
+        return journal
+
+
+def _encode(record):
+    return (json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+
+
+class Journal:
+    def __init__(self, path, legacy_path=None, legacy_key=None):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.legacy_key = legacy_key
+        self._lock = threading.RLock()
+        self._items = {}  # id -> item, in insertion order
+        self._file_id = None  # inode of the file the index was built from
+        self._offset = 0  # bytes of the file already applied to the index
+        self._lines = 0
+        self._snapshot = None
+        self._derived = {}  # name -> structure built from the items (see derived)
+
+    # ---------- file locking ----------
+
+    def _locked_file(self):
+        lock_file = open(self.path + '.lock', 'a')
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    # ---------- index maintenance ----------
+
+    def _reset(self):
+        self._items = {}
+        self._offset = 0
+        self._lines = 0
+        self._snapshot = None
+        self._derived = {}
+
+    def _apply(self, record):
+        self._lines += 1
+        if DELETE_KEY in record:
+            self._items.pop(record[DELETE_KEY], None)
+        elif record.get('id') is not None:
+            self._items[record['id']] = record
+        self._snapshot = None
+        if self._derived:
+            self._derived = {}
+
+    def _import_legacy(self):
+        """Create the journal, seeded from the old JSON file if there is one"""
+        data = []
+        if self.legacy_path and os.path.exists(self.legacy_path) and os.stat(self.legacy_path).st_size > 0:
+            with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if self.legacy_key and isinstance(data, dict):
+                data = data.get(self.legacy_key, [])
+        items = [item for item in data or [] if isinstance(item, dict)]
+        for item in items:
+            # Records without an id would be skipped on read (as in append)
+            if item.get('id') is None:
+                item['id'] = str(uuid.uuid4())
+        self._write_compacted(items)
+
+    def _refresh(self, have_file_lock=False):
+        """Bring the index up to date with the file (reads only the new tail)"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            lock_file = None if have_file_lock else self._locked_file()
+            try:
+                if not os.path.exists(self.path):
+                    self._import_legacy()
+            finally:
+                if lock_file:
+                    lock_file.close()
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                self._reset()
+                self._file_id = None
+                return
+
+        if st.st_ino != self._file_id or st.st_size < self._offset:
+            # First load, or the file was compacted by another process
+            self._reset()
+            self._file_id = st.st_ino
+        if st.st_size == self._offset:
+            return
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            chunk = f.read(st.st_size - self._offset)
+        # Only consume complete lines - a concurrent writer may be mid-line
+        end = chunk.rfind(b'\n')
+        if end == -1:
+            return
+        for line in chunk[:end].split(b'\n'):
+            if not line.strip():
+                continue
+            try:
+                self._apply(json.loads(line))
+            except ValueError:
+                print(f"Skipping corrupt line in {self.path}")
+        self._offset += end + 1
+
+    # ---------- writes ----------
+
+    def _append_records(self, records):
+        if not records:
+            return
+        payload = b''.join(_encode(r) for r in records)
+        lock_file = self._locked_file()
+        try:
+            self._refresh(have_file_lock=True)
+            with open(self.path, 'ab') as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            self._refresh(have_file_lock=True)
+            if self._needs_compaction():
+                self._write_compacted(list(self._items.values()))
+                self._reset()
+                self._file_id = None
+                self._refresh(have_file_lock=True)
+        finally:
+            lock_file.close()
+
+    def _needs_compaction(self):
+        dead = self._lines - len(self._items)
+        return dead > max(COMPACT_MIN_DEAD_LINES, len(self._items))
+
+    def _write_compacted(self, items):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(self.path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for item in items:
+                    f.write(_encode(item))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    # ---------- public API ----------
+
+    def all(self):
+        """All live items, in insertion order (private copies)"""
+        with self._lock:
+            self._refresh()
+            if self._snapshot is None:
+                self._snapshot = marshal.dumps(list(self._items.values()))
+            return marshal.loads(self._snapshot)
+
+    def iter_items(self, reverse=False):
+        """Iterate live items WITHOUT copying - callers must not mutate them"""
+        with self._lock:
+            self._refresh()
+            items = list(self._items.values())
+        return reversed(items) if reverse else iter(items)
+
+    def derived(self, name, build):
+        """build(items) cached until the journal changes - e.g. a sorted index.
+        The result shares the live items: callers must not mutate them."""
+        with self._lock:
+            self._refresh()
+            if name not in self._derived:
+                self._derived[name] = build(list(self._items.values()))
+            return self._derived[name]
+
+    def find(self, predicate, limit=None, reverse=False):
+        """Copies of items matching predicate (newest first when reverse=True)"""
+        results = []
+        for item in self.iter_items(reverse=reverse):
+            if predicate(item):
+                results.append(marshal.loads(marshal.dumps(item)))
+                if limit is not None and len(results) >= limit:
+                    break
+        return results
+
+    def get(self, item_id):
+        with self._lock:
+            self._refresh()
+            item = self._items.get(item_id)
+        return marshal.loads(marshal.dumps(item)) if item is not None else None
+
+    def append(self, item):
+        """Add (or replace, by id) a single item - one line appended"""
+        if item.get('id') is None:
+            item['id'] = str(uuid.uuid4())
+        with self._lock:
+            self._append_records([item])
+        return item
+
+    def append_many(self, items):
+        """Add/replace several items with a single write"""
+        for item in items:
+            if item.get('id') is None:
+                item['id'] = str(uuid.uuid4())
+        with self._lock:
+            self._append_records(list(items))
+        return items
+
+    def delete(self, item_id):
+        return self.delete_many([item_id]) > 0
+
+    def delete_many(self, item_ids):
+        """Delete items by id with a single write; returns how many existed"""
+        with self._lock:
+            self._refresh()
+            records = [{DELETE_KEY: item_id} for item_id in item_ids if item_id in self._items]
+            self._append_records(records)
+            return len(records)
+
+    def replace_all(self, items):
+        """Compatibility with save_*(full_list): appends only the items that are
+        new or changed and deletes the missing ones."""
+        with self._lock:
+            self._refresh()
+            records = []
+            seen = set()
+            for item in items:
+                if item.get('id') is None:
+                    item['id'] = str(uuid.uuid4())
+                seen.add(item['id'])
+                current = self._items.get(item['id'])
+                if current is None or current != item:
+                    records.append(item)
+            for item_id in self._items:
+                if item_id not in seen:
+                    records.append({DELETE_KEY: item_id})
+            # Copy through marshal so later mutations by the caller don't touch the index
+            self._append_records(marshal.loads(marshal.dumps(records)))
+            return len(records)
+
+    def compact(self):
+        """Rewrite the file with live items only"""
+        with self._lock:
+            lock_file = self._locked_file()
+            try:
+                self._refresh(have_file_lock=True)
+                self._write_compacted(list(self._items.values()))
+                self._reset()
+                self._file_id = None
+                self._refresh(have_file_lock=True)
+            finally:
+                lock_file.close()
@@ -0,0 +1,100 @@
+"""
+JSON Store
+Shared read/write layer for the JSON data files.
+Parsed documents are cached per process and revalidated by (inode, mtime, size),
+so an unchanged file is never re-parsed. Every reader gets its own copy (decoded
+from a marshal snapshot - cheaper than json.load) and may mutate it freely; the
+cached document is only replaced by a write. Writes are compact and atomic
+(temp file + os.replace), so concurrent readers never see a half-written file.
+"""
+import os
+import json
+import marshal
+import tempfile
+import threading
+
+_cache = {}  # path -> (stat key, marshal snapshot)
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0, 'writes': 0}
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _snapshot(data):
+    try:
+        return marshal.dumps(data)
+    except ValueError:
+        # Not plain JSON types - don't cache, the next read parses the file
+        return None
+
+
+def read_json(path, default=None):
+    """Return a private copy of the document at path.
+    Missing or empty file -> default (returned as-is)."""
+    key = _stat_key(path)
+    if key is None or key[2] == 0:
+        return default
+
+    with _lock:
+        entry = _cache.get(path)
+        if entry is not None and entry[0] == key:
+            _stats['hits'] += 1
+            return marshal.loads(entry[1])
+        _stats['misses'] += 1
+
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    snapshot = _snapshot(data)
+    if snapshot is not None:
+        with _lock:
+            _cache[path] = (key, snapshot)
+    return data
+
+
+def write_json(path, data):
+    """Write data as compact JSON, atomically, and refresh the cache"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.' + os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    snapshot = _snapshot(data)
+    key = _stat_key(path)
+    with _lock:
+        _stats['writes'] += 1
+        if snapshot is not None and key is not None:
+            _cache[path] = (key, snapshot)
+        else:
+            _cache.pop(path, None)
+
+
+def get_stats():
+    """Hit/miss/write counters for this process"""
+    with _lock:
+        stats = dict(_stats)
+        stats['cached_documents'] = len(_cache)
+    return stats
+
+
+def clear_cache():
+    """Drop all cached documents (counters are kept)"""
+    with _lock:
+        _cache.clear()
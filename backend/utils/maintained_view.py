@@ -0,0 +1,65 @@
+"""
+Maintained Views
+Process-wide structures derived from the clients data (deadline index, open
+tasks, ...) that are kept up to date instead of being recomputed per request.
+Each view is tagged with the 'data' collection version (see versions). A
+save_client in this process patches just the saved client (view.replace_client)
+and a patch_task just that task (view.replace_task) when that write was the
+only change since the view was built; anything else -
+save_data, a write by another worker - moves the version on and the next read
+rebuilds the view.
+"""
+import threading
+
+from .versions import get_version, bump_versions
+from .request_cache import add_client_save_listener, add_task_patch_listener
+
+
+class MaintainedView:
+    """Holder for one view object; the object must implement replace_client(client)
+    and replace_task(client, project, task)"""
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.RLock()  # hold while reading a view that mutates lazily
+        self.view = None
+        self.version = None
+        add_client_save_listener(self._client_saved)
+        add_task_patch_listener(self._task_patched)
+
+    def get(self, build):
+        """The up-to-date view; build() makes a new one from the current data"""
+        version = get_version('data')
+        if not version[0]:
+            # No versions yet - start counting so the view can be validated
+            bump_versions('data')
+            version = get_version('data')
+        with self.lock:
+            if self.view is None or self.version != version:
+                self.view = build()
+                self.version = version
+            return self.view
+
+    def _patch(self, version_before, apply):
+        """Run apply(view) if the write after version_before was the only change"""
+        with self.lock:
+            if self.view is None or self.version != version_before:
+                return
+            version_after = get_version('data')
+            if version_after != (version_before[0], version_before[1] + 1):
+                return  # someone else wrote too - the next read rebuilds
+            apply(self.view)
+            self.version = version_after
+
+    def _client_saved(self, client_data, version_before):
+        """save_client listener: patch the saved client"""
+        if not client_data or not client_data.get('id'):
+            return
+        self._patch(version_before, lambda view: view.replace_client(client_data))
+
+    def _task_patched(self, client, project, task, version_before):
+        """patch_task listener: patch the one task"""
+        self._patch(version_before, lambda view: view.replace_task(client, project, task))
+
+    def __repr__(self):
+        return f'<MaintainedView {self.name} version={self.version}>'
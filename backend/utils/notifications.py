@@ -1,12 +1,17 @@
 """
 Notifications Module
 Contains functions for managing user notifications (task assignments, etc.)
+Notifications are stored in an append-only journal (notifications_db.jsonl);
+the old notifications_db.json is imported the first time it is opened.
 """
 import os
 import json
 import uuid
+import marshal
 from datetime import datetime
 from flask import current_app
+from .journal import get_journal
+from .pagination import KeysetIndex, sort_key
 
 
 def get_notifications_file():
@@ -24,31 +29,35 @@ def get_notifications_file():
     return os.path.join(base_dir, 'notifications_db.json')
 
 
-def load_notifications():
-    """Load notifications from JSON file"""
+def get_notifications_journal():
+    """Get the notifications journal (next to the legacy JSON file)"""
     notifications_file = get_notifications_file()
-    
-    if not os.path.exists(notifications_file) or os.stat(notifications_file).st_size == 0:
-        return {'notifications': []}
-    
+    root, ext = os.path.splitext(notifications_file)
+    return get_journal(root + '.jsonl', legacy_path=notifications_file, legacy_key='notifications')
+
+
+def load_notifications():
+    """Load all notifications"""
     try:
-        with open(notifications_file, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            # Ensure the structure is correct
-            if isinstance(data, list):
-                return {'notifications': data}
-            return data
+        return {'notifications': get_notifications_journal().all()}
     except (json.JSONDecodeError, Exception) as e:
         print(f"Error loading notifications: {e}")
         return {'notifications': []}
 
 
 def save_notifications(data):
-    """Save notifications to JSON file"""
-    notifications_file = get_notifications_file()
-    
-    with open(notifications_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+    """Save notifications (only new/changed ones are written)"""
+    notifications = data.get('notifications', []) if isinstance(data, dict) else data
+    get_notifications_journal().replace_all(notifications)
+
+
+def _find_notifications(predicate):
+    """Copies of the notifications matching predicate"""
+    try:
+        return get_notifications_journal().find(predicate)
+    except (json.JSONDecodeError, Exception) as e:
+        print(f"Error loading notifications: {e}")
+        return []
 
 
 def create_notification(user_id, notification_type, data):
@@ -71,8 +80,6 @@ def create_notification(user_id, notification_type, data):
     Returns:
         The created notification object
     """
-    notifications_data = load_notifications()
-    
     # Build the message based on type
     if notification_type == 'task_assigned':
         from_name = data.get('from_user_name', 'משתמש')
@@ -101,12 +108,55 @@ def create_notification(user_id, notification_type, data):
         'read': False
     }
     
-    notifications_data['notifications'].append(notification)
-    save_notifications(notifications_data)
+    get_notifications_journal().append(notification)
     
     return notification
 
 
+def _notification_key(notification):
+    return sort_key(notification.get('created_at'), notification.get('id'))
+
+
+def _build_user_indexes(notifications):
+    """{user_id: {'all': KeysetIndex, 'unread': KeysetIndex}} by created_at"""
+    by_user = {}
+    for notification in notifications:
+        by_user.setdefault(notification.get('user_id'), []).append(notification)
+    return {
+        user_id: {
+            'all': KeysetIndex(items, _notification_key),
+            'unread': KeysetIndex([n for n in items if not n.get('read', False)], _notification_key),
+        }
+        for user_id, items in by_user.items()
+    }
+
+
+def get_user_notifications_page(user_id, limit=50, after=None, unread_only=False):
+    """
+    Keyset page of a user's notifications, newest first
+    
+    Args:
+        user_id: The ID of the user
+        limit: Page size (None = all)
+        after: Sort key of the last notification of the previous page (see pagination)
+        unread_only: If True, only unread notifications
+    
+    Returns:
+        (notifications, next_key) - next_key is None on the last page
+    """
+    try:
+        indexes = get_notifications_journal().derived('by_user', _build_user_indexes)
+    except (json.JSONDecodeError, Exception) as e:
+        print(f"Error loading notifications: {e}")
+        return [], None
+    index = indexes.get(user_id)
+    if index is None:
+        return [], None
+    items, next_key = index['unread' if unread_only else 'all'].page(limit, after, descending=True)
+    # The index shares the journal's items - hand out copies
+    return marshal.loads(marshal.dumps(items)), next_key
+
+
 def get_user_notifications(user_id, unread_only=False, limit=50):
     """
     Get notifications for a specific user
@@ -119,20 +169,7 @@ def get_user_notifications(user_id, unread_only=False, limit=50):
     Returns:
         List of notification objects, sorted by creation date (newest first)
     """
-    notifications_data = load_notifications()
-    
-    user_notifications = [
-        n for n in notifications_data['notifications']
-        if n.get('user_id') == user_id
-    ]
-    
-    if unread_only:
-        user_notifications = [n for n in user_notifications if not n.get('read', False)]
-    
-    # Sort by creation date, newest first
-    user_notifications.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-    
-    return user_notifications[:limit]
+    return get_user_notifications_page(user_id, limit=limit, unread_only=unread_only)[0]
 
 
 def get_unread_count(user_id):
@@ -145,12 +182,14 @@ def get_unread_count(user_id):
     Returns:
         Integer count of unread notifications
     """
-    notifications_data = load_notifications()
-    
-    count = sum(
-        1 for n in notifications_data['notifications']
-        if n.get('user_id') == user_id and not n.get('read', False)
-    )
+    try:
+        count = sum(
+            1 for n in get_notifications_journal().iter_items()
+            if n.get('user_id') == user_id and not n.get('read', False)
+        )
+    except Exception as e:
+        print(f"Error loading notifications: {e}")
+        return 0
     
     return count
 
@@ -167,25 +206,26 @@ def mark_notifications_read(notification_ids, user_id=None):
     Returns:
         Number of notifications marked as read
     """
-    notifications_data = load_notifications()
-    count = 0
-    
-    for notification in notifications_data['notifications']:
-        if notification_ids == 'all':
-            if user_id and notification.get('user_id') == user_id and not notification.get('read', False):
-                notification['read'] = True
-                notification['read_at'] = datetime.now().isoformat()
-                count += 1
-        elif notification.get('id') in notification_ids:
-            if not notification.get('read', False):
-                notification['read'] = True
-                notification['read_at'] = datetime.now().isoformat()
-                count += 1
-    
-    if count > 0:
-        save_notifications(notifications_data)
-    
-    return count
+    if notification_ids == 'all':
+        if not user_id:
+            return 0
+        to_mark = _find_notifications(
+            lambda n: n.get('user_id') == user_id and not n.get('read', False)
+        )
+    else:
+        wanted = set(notification_ids)
+        to_mark = _find_notifications(
+            lambda n: n.get('id') in wanted and not n.get('read', False)
+        )
+    
+    # Only the changed notifications are appended to the journal
+    read_at = datetime.now().isoformat()
+    for notification in to_mark:
+        notification['read'] = True
+        notification['read_at'] = read_at
+    get_notifications_journal().append_many(to_mark)
+    
+    return len(to_mark)
 
 
 def delete_old_notifications(days=30):
@@ -200,19 +240,17 @@ def delete_old_notifications(days=30):
     """
     from datetime import timedelta
     
-    notifications_data = load_notifications()
     cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
     
-    original_count = len(notifications_data['notifications'])
-    notifications_data['notifications'] = [
-        n for n in notifications_data['notifications']
-        if n.get('created_at', '') > cutoff_date
+    journal = get_notifications_journal()
+    old_ids = [
+        n.get('id') for n in journal.iter_items()
+        if n.get('created_at', '') <= cutoff_date
     ]
     
-    deleted_count = original_count - len(notifications_data['notifications'])
-    
+    deleted_count = journal.delete_many(old_ids)
     if deleted_count > 0:
-        save_notifications(notifications_data)
+        journal.compact()
     
     return deleted_count
 
@@ -229,14 +267,11 @@ def get_new_notifications_since(user_id, since_timestamp):
     Returns:
         List of new notifications
     """
-    notifications_data = load_notifications()
-    
-    new_notifications = [
-        n for n in notifications_data['notifications']
-        if n.get('user_id') == user_id 
+    new_notifications = _find_notifications(
+        lambda n: n.get('user_id') == user_id
         and n.get('created_at', '') > since_timestamp
         and not n.get('read', False)
-    ]
+    )
     
     # Sort by creation date, newest first
     new_notifications.sort(key=lambda x: x.get('created_at', ''), reverse=True)
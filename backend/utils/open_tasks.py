@@ -0,0 +1,180 @@
+"""
+Open Tasks View
+A maintained view of the open tasks of all clients, keyed by task, for the
+Quick Update screen and the admin open-tasks list. Each row carries a sortable
+creation timestamp (created_at, or the parsed dd/mm/yy created_date), and the
+view keeps secondary indexes by assignee and by client plus a list sorted by
+creation time, so both screens read and filter a ready-made list instead of
+walking every client -> project -> task.
+Maintained through maintained_view (patched per saved client / patched task).
+"""
+from bisect import bisect_left, insort
+
+from .maintained_view import MaintainedView
+from .pagination import created_timestamp, sort_key
+
+# Statuses the Quick Update screen works on (missing status = 'ממתין')
+QUICK_UPDATE_STATUSES = ('ממתין', 'בביצוע')
+DONE_STATUS = 'הושלם'
+
+
+def is_admin_open(task):
+    """Open for the admin list: not done and not completed"""
+    return not task.get('done', False) and task.get('status') != DONE_STATUS
+
+
+def is_quick_update(task):
+    return task.get('status', 'ממתין') in QUICK_UPDATE_STATUSES
+
+
+def _row(client, project, task):
+    if not (is_admin_open(task) or is_quick_update(task)):
+        return None
+    return {
+        'task_id': task.get('id') or '',
+        'title': task.get('title'),
+        'desc': task.get('desc'),
+        'task_number': task.get('task_number', ''),
+        'status': task.get('status'),
+        'note': task.get('note', ''),
+        'notes': task.get('notes', ''),
+        'manager_note': task.get('manager_note', ''),
+        'created_date': task.get('created_date', ''),
+        'created_ts': created_timestamp(task),
+        'assignee': task.get('assignee', '') or task.get('assigned_to', '') or '',
+        'client_id': client.get('id') or '',
+        'client_name': client.get('name'),
+        'client_assigned_user': client.get('assigned_user'),
+        'project_id': project.get('id') or '',
+        'project_title': project.get('title'),
+        'admin_open': is_admin_open(task),
+        'quick_update': is_quick_update(task),
+    }
+
+
+def _row_key(row):
+    return (row['client_id'], row['project_id'], row['task_id'])
+
+
+def row_sort_key(row):
+    """Paging key: creation time, then ids (unique)"""
+    return sort_key(row['created_ts'], row['task_id'], row['client_id'], row['project_id'])
+
+
+class OpenTasksView:
+    """Rows are shared - callers build their own response dicts from them"""
+
+    def __init__(self):
+        self.rows = {}  # (client_id, project_id, task_id) -> row
+        self.by_assignee = {}  # assignee -> set of keys
+        self.by_client = {}  # client_id -> set of keys
+        self.by_created = []  # row_sort_key of every row, ascending
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _add(self, row):
+        key = _row_key(row)
+        if key in self.rows:
+            self._remove(key)
+        self.rows[key] = row
+        self.by_assignee.setdefault(row['assignee'], set()).add(key)
+        self.by_client.setdefault(row['client_id'], set()).add(key)
+        insort(self.by_created, row_sort_key(row))
+
+    def _remove(self, key):
+        row = self.rows.pop(key)
+        for partition, owner in ((self.by_assignee, row['assignee']), (self.by_client, row['client_id'])):
+            keys = partition.get(owner)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del partition[owner]
+        position = row_sort_key(row)
+        i = bisect_left(self.by_created, position)
+        if i < len(self.by_created) and self.by_created[i] == position:
+            del self.by_created[i]
+
+    def rebuild(self, task_rows, clients):
+        """task_rows: query_tasks rows; clients: client summaries (for assigned_user)"""
+        self.__init__()
+        clients_by_id = {c.get('id'): c for c in clients}
+        for task_row in task_rows:
+            client = dict(clients_by_id.get(task_row['client_id']) or {}, id=task_row['client_id'],
+                          name=task_row.get('client_name'))
+            project = {'id': task_row['project_id'], 'title': task_row.get('project_title')}
+            row = _row(client, project, task_row['task'])
+            if row is None:
+                continue
+            key = _row_key(row)
+            if key in self.rows:
+                continue
+            self.rows[key] = row
+            self.by_assignee.setdefault(row['assignee'], set()).add(key)
+            self.by_client.setdefault(row['client_id'], set()).add(key)
+            self.by_created.append(row_sort_key(row))
+        self.by_created.sort()
+
+    def replace_client(self, client):
+        """Re-read the open tasks of one (full) client dict"""
+        for key in list(self.by_client.get(client.get('id'), ())):
+            self._remove(key)
+        for project in client.get('projects', []) or []:
+            for task in project.get('tasks', []) or []:
+                row = _row(client, project, task)
+                if row is not None:
+                    self._add(row)
+
+    def replace_task(self, client, project, task):
+        """Re-read one task (client: id, name, assigned_user; project: id, title)"""
+        key = (client.get('id') or '', project.get('id') or '', task.get('id') or '')
+        if key in self.rows:
+            self._remove(key)
+        row = _row(client, project, task)
+        if row is not None:
+            self._add(row)
+
+    def select(self, kind, client_ids=None, assignee=None, status=None, limit=None, after=None):
+        """(rows, next_key): rows of kind ('admin_open' / 'quick_update'), newest
+        first, up to limit rows strictly before the `after` key (row_sort_key).
+        client_ids / assignee / status filter server-side (None = no filter)."""
+        candidates = None
+        if assignee is not None:
+            candidates = self.by_assignee.get(assignee, set())
+        if client_ids is not None and len(client_ids) < len(self.by_client):
+            by_clients = set()
+            for client_id in client_ids:
+                by_clients |= self.by_client.get(client_id, set())
+            candidates = by_clients if candidates is None else candidates & by_clients
+        stop = bisect_left(self.by_created, after) if after is not None else len(self.by_created)
+        rows = []
+        for i in range(stop - 1, -1, -1):
+            created_ts, task_id, client_id, project_id = self.by_created[i]
+            key = (client_id, project_id, task_id)
+            if candidates is not None and key not in candidates:
+                continue
+            row = self.rows[key]
+            if not row[kind]:
+                continue
+            if client_ids is not None and client_id not in client_ids:
+                continue
+            if status is not None and (row['status'] or '') != status:
+                continue
+            if limit is not None and len(rows) == limit:
+                return rows, row_sort_key(rows[-1])
+            rows.append(row)
+        return rows, None
+
+_view = MaintainedView('open_tasks')
+
+
+def _build(load_task_rows, load_clients):
+    view = OpenTasksView()
+    view.rebuild(load_task_rows(), load_clients())
+    return view
+
+
+def get_open_tasks_view(load_task_rows, load_clients):
+    """The up-to-date open-tasks view of this process.
+    load_task_rows() -> query_tasks rows; load_clients() -> client summaries"""
+    return _view.get(lambda: _build(load_task_rows, load_clients))
@@ -0,0 +1,128 @@
+"""
+Keyset Pagination
+One paging contract for list endpoints: `?limit=N&cursor=<opaque>`, answered with
+the page plus `next_cursor` (null on the last page). The cursor encodes the sort
+key of the last row returned and the next page starts strictly after it
+(SQL: WHERE key > :after ORDER BY key LIMIT :n; JSON mode: bisect on a sorted
+index), so the cost of a page does not grow with the size of the history.
+Sort keys are tuples ending with the row id, so they are unique and stable.
+Without `limit` the endpoints keep returning the whole list.
+"""
+import json
+import base64
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+
+from flask import request
+
+MAX_PAGE_SIZE = 500
+
+_CREATED_DATE_FORMATS = ('%d/%m/%y %H:%M', '%d/%m/%Y %H:%M', '%d/%m/%y', '%d/%m/%Y', '%Y-%m-%d')
+
+
+class PaginationError(ValueError):
+    """Bad limit / cursor in the request (-> 400)"""
+
+
+def sort_key(*parts):
+    """Normalized sort key of strings: None -> '', anything else str() so keys
+    always compare and round-trip through a cursor"""
+    return tuple('' if p is None else str(p) for p in parts)
+
+
+def created_timestamp(item):
+    """Sortable ISO creation time of an item: created_at, else the parsed
+    created_date ('dd/mm/yy HH:MM' and friends); '' if unknown"""
+    created_at = item.get('created_at')
+    if created_at and isinstance(created_at, str):
+        return created_at
+    created_date = item.get('created_date')
+    if created_date and isinstance(created_date, str):
+        for fmt in _CREATED_DATE_FORMATS:
+            try:
+                return datetime.strptime(created_date.strip(), fmt).isoformat()
+            except ValueError:
+                continue
+    return ''
+
+
+def encode_cursor(key):
+    """Opaque cursor for a sort key (None -> None)"""
+    if key is None:
+        return None
+    raw = json.dumps(list(key), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Sort key from a cursor made by encode_cursor (None/'' -> None)"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        key = json.loads(raw.decode('utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        raise PaginationError('cursor לא תקין')
+    if not isinstance(key, list) or not key or not all(isinstance(p, str) for p in key):
+        raise PaginationError('cursor לא תקין')
+    return tuple(key)
+
+
+def page_args(default_limit=None):
+    """(limit, after) from the query string. limit is None when the client did
+    not ask for a page (and there is no default)."""
+    value = request.args.get('limit')
+    if value in (None, ''):
+        limit = default_limit
+    else:
+        try:
+            limit = int(value)
+        except ValueError:
+            raise PaginationError('limit חייב להיות מספר')
+        if limit < 1:
+            raise PaginationError('limit חייב להיות חיובי')
+        limit = min(limit, MAX_PAGE_SIZE)
+    after = decode_cursor(request.args.get('cursor'))
+    if after is not None and limit is None:
+        raise PaginationError('cursor דורש limit')
+    return limit, after
+
+
+def split_page(rows, limit, key):
+    """(rows, next_key) from a query that fetched limit + 1 rows"""
+    if limit is None or len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, key(rows[-1])
+
+
+class KeysetIndex:
+    """Items sorted by key (ascending), paged with bisect.
+    Build once per data version (see json_store / Journal.derived) - the items
+    are shared, callers copy what they return."""
+
+    def __init__(self, items, key):
+        pairs = sorted(((key(item), item) for item in items), key=lambda pair: pair[0])
+        self.keys = [k for k, _ in pairs]
+        self.items = [item for _, item in pairs]
+
+    def __len__(self):
+        return len(self.items)
+
+    def page(self, limit, after=None, descending=False):
+        """(items, next_key): up to limit items strictly after the `after` key,
+        in ascending or descending key order. limit=None -> everything."""
+        if not descending:
+            start = bisect_right(self.keys, after) if after is not None else 0
+            end = len(self.items) if limit is None else min(start + limit, len(self.items))
+            next_key = self.keys[end - 1] if end < len(self.items) and end > start else None
+            return self.items[start:end], next_key
+        stop = bisect_left(self.keys, after) if after is not None else len(self.items)
+        start = 0 if limit is None else max(0, stop - limit)
+        next_key = self.keys[start] if start > 0 and stop > start else None
+        return self.items[start:stop][::-1], next_key
+
+
+def keyset_page(items, key, limit, after=None, descending=False):
+    """Page of an in-memory list (sorts it - prefer a cached KeysetIndex)"""
+    return KeysetIndex(items, key).page(limit, after, descending)
@@ -0,0 +1,287 @@
+"""
+Performance Metrics
+Per-route request metrics for this process: latency histogram, load_*/save_*
+calls, SQL statements (count and time) and response bytes. Loads count only
+real storage reads - request-cache hits are not counted. Requests that read
+load_data() more than once are counted, kept in a short "flagged" list and
+logged as a warning.
+Metrics are in memory and per worker process (each gunicorn worker reports
+its own numbers, labelled with its pid).
+"""
+import os
+import time
+import logging
+import threading
+from collections import deque
+from functools import wraps
+
+from flask import g, has_request_context, request
+
+# Latency histogram bucket upper bounds, in seconds (Prometheus convention)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FLAGGED_REQUESTS_KEPT = 50
+STORAGE_PREFIXES = ('load_', 'save_')
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_routes = {}  # (method, rule) -> stats dict
+_flagged = deque(maxlen=FLAGGED_REQUESTS_KEPT)
+_started_at = time.time()
+
+
+def _new_route_stats():
+    return {
+        'count': 0,
+        'errors': 0,
+        'seconds_total': 0.0,
+        'seconds_max': 0.0,
+        'buckets': [0] * (len(LATENCY_BUCKETS) + 1),  # last one is +Inf
+        'storage_calls': {},
+        'sql_count': 0,
+        'sql_seconds': 0.0,
+        'bytes_total': 0,
+        'repeated_load_data': 0,
+    }
+
+
+def _request_stats():
+    """This request's counters (None outside a request or before tracking started)"""
+    if not has_request_context():
+        return None
+    return getattr(g, '_perf', None)
+
+
+# ---------- storage call / SQL instrumentation ----------
+
+def count_storage_call(name):
+    stats = _request_stats()
+    if stats is not None:
+        stats['storage_calls'][name] = stats['storage_calls'].get(name, 0) + 1
+
+
+def _counting(func, name):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        count_storage_call(name)
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def instrument_storage_functions(namespace, modules):
+    """Count the load_*/save_* functions in namespace (a module's globals()) that
+    were defined in one of modules. A request_cached load_* is counted through
+    its .uncached function, so only cache misses (real reads) are counted."""
+    for name, func in list(namespace.items()):
+        if not name.startswith(STORAGE_PREFIXES) or not callable(func) or isinstance(func, type):
+            continue
+        if getattr(func, '__module__', None) not in modules:
+            continue
+        if getattr(func, '_perf_instrumented', False):
+            continue
+
+        if hasattr(func, 'uncached'):
+            # The cached wrapper calls wrapper.uncached on a miss
+            func.uncached = _counting(func.uncached, name)
+            func._perf_instrumented = True
+        else:
+            wrapper = _counting(func, name)
+            wrapper._perf_instrumented = True
+            namespace[name] = wrapper
+
+
+def instrument_engine(engine):
+    """Count SQL statements and their time through SQLAlchemy engine events"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_perf_query_start', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get('_perf_query_start')
+        elapsed = time.perf_counter() - starts.pop() if starts else 0.0
+        stats = _request_stats()
+        if stats is not None:
+            stats['sql_count'] += 1
+            stats['sql_seconds'] += elapsed
+
+
+# ---------- request hooks ----------
+
+def _route_key():
+    rule = request.url_rule.rule if request.url_rule is not None else '<unmatched>'
+    return (request.method, rule)
+
+
+def _record(status_code, nbytes):
+    stats = _request_stats()
+    if stats is None or stats.get('recorded'):
+        return
+    stats['recorded'] = True
+    elapsed = time.perf_counter() - stats['start']
+    load_data_calls = stats['storage_calls'].get('load_data', 0)
+    key = _route_key()
+
+    with _lock:
+        route = _routes.get(key)
+        if route is None:
+            route = _routes[key] = _new_route_stats()
+        route['count'] += 1
+        if status_code >= 500:
+            route['errors'] += 1
+        route['seconds_total'] += elapsed
+        route['seconds_max'] = max(route['seconds_max'], elapsed)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                route['buckets'][i] += 1
+                break
+        else:
+            route['buckets'][-1] += 1
+        for name, calls in stats['storage_calls'].items():
+            route['storage_calls'][name] = route['storage_calls'].get(name, 0) + calls
+        route['sql_count'] += stats['sql_count']
+        route['sql_seconds'] += stats['sql_seconds']
+        route['bytes_total'] += nbytes
+        if load_data_calls > 1:
+            route['repeated_load_data'] += 1
+            _flagged.append({
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'method': key[0],
+                'route': key[1],
+                'path': request.path,
+                'load_data_calls': load_data_calls,
+                'ms': round(elapsed * 1000, 1),
+            })
+
+    if load_data_calls > 1:
+        logger.warning("%s %s read load_data() %d times", key[0], request.path, load_data_calls)
+
+
+def init_perf(app):
+    """Register the metric hooks on a Flask app"""
+    @app.before_request
+    def _perf_start():
+        g._perf = {
+            'start': time.perf_counter(),
+            'storage_calls': {},
+            'sql_count': 0,
+            'sql_seconds': 0.0,
+        }
+
+    @app.after_request
+    def _perf_record(response):
+        nbytes = response.content_length
+        if nbytes is None and not response.direct_passthrough and not response.is_streamed:
+            nbytes = len(response.get_data())
+        _record(response.status_code, nbytes or 0)
+        return response
+
+    @app.teardown_request
+    def _perf_record_error(exc):
+        # after_request does not run when the view raised
+        if exc is not None:
+            _record(500, 0)
+
+
+# ---------- reporting ----------
+
+def _quantile(buckets, count, q):
+    """Upper bound of the histogram bucket that holds quantile q (seconds)"""
+    if not count:
+        return None
+    target = q * count
+    seen = 0
+    for i, n in enumerate(buckets):
+        seen += n
+        if seen >= target:
+            return LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else float('inf')
+    return float('inf')
+
+
+def get_perf_stats():
+    """Snapshot of all route metrics, slowest (by total time) first"""
+    with _lock:
+        routes = [(key, dict(stats, buckets=list(stats['buckets']), storage_calls=dict(stats['storage_calls'])))
+                  for key, stats in _routes.items()]
+        flagged = list(_flagged)
+
+    result = []
+    for (method, rule), stats in routes:
+        count = stats['count']
+        p50 = _quantile(stats['buckets'], count, 0.5)
+        p95 = _quantile(stats['buckets'], count, 0.95)
+        result.append({
+            'method': method,
+            'route': rule,
+            'count': count,
+            'errors': stats['errors'],
+            'avg_ms': round(stats['seconds_total'] / count * 1000, 1) if count else 0,
+            'max_ms': round(stats['seconds_max'] * 1000, 1),
+            'p50_ms_le': None if p50 is None or p50 == float('inf') else p50 * 1000,
+            'p95_ms_le': None if p95 is None or p95 == float('inf') else p95 * 1000,
+            'total_seconds': round(stats['seconds_total'], 3),
+            'storage_calls': stats['storage_calls'],
+            'sql_count': stats['sql_count'],
+            'sql_ms': round(stats['sql_seconds'] * 1000, 1),
+            'avg_bytes': stats['bytes_total'] // count if count else 0,
+            'repeated_load_data': stats['repeated_load_data'],
+        })
+    result.sort(key=lambda r: r['total_seconds'], reverse=True)
+    return {
+        'pid': os.getpid(),
+        'uptime_seconds': round(time.time() - _started_at),
+        'routes': result,
+        'flagged_requests': flagged,
+    }
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def render_prometheus():
+    """The route metrics in Prometheus text exposition format"""
+    with _lock:
+        routes = [(key, dict(stats, buckets=list(stats['buckets']), storage_calls=dict(stats['storage_calls'])))
+                  for key, stats in _routes.items()]
+
+    pid = os.getpid()
+    lines = [
+        '# HELP app_request_duration_seconds Request latency by route.',
+        '# TYPE app_request_duration_seconds histogram',
+    ]
+    for (method, rule), stats in routes:
+        labels = f'method="{_label(method)}",route="{_label(rule)}",pid="{pid}"'
+        cumulative = 0
+        for bound, n in zip(LATENCY_BUCKETS, stats['buckets']):
+            cumulative += n
+            lines.append(f'app_request_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'app_request_duration_seconds_bucket{{{labels},le="+Inf"}} {stats["count"]}')
+        lines.append(f'app_request_duration_seconds_sum{{{labels}}} {stats["seconds_total"]:.6f}')
+        lines.append(f'app_request_duration_seconds_count{{{labels}}} {stats["count"]}')
+
+    counters = (
+        ('app_request_errors_total', 'Requests that ended with a 5xx status.', 'errors'),
+        ('app_sql_statements_total', 'SQL statements executed.', 'sql_count'),
+        ('app_sql_seconds_total', 'Time spent executing SQL.', 'sql_seconds'),
+        ('app_response_bytes_total', 'Response body bytes.', 'bytes_total'),
+        ('app_repeated_load_data_total', 'Requests that called load_data() more than once.', 'repeated_load_data'),
+    )
+    for metric, help_text, field in counters:
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} counter')
+        for (method, rule), stats in routes:
+            labels = f'method="{_label(method)}",route="{_label(rule)}",pid="{pid}"'
+            lines.append(f'{metric}{{{labels}}} {stats[field]}')
+
+    lines.append('# HELP app_storage_calls_total load_*/save_* calls by route and function.')
+    lines.append('# TYPE app_storage_calls_total counter')
+    for (method, rule), stats in routes:
+        for name, calls in sorted(stats['storage_calls'].items()):
+            lines.append(
+                f'app_storage_calls_total{{method="{_label(method)}",route="{_label(rule)}",'
+                f'function="{_label(name)}",pid="{pid}"}} {calls}'
+            )
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,66 @@
+"""
+Permission Matcher
+Compiled form of the page-permissions document ({route prefix: required role}).
+Routes are stored in a character trie and a path resolves to the role of the
+LONGEST route that is a prefix of it, independent of the document's key order.
+The compiled matcher is kept per process and rebuilt only when the permissions
+file changes (checked by stat, without reading it) or is saved.
+"""
+import os
+import threading
+
+_ROLE = object()  # key of the required role inside a trie node
+
+_matchers = {}  # path -> (stat key, PermissionMatcher)
+_lock = threading.Lock()
+
+
+class PermissionMatcher:
+    def __init__(self, permissions):
+        self._root = {}
+        for route, role in (permissions or {}).items():
+            node = self._root
+            for ch in route:
+                node = node.setdefault(ch, {})
+            node[_ROLE] = role
+
+    def required_role(self, route_path):
+        """Role required for route_path, or None if no route matches"""
+        node = self._root
+        role = node.get(_ROLE)
+        for ch in route_path or '':
+            node = node.get(ch)
+            if node is None:
+                break
+            role = node.get(_ROLE, role)
+        return role
+
+
+def _stat_key(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def get_permission_matcher(path, load_permissions):
+    """Matcher for the permissions file at path.
+    load_permissions is only called when the file changed since the last build."""
+    key = _stat_key(path)
+    with _lock:
+        entry = _matchers.get(path)
+        if entry is not None and key is not None and entry[0] == key:
+            return entry[1]
+    matcher = PermissionMatcher(load_permissions())
+    with _lock:
+        # Key of the file as it was before loading (a later write triggers a
+        # rebuild); stat again if load_permissions just created it
+        _matchers[path] = (key if key is not None else _stat_key(path), matcher)
+    return matcher
+
+
+def invalidate_permission_matcher(path):
+    """Call after saving the permissions file"""
+    with _lock:
+        _matchers.pop(path, None)
@@ -2,7 +2,8 @@
 Permission Utilities
 Contains functions for checking user permissions and roles
 """
-from backend.utils.helpers import load_users, load_permissions
+from backend.utils.helpers import load_users, load_permissions, get_permissions_file
+from backend.utils.permission_matcher import get_permission_matcher
 
 
 def get_user_role(user_id):
@@ -62,14 +63,9 @@ def check_permission(route_path, user_role):
     - מנהל (Manager): Manager and admin only
     - אדמין (Admin): Admin only
     """
-    permissions = load_permissions()
-    
-    # Find the matching permission
-    required_role = None
-    for route, role in permissions.items():
-        if route_path == route or route_path.startswith(route):
-            required_role = role
-            break
+    # Longest matching route prefix (compiled trie, rebuilt only when the file changes)
+    matcher = get_permission_matcher(get_permissions_file(), load_permissions)
+    required_role = matcher.required_role(route_path)
     
     # If not found, default to everyone can access
     if required_role is None:
@@ -83,6 +79,12 @@ def check_permission(route_path, user_role):
     return user_level >= required_level
 
 
+def authorize(user, route_path):
+    """Check page access for a user object - role from the user, permissions from memory"""
+    role = getattr(user, 'role', None) or get_user_role(user.id)
+    return check_permission(route_path, role)
+
+
 def get_accessible_clients(user_id, user_role, clients):
     """Get list of clients accessible to a user"""
     if is_manager_or_admin(user_id, user_role):
@@ -0,0 +1,109 @@
+"""
+Presence Tracking
+In-memory "last seen" map for logged-in users. A request only touches memory:
+each user is recorded at most once per TOUCH_INTERVAL seconds, and the map is
+flushed to the activity JSON file in one batch at most once per FLUSH_INTERVAL
+(merged with what other worker processes wrote, newest timestamp wins).
+"""
+import atexit
+import threading
+import time
+from datetime import datetime
+
+from backend.utils.json_store import read_json, write_json
+
+TOUCH_INTERVAL = 60  # seconds between recorded activity of the same user
+FLUSH_INTERVAL = 60  # seconds between batched writes to the file
+ACTIVE_WINDOW = 3600  # a user seen within the last hour counts as active
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+def get_presence_tracker(path):
+    """Return the (per-process) presence tracker for an activity file"""
+    with _trackers_lock:
+        tracker = _trackers.get(path)
+        if tracker is None:
+            tracker = _trackers[path] = PresenceTracker(path)
+        return tracker
+
+
+class PresenceTracker:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._last_seen = {}  # user_id -> ISO timestamp, recorded by this process
+        self._touched_at = {}  # user_id -> monotonic time of the last recording
+        self._dirty = set()
+        self._flushed_at = time.monotonic()
+
+    def touch(self, user_id):
+        """Record activity of a user (cheap - normally no I/O at all)"""
+        if not user_id:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now - self._touched_at.get(user_id, -TOUCH_INTERVAL) < TOUCH_INTERVAL:
+                return
+            self._touched_at[user_id] = now
+            self._last_seen[user_id] = datetime.now().isoformat()
+            self._dirty.add(user_id)
+        self._flush_if_due()
+
+    def _flush_if_due(self):
+        with self._lock:
+            due = self._dirty and time.monotonic() - self._flushed_at >= FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write pending activity to the file in a single batch"""
+        with self._lock:
+            if not self._dirty:
+                return
+            pending = {user_id: self._last_seen[user_id] for user_id in self._dirty}
+            self._dirty.clear()
+            self._flushed_at = time.monotonic()
+        try:
+            activity = read_json(self.path, {}) or {}
+            for user_id, seen in pending.items():
+                if seen > activity.get(user_id, ''):
+                    activity[user_id] = seen
+            write_json(self.path, activity)
+        except Exception as e:
+            print(f"Error flushing user activity: {e}")
+            with self._lock:
+                self._dirty.update(pending)
+
+    def last_seen(self, user_ids):
+        """{user_id: ISO timestamp or None} - file merged with this process' map"""
+        self._flush_if_due()
+        try:
+            activity = read_json(self.path, {}) or {}
+        except Exception:
+            activity = {}
+        with self._lock:
+            result = {}
+            for user_id in user_ids:
+                seen = max(activity.get(user_id) or '', self._last_seen.get(user_id) or '')
+                result[user_id] = seen or None
+        return result
+
+    def get_presence(self, user_ids, window=ACTIVE_WINDOW):
+        """{user_id: True/False} - whether each user was active within window seconds"""
+        now = datetime.now()
+        presence = {}
+        for user_id, seen in self.last_seen(user_ids).items():
+            try:
+                presence[user_id] = seen is not None and (now - datetime.fromisoformat(seen)).total_seconds() < window
+            except ValueError:
+                presence[user_id] = False
+        return presence
+
+
+@atexit.register
+def _flush_all():
+    # Don't lose the last batch when the worker shuts down
+    for tracker in list(_trackers.values()):
+        tracker.flush()
@@ -0,0 +1,80 @@
+"""
+Session Principal
+The logged-in user's id, name and role are kept in the signed session cookie
+(written at login), so loading current_user does not touch the users storage.
+Each principal carries a version of the user record (hash of name + role);
+it is checked against a per-process map of current versions that is rebuilt
+from load_users() at most once per VERSION_CHECK_SECONDS, so a role change or
+a deleted user is picked up by every worker within that window.
+"""
+import hashlib
+import threading
+import time
+
+from flask import session
+
+SESSION_KEY = '_principal'
+VERSION_CHECK_SECONDS = 5
+DEFAULT_ROLE = 'עובד'
+
+_versions = {'versions': None, 'checked_at': 0.0}
+_versions_lock = threading.Lock()
+
+
+def principal_version(user_record):
+    """Version stamp of the fields a principal is built from"""
+    payload = '\x1f'.join([user_record.get('name') or '', user_record.get('role') or DEFAULT_ROLE])
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _current_versions(load_users):
+    now = time.monotonic()
+    with _versions_lock:
+        versions = _versions['versions']
+        if versions is not None and now - _versions['checked_at'] < VERSION_CHECK_SECONDS:
+            return versions
+    versions = {user_id: principal_version(info) for user_id, info in load_users().items()}
+    with _versions_lock:
+        _versions['versions'] = versions
+        _versions['checked_at'] = now
+    return versions
+
+
+def invalidate_principals():
+    """Call after changing or deleting a user - the next check reloads the versions"""
+    with _versions_lock:
+        _versions['versions'] = None
+        _versions['checked_at'] = 0.0
+
+
+def store_principal(user_id, user_record):
+    """Write the principal into the session (at login, or after a version change)"""
+    principal = {
+        'id': user_id,
+        'name': user_record.get('name') or 'Unknown',
+        'role': user_record.get('role') or DEFAULT_ROLE,
+        'v': principal_version(user_record),
+    }
+    session[SESSION_KEY] = principal
+    return principal
+
+
+def clear_principal():
+    session.pop(SESSION_KEY, None)
+
+
+def load_principal(user_id, load_users):
+    """The principal of user_id: from the session when its version is current,
+    otherwise rebuilt from load_users() (and re-stored). None = no such user."""
+    versions = _current_versions(load_users)
+    if user_id not in versions:
+        clear_principal()
+        return None
+    principal = session.get(SESSION_KEY)
+    if principal and principal.get('id') == user_id and principal.get('v') == versions[user_id]:
+        return principal
+    users = load_users()
+    if user_id not in users:
+        clear_principal()
+        return None
+    return store_principal(user_id, users[user_id])
@@ -0,0 +1,227 @@
+"""
+Request Cache
+Request-scoped identity map for the storage layer.
+Each dataset is loaded at most once per request (kept on flask.g) and saves
+write through to the cached copy. Writes happen when the save is called, so a
+route sees a failed save before it answers or triggers side effects. Task
+patches write one task's changed fields and are applied to the cached copies.
+"""
+from functools import wraps
+from flask import g, has_request_context
+from .versions import bump_versions, get_version
+
+# Called as listener(client_data, data_version_before) after each save_client
+# write - lets process-wide indexes patch one client instead of rebuilding
+_client_save_listeners = []
+
+
+def add_client_save_listener(listener):
+    if listener not in _client_save_listeners:
+        _client_save_listeners.append(listener)
+
+
+# Called as listener(client, project, task, data_version_before) after each
+# patch_task write - client / project are light dicts (no projects / tasks)
+_task_patch_listeners = []
+
+
+def add_task_patch_listener(listener):
+    if listener not in _task_patch_listeners:
+        _task_patch_listeners.append(listener)
+
+
+def get_request_store():
+    """Return the per-request cache dict, or None outside a request"""
+    if not has_request_context():
+        return None
+    store = getattr(g, '_storage_cache', None)
+    if store is None:
+        store = g._storage_cache = {}
+    return store
+
+
+def _cache_key(namespace, key):
+    # Namespace by module - the JSON helpers and the DB helpers can both be
+    # active in the same request and must not share entries
+    return (namespace, key)
+
+
+def request_cached(key):
+    """Decorator for argument-less load_* functions"""
+    def decorator(func):
+        cache_key = _cache_key(func.__module__, key)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            store = get_request_store()
+            # Through wrapper.uncached, so it can be instrumented (perf)
+            if store is None or args or kwargs:
+                return wrapper.uncached(*args, **kwargs)
+            if cache_key not in store:
+                store[cache_key] = wrapper.uncached()
+            return store[cache_key]
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+def write_through(key, invalidates=()):
+    """Decorator for save_* functions that replace a whole dataset"""
+    def decorator(func):
+        cache_key = _cache_key(func.__module__, key)
+        extra_keys = [_cache_key(func.__module__, k) for k in invalidates]
+
+        @wraps(func)
+        def wrapper(data, *args, **kwargs):
+            store = get_request_store()
+            if store is None:
+                result = func(data, *args, **kwargs)
+                bump_versions(key)
+                return result
+            result = func(data, *args, **kwargs)
+            bump_versions(key)
+            store[cache_key] = data
+            for k in extra_keys:
+                store.pop(k, None)
+            return result
+        return wrapper
+    return decorator
+
+
+def write_through_item(key):
+    """Decorator for save_<item> functions that write one item of a dataset:
+    the cached list (if loaded in this request) is updated in place."""
+    def decorator(func):
+        cache_key = _cache_key(func.__module__, key)
+
+        @wraps(func)
+        def wrapper(item, *args, **kwargs):
+            store = get_request_store()
+            if store is None:
+                result = func(item, *args, **kwargs)
+                bump_versions(key)
+                return result
+            result = func(item, *args, **kwargs)
+            bump_versions(key)
+            items = store.get(cache_key)
+            if items is not None and item.get('id'):
+                for i, existing in enumerate(items):
+                    if existing.get('id') == item['id']:
+                        if existing is not item:
+                            items[i] = item
+                        break
+                else:
+                    items.append(item)
+            return result
+        return wrapper
+    return decorator
+
+
+def invalidate(namespace, *keys):
+    """Drop cached entries of a module (pass __name__) - for writes that are not full saves"""
+    bump_versions(*keys)
+    store = get_request_store()
+    if store is None:
+        return
+    for key in keys:
+        store.pop(_cache_key(namespace, key), None)
+
+
+def cached_client(namespace, client_id):
+    """Look a client up in this request's cache: the full list if it was loaded,
+    otherwise a previous single-client load. Returns (found, client)."""
+    store = get_request_store()
+    if store is None or not client_id:
+        return False, None
+    clients = store.get(_cache_key(namespace, 'data'))
+    if clients is not None:
+        return True, next((c for c in clients if c.get('id') == client_id), None)
+    key = _cache_key(namespace, ('client', client_id))
+    if key in store:
+        return True, store[key]
+    return False, None
+
+
+def remember_client(namespace, client_id, client):
+    """Store a single-client load result in this request's cache"""
+    store = get_request_store()
+    if store is not None and client_id:
+        store[_cache_key(namespace, ('client', client_id))] = client
+
+
+def write_through_client(func):
+    """Decorator for save_client: the client is written now, then the request's
+    cached copies (full list / single-client load) point at the saved dict and
+    the save listeners are notified."""
+    @wraps(func)
+    def wrapper(client_data):
+        version_before = get_version('data')
+        result = func(client_data)
+        bump_versions('data')
+        store = get_request_store()
+        if store is not None and client_data and client_data.get('id'):
+            client_id = client_data['id']
+            store[_cache_key(func.__module__, ('client', client_id))] = client_data
+            store.pop(_cache_key(func.__module__, 'client_summaries'), None)
+            store.pop(_cache_key(func.__module__, 'client_access_index'), None)
+            clients = store.get(_cache_key(func.__module__, 'data'))
+            if clients is not None:
+                for i, c in enumerate(clients):
+                    if c.get('id') == client_id:
+                        if c is not client_data:
+                            clients[i] = client_data
+                        break
+                else:
+                    clients.append(client_data)
+        for listener in _client_save_listeners:
+            try:
+                listener(client_data, version_before)
+            except Exception as e:
+                print(f"Error in client save listener {listener.__name__}: {e}")
+        return result
+    return wrapper
+
+
+def _cached_tasks(namespace, client_id, project_id, task_id):
+    """The copies of one task held in this request's cache"""
+    store = get_request_store()
+    if store is None:
+        return []
+    clients = [c for c in store.get(_cache_key(namespace, 'data')) or [] if c.get('id') == client_id]
+    single = store.get(_cache_key(namespace, ('client', client_id)))
+    if single is not None and all(single is not c for c in clients):
+        clients.append(single)
+    tasks = []
+    for client in clients:
+        for project in client.get('projects') or []:
+            if project.get('id') == project_id:
+                tasks.extend(t for t in project.get('tasks') or [] if t.get('id') == task_id)
+    return tasks
+
+
+def task_patch(func):
+    """Decorator for patch_task(client_id, project_id, task_id, changes, removed=()):
+    func writes only the changed fields of one task. func returns (client, project, task) - light client / project dicts
+    and the patched task - or None when the task does not exist. The wrapper
+    applies the patch to the copies cached in this request, notifies the
+    listeners and returns the task (or None)."""
+    @wraps(func)
+    def wrapper(client_id, project_id, task_id, changes, removed=()):
+        version_before = get_version('data')
+        result = func(client_id, project_id, task_id, changes, removed)
+        if result is None:
+            return None
+        bump_versions('data')
+        client, project, task = result
+        for cached in _cached_tasks(func.__module__, client_id, project_id, task_id):
+            cached.update(changes)
+            for key in removed:
+                cached.pop(key, None)
+        for listener in _task_patch_listeners:
+            try:
+                listener(client, project, task, version_before)
+            except Exception as e:
+                print(f"Error in task patch listener {listener.__name__}: {e}")
+        return task
+    return wrapper
+
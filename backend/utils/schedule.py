@@ -0,0 +1,279 @@
+"""
+Project Schedule
+Dependency-graph scheduling of a project's tasks (task['dependencies'] = ids of
+tasks in the same project). Tasks are ordered topologically, so deadlines
+propagate through whole chains: a task without its own deadline finishes
+estimated_hours / 8 work days (at least one) after the latest finish of its
+dependencies, counted with next_workday (Sunday-Thursday). A dependency
+finishes on its completed_at date when done, else on its deadline (own or
+computed), else on its created_at date.
+
+Dependency cycles are reported and the tasks in them (and everything after
+them) are left unscheduled. The critical path is the chain of driving
+dependencies that ends at the latest finish.
+
+Schedules are cached per project and tagged with the 'data' collection
+version (see versions), so a cache hit costs one version read. A patch_task
+(status / dates) in this process recomputes only the changed task and the tasks
+that depend on it, and a save_client drops that client's schedules; any other
+write moves the version on and the next read rebuilds.
+"""
+import heapq
+import threading
+from datetime import datetime, timedelta
+
+from .deadline_index import parse_deadline
+from .request_cache import add_client_save_listener, add_task_patch_listener
+from .versions import bump_versions, get_version
+
+DONE_STATUS = 'הושלם'
+HOURS_PER_DAY = 8
+MAX_CACHED_SCHEDULES = 500
+
+
+def _dependency_ids(task):
+    dependencies = task.get('dependencies') or []
+    return tuple(d for d in dependencies if isinstance(d, str)) if isinstance(dependencies, list) else ()
+
+
+def task_days(task):
+    """Work days of a task: estimated_hours / 8, at least one"""
+    try:
+        hours = float(task.get('estimated_hours', HOURS_PER_DAY))
+    except (TypeError, ValueError):
+        hours = HOURS_PER_DAY
+    return max(1, int(hours / HOURS_PER_DAY))
+
+
+class _Node:
+    __slots__ = ('id', 'position', 'dependencies', 'deadline', 'created', 'completed', 'days',
+                 'start', 'finish', 'computed', 'driver')
+
+    def __init__(self, task, position):
+        self.id = task['id']
+        self.position = position
+        self.dependencies = _dependency_ids(task)
+        self.set_task(task)
+
+    def set_task(self, task):
+        self.deadline = parse_deadline(task.get('deadline'))
+        self.created = parse_deadline(task.get('created_at'))
+        self.completed = parse_deadline(task.get('completed_at')) if task.get('status') == DONE_STATUS else None
+        self.days = task_days(task)
+        self.start = self.finish = self.driver = None
+        self.computed = False
+
+
+class ProjectSchedule:
+    """Schedule of one project's tasks. next_workday(datetime) -> datetime of the
+    first work day on or after it (app.get_next_workday)."""
+
+    def __init__(self, tasks, next_workday):
+        self.next_workday = next_workday
+        self.version = None  # 'data' version the schedule was built / patched at
+        self.nodes = {}
+        for task in tasks:
+            if task.get('id') and task['id'] not in self.nodes:
+                self.nodes[task['id']] = _Node(task, len(self.nodes))
+        self.dependents = {task_id: [] for task_id in self.nodes}
+        for node in self.nodes.values():
+            for dep_id in node.dependencies:
+                if dep_id in self.dependents:
+                    self.dependents[dep_id].append(node.id)
+        self._order()
+        for task_id in self.order:
+            self._compute(self.nodes[task_id])
+        self.critical_path = self._critical_path()
+
+    def _deps(self, node):
+        return [self.nodes[d] for d in node.dependencies if d in self.nodes]
+
+    def _order(self):
+        """Topological order (Kahn, ties by task position) and the cycles left over"""
+        indegree = {task_id: len(self._deps(node)) for task_id, node in self.nodes.items()}
+        # Ready tasks come out in project order
+        ready = [(node.position, task_id) for task_id, node in self.nodes.items() if indegree[task_id] == 0]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            _, task_id = heapq.heappop(ready)
+            order.append(task_id)
+            for dependent in self.dependents[task_id]:
+                indegree[dependent] -= 1
+                if indegree[dependent] == 0:
+                    heapq.heappush(ready, (self.nodes[dependent].position, dependent))
+        self.order = order
+        self.position_in_order = {task_id: i for i, task_id in enumerate(order)}
+        self.blocked = [task_id for task_id in self.nodes if task_id not in self.position_in_order]
+        self.cycles = self._find_cycles(set(self.blocked))
+
+    def _find_cycles(self, blocked):
+        """Each cycle once, as the list of task ids along its dependencies"""
+        cycles = []
+        done = set()
+        for start in sorted(blocked, key=lambda t: self.nodes[t].position):
+            if start in done:
+                continue
+            path, seen = [], {}
+            task_id = start
+            while task_id not in seen and task_id not in done:
+                seen[task_id] = len(path)
+                path.append(task_id)
+                # Every blocked task has a blocked dependency
+                task_id = next(d.id for d in self._deps(self.nodes[task_id]) if d.id in blocked)
+            if task_id in seen:
+                cycles.append(path[seen[task_id]:])
+            done.update(path)
+        return cycles
+
+    def _add_work_days(self, day, days):
+        current = datetime(day.year, day.month, day.day)
+        for _ in range(days):
+            current = self.next_workday(current + timedelta(days=1))
+        return current.date()
+
+    def _compute(self, node):
+        """start / finish of a node whose dependencies are computed"""
+        driver = None
+        for dep in self._deps(node):
+            if dep.finish is not None and (driver is None or dep.finish > driver.finish):
+                driver = dep
+        node.driver = driver.id if driver else None
+        node.computed = False
+        if driver is not None:
+            node.start = self._add_work_days(driver.finish, 1)
+            if node.deadline is None:
+                node.computed = True
+                deadline = self._add_work_days(driver.finish, node.days)
+            else:
+                deadline = node.deadline
+        else:
+            node.start = node.created
+            deadline = node.deadline
+        node.finish = node.completed or deadline or node.created
+
+    def _critical_path(self):
+        end = None
+        for task_id in self.order:
+            node = self.nodes[task_id]
+            if node.finish is not None and (end is None or node.finish > end.finish):
+                end = node
+        path = []
+        while end is not None:
+            path.append(end.id)
+            end = self.nodes[end.driver] if end.driver else None
+        return path[::-1]
+
+    def update_task(self, task):
+        """Recompute after one task changed; False if the graph itself changed
+        (dependencies, unknown / blocked task) and the schedule must be rebuilt"""
+        node = self.nodes.get(task.get('id'))
+        if node is None or node.id not in self.position_in_order or _dependency_ids(task) != node.dependencies:
+            return False
+        node.set_task(task)
+        affected = {node.id}
+        pending = [node.id]
+        while pending:
+            for dependent in self.dependents[pending.pop()]:
+                if dependent not in affected:
+                    affected.add(dependent)
+                    pending.append(dependent)
+        # Dependents behind a cycle stay unscheduled
+        affected = [task_id for task_id in affected if task_id in self.position_in_order]
+        for task_id in sorted(affected, key=self.position_in_order.__getitem__):
+            self._compute(self.nodes[task_id])
+        self.critical_path = self._critical_path()
+        return True
+
+    def computed_deadlines(self):
+        """{task_id: 'YYYY-MM-DD'} of tasks whose deadline comes from their dependencies"""
+        return {task_id: self.nodes[task_id].finish.isoformat()
+                for task_id in self.order if self.nodes[task_id].computed}
+
+    def to_dict(self):
+        critical = set(self.critical_path)
+        return {
+            'tasks': [
+                {
+                    'id': node.id,
+                    'start': node.start.isoformat() if node.start else None,
+                    'finish': node.finish.isoformat() if node.finish else None,
+                    'computed_deadline': node.computed,
+                    'critical': node.id in critical,
+                    'blocked': node.id not in self.position_in_order,
+                }
+                for node in self.nodes.values()
+            ],
+            'order': list(self.order),
+            'critical_path': list(self.critical_path),
+            'cycles': [list(cycle) for cycle in self.cycles],
+        }
+
+
+# (client_id, project_id) -> ProjectSchedule
+_schedules = {}
+_lock = threading.Lock()
+
+
+def get_project_schedule(client_id, project_id, load_project, next_workday):
+    """The schedule of a project - the cached one while the 'data' version is
+    unchanged. load_project() -> the project dict (with its tasks) or None;
+    called only to build. None if there is no such project."""
+    version = get_version('data')
+    if not version[0]:
+        # No versions yet - start counting so the cache can be validated
+        bump_versions('data')
+        version = get_version('data')
+    key = (client_id, project_id)
+    with _lock:
+        schedule = _schedules.get(key)
+        if schedule is not None and schedule.version == version:
+            return schedule
+    # The version is read before the data, so a write in between only causes
+    # one more rebuild
+    project = load_project()
+    if project is None:
+        return None
+    schedule = ProjectSchedule(project.get('tasks') or [], next_workday)
+    schedule.version = version
+    with _lock:
+        _schedules.pop(key, None)
+        while len(_schedules) >= MAX_CACHED_SCHEDULES:
+            _schedules.pop(next(iter(_schedules)))
+        _schedules[key] = schedule
+    return schedule
+
+
+def _patch(version_before, apply):
+    """Run apply(key, schedule) on the cached schedules if the write after
+    version_before was the only change, and move them to the new version;
+    apply returns False to drop a schedule"""
+    version_after = get_version('data')
+    if version_after != (version_before[0], version_before[1] + 1):
+        return  # someone else wrote too - the next read rebuilds
+    with _lock:
+        for key, schedule in list(_schedules.items()):
+            if schedule.version != version_before:
+                continue
+            if apply(key, schedule) is False:
+                del _schedules[key]
+            else:
+                schedule.version = version_after
+
+
+def _client_saved(client_data, version_before):
+    """save_client listener: drop the saved client's schedules"""
+    if not client_data or not client_data.get('id'):
+        return
+    client_id = client_data['id']
+    _patch(version_before, lambda key, schedule: key[0] != client_id)
+
+
+def _task_patched(client, project, task, version_before):
+    """patch_task listener: recompute the changed task's subgraph"""
+    changed = (client.get('id'), project.get('id'))
+    _patch(version_before, lambda key, schedule: key != changed or schedule.update_task(task))
+
+
+add_client_save_listener(_client_saved)
+add_task_patch_listener(_task_patched)
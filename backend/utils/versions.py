@@ -0,0 +1,120 @@
+"""
+Collection Versions
+Version counters per data collection ('data', 'users', 'suppliers', ...),
+bumped by the save functions (through the request_cache decorators) and shared
+by all worker processes through a small JSON file. Read endpoints derive strong
+ETags from the versions they depend on, so a conditional GET whose ETag still
+matches is answered with 304 before any load_* call.
+The file carries a random epoch: if it is lost or reset, every old ETag stops
+matching instead of colliding with restarted counters.
+"""
+import os
+import uuid
+import hashlib
+from datetime import date
+from functools import wraps
+
+from flask import request, current_app, has_request_context
+
+from .json_store import read_json, write_json
+from .compression import etag_variants
+
+try:
+    import fcntl
+except ImportError:  # Windows (local development) - single process, no file lock
+    fcntl = None
+
+_BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+VERSIONS_FILE = os.environ.get('COLLECTION_VERSIONS_FILE') or os.path.join(_BASE_DIR, 'collection_versions.json')
+
+
+def get_versions():
+    """{'epoch': str, 'versions': {collection: int}} (stat-cached read)"""
+    try:
+        data = read_json(VERSIONS_FILE, None)
+    except (OSError, ValueError):
+        data = None
+    if not isinstance(data, dict) or 'epoch' not in data:
+        return {'epoch': '', 'versions': {}}
+    return data
+
+
+def get_version(collection):
+    """(epoch, counter) of one collection - compare for equality only"""
+    data = get_versions()
+    return (data['epoch'], data['versions'].get(collection, 0))
+
+
+def bump_versions(*collections):
+    """Mark collections as changed (call after the write is done)"""
+    if not collections:
+        return
+    lock_file = None
+    try:
+        lock_file = open(VERSIONS_FILE + '.lock', 'a')
+        if fcntl:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        data = get_versions()
+        if not data['epoch']:
+            data = {'epoch': uuid.uuid4().hex[:12], 'versions': {}}
+        for collection in collections:
+            data['versions'][collection] = data['versions'].get(collection, 0) + 1
+        write_json(VERSIONS_FILE, data)
+    except Exception as e:
+        print(f"Error bumping collection versions {collections}: {e}")
+        # Never leave a stale version behind - dropping the file invalidates every ETag
+        try:
+            os.remove(VERSIONS_FILE)
+        except OSError:
+            pass
+    finally:
+        if lock_file:
+            lock_file.close()
+
+
+def collections_etag(collections, *extra):
+    """Strong ETag for the current versions of collections plus extra key parts"""
+    data = get_versions()
+    if not data['epoch']:
+        # No versions yet - start counting so the next request can be validated
+        bump_versions(*collections)
+        data = get_versions()
+    parts = [data['epoch']]
+    parts += [f"{c}:{data['versions'].get(c, 0)}" for c in collections]
+    parts += [str(p) for p in extra]
+    return hashlib.blake2b('\x1f'.join(parts).encode('utf-8'), digest_size=12).hexdigest()
+
+
+def conditional_get(*collections):
+    """Decorator for read-only JSON views: 304 when If-None-Match matches the
+    ETag of the current collection versions, without running the view.
+    The ETag also covers the user (id + role), the query string and the date
+    (views compute "today"-relative fields)."""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not has_request_context() or request.method != 'GET':
+                return view(*args, **kwargs)
+            from flask_login import current_user
+            user_key = (current_user.id, getattr(current_user, 'role', '')) if current_user.is_authenticated else ('', '')
+            etag = collections_etag(
+                collections, request.path, request.query_string.decode('latin-1'),
+                user_key[0], user_key[1], date.today().isoformat()
+            )
+            # The client may hold the gzip/br variant of the same ETag
+            matched = next((tag for tag in etag_variants(etag) if request.if_none_match.contains(tag)), None)
+            if matched:
+                response = current_app.response_class(status=304)
+                response.set_etag(matched)
+                response.headers['Cache-Control'] = 'private, no-cache'
+                return response
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            response.set_etag(etag)
+            # The browser may keep the body but must revalidate every time
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
@@ -5,7 +5,7 @@ Uses SQLAlchemy ORM with JSONB for complex nested data structures
 import os
 import json
 from datetime import datetime
-from sqlalchemy import create_engine, Column, String, Integer, Text, DateTime, JSON, Boolean
+from sqlalchemy import create_engine, Column, String, Integer, Text, DateTime, JSON, Boolean, Index, func
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session
 from sqlalchemy.dialects.postgresql import JSONB
@@ -86,6 +86,38 @@ class Client(Base):
     calculated_total = Column(Integer, default=0)
     calculated_open_charges = Column(Integer, default=0)
     calculated_monthly_revenue = Column(Integer, default=0)
+    # True = הפרויקטים והמשימות נשמרים בטבלאות projects/tasks (עמודת projects נשארת כגיבוי בלבד)
+    projects_normalized = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Keyset pages of the archive (same expression as load_archived_clients_page)
+    __table_args__ = (
+        Index('ix_clients_archived_at', archived, func.coalesce(archived_at, ''), id),
+    )
+
+class Project(Base):
+    __tablename__ = 'projects'
+    
+    id = Column(String, primary_key=True)
+    client_id = Column(String, nullable=False, index=True)
+    position = Column(Integer, default=0)  # Order inside the client's projects list
+    title = Column(String)
+    data = Column(JSONB)  # Project fields except 'tasks'
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class Task(Base):
+    __tablename__ = 'tasks'
+    
+    id = Column(String, primary_key=True)
+    client_id = Column(String, nullable=False, index=True)
+    project_id = Column(String, nullable=False, index=True)
+    position = Column(Integer, default=0)  # Order inside the project's tasks list
+    assignee = Column(String, index=True)
+    status = Column(String, index=True)
+    deadline = Column(String, index=True)  # ISO string as stored on the task
+    data = Column(JSONB)  # Full task data as JSON
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
@@ -110,8 +142,17 @@ class Message(Base):
     
     id = Column(String, primary_key=True)
     data = Column(JSONB)  # Full message data as JSON
+    # Copied from data on save (save_messages / save_message) for load_conversation_page
+    from_user = Column(String)
+    to_user = Column(String)
+    created_ts = Column(String)  # ISO time parsed from created_date (dd/mm/yy HH:MM)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Keyset pages of a conversation: each direction is one index range
+    __table_args__ = (
+        Index('ix_messages_conversation', 'from_user', 'to_user', 'created_ts', 'id'),
+    )
 
 class Event(Base):
     __tablename__ = 'events'
@@ -179,6 +220,14 @@ class TimeTrackingEntry(Base):
     manual_entry = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Indexes for query_time_entries (monthly reports per user / per client, per task)
+    __table_args__ = (
+        Index('ix_time_tracking_entries_date_user', 'date', 'user_id'),
+        Index('ix_time_tracking_entries_client_date', 'client_id', 'date'),
+        Index('ix_time_tracking_entries_task', 'task_id'),
+        Index('ix_time_tracking_entries_start', 'start_time', 'id'),
+    )
 
 class TimeTrackingActiveSession(Base):
     __tablename__ = 'time_tracking_active_sessions'
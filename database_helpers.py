@@ -5,20 +5,36 @@ but use PostgreSQL instead
 """
 import os
 import json
+import copy
+import time
 from werkzeug.security import generate_password_hash
-from sqlalchemy import text
+from sqlalchemy import text, func, tuple_, or_, and_, update, cast, Text
 from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.dialects.postgresql import insert as pg_insert, JSONB
 from database import (
-    get_db, User, Client, Supplier, Quote, Message, Event,
+    get_db, engine, Base, User, Client, Project, Task, Supplier, Quote, Message, Event,
     Equipment, ChecklistTemplate, Form, Permission, UserActivity,
     TimeTrackingEntry, TimeTrackingActiveSession
 )
 from datetime import datetime
+import uuid
+import logging
+from backend.utils.request_cache import (
+    request_cached, write_through, write_through_item, invalidate, cached_client,
+    remember_client, write_through_client, task_patch
+)
+from backend.utils.client_access import build_client_access_index
+from backend.utils.pagination import created_timestamp, split_page, sort_key
+from backend.utils.client_view import project_summary
+
+logger = logging.getLogger(__name__)
 
 # Ensure DB schema has columns the app relies on (Railway/prod safety).
 # חשוב: לא קוראים לזה בזמן ה-import! קריאה בזמן import חוסמת את עליית
 # ה-worker ב-gunicorn, ואם ה-DB איטי/לא נגיש זה גורם ל-WORKER TIMEOUT (502).
 # במקום זה הבדיקה רצה פעם אחת, בעצלתיים, בקריאה הראשונה ל-load_data.
+# רק DDL אידמפוטנטי וזול כאן - העברת הנתונים לטבלאות projects/tasks רצה לפני
+# עליית השרת (scripts/migrate_projects_to_tables.py), לא בתוך בקשה.
 _schema_checked = False
 
 def _ensure_clients_schema():
@@ -33,9 +49,23 @@ def _ensure_clients_schema():
                 "ADD COLUMN IF NOT EXISTS retainer_payments JSONB DEFAULT '{}'::jsonb;"
             )
         )
+        db.execute(
+            text(
+                "ALTER TABLE clients "
+                "ADD COLUMN IF NOT EXISTS projects_normalized BOOLEAN DEFAULT FALSE;"
+            )
+        )
+        for column in ('from_user', 'to_user', 'created_ts'):
+            db.execute(text(f"ALTER TABLE messages ADD COLUMN IF NOT EXISTS {column} VARCHAR;"))
         db.commit()
+        Base.metadata.create_all(bind=engine, tables=[Project.__table__, Task.__table__])
+        # create_all does not add indexes to existing tables
+        for index in (list(TimeTrackingEntry.__table__.indexes) + list(Client.__table__.indexes)
+                      + list(Message.__table__.indexes)):
+            index.create(bind=engine, checkfirst=True)
         _schema_checked = True
     except Exception:
+        logger.exception("Clients schema check failed - will retry on the next call")
         try:
             db.rollback()
         except Exception:
@@ -62,10 +92,39 @@ def _get_file_paths():
         'FORMS_FILE': os.path.join(BASE_DIR, 'forms_db.json'),
     }
 
+# ============ Users cache (process-wide) ============
+# משתמשים נטענים בכל request (user_loader, User, get_user_role, sidebar) - מחזיקים
+# עותק בזיכרון התהליך, ובודקים חותמת גרסה (count + max(updated_at)) לכל היותר
+# פעם ב-USERS_VERSION_CHECK_SECONDS, כדי לקלוט שינויים מ-worker אחר.
+USERS_VERSION_CHECK_SECONDS = 5
+_users_cache = {'users': None, 'version': None, 'checked_at': 0.0}
+
+def _users_version(db):
+    """Cheap version stamp for the users table"""
+    row = db.execute(text("SELECT count(*), max(updated_at) FROM users")).first()
+    return (row[0], row[1]) if row else (0, None)
+
+def invalidate_users_cache():
+    """Bump: the next load_users() reloads from the database"""
+    _users_cache['users'] = None
+    _users_cache['version'] = None
+    _users_cache['checked_at'] = 0.0
+
+@request_cached('users')
 def load_users():
-    """Load users from database"""
+    """Load users (served from the process cache while the version is unchanged)"""
+    cached = _users_cache['users']
+    now = time.time()
+    if cached is not None and now - _users_cache['checked_at'] < USERS_VERSION_CHECK_SECONDS:
+        return copy.deepcopy(cached)
+    
     db = get_db()
     try:
+        version = _users_version(db)
+        if cached is not None and version == _users_cache['version']:
+            _users_cache['checked_at'] = now
+            return copy.deepcopy(cached)
+        
         users = {}
         db_users = db.query(User).all()
         for user in db_users:
@@ -94,11 +153,16 @@ def load_users():
                 'name': admin.name,
                 'role': admin.role
             }
+            version = _users_version(db)
         
-        return users
+        _users_cache['users'] = users
+        _users_cache['version'] = version
+        _users_cache['checked_at'] = now
+        return copy.deepcopy(users)
     finally:
         db.close()
 
+@write_through('users')
 def save_users(users):
     """Save users to database"""
     db = get_db()
@@ -126,6 +190,7 @@ def save_users(users):
                 )
                 db.add(user)
         db.commit()
+        invalidate_users_cache()
     finally:
         db.close()
 
@@ -138,10 +203,210 @@ def delete_user_record(user_id):
             return False
         db.delete(user)
         db.commit()
+        invalidate_users_cache()
+        invalidate(__name__, 'users')
         return True
     finally:
         db.close()
 
+def _client_to_dict(client, projects_map=None):
+    """Convert a Client row to the dict shape the app works with.
+    projects_map ({client_id: [projects]}) is used for normalized clients."""
+    if client.projects_normalized:
+        projects = (projects_map or {}).get(client.id, [])
+    else:
+        projects = client.projects or []
+    return {
+        'id': client.id,
+        'name': client.name,
+        'client_number': client.client_number,
+        'retainer': client.retainer or 0,
+        'retainer_payments': client.retainer_payments or {},
+        'extra_charges': client.extra_charges or [],
+        'projects': projects,
+        'assigned_user': client.assigned_user,
+        'files': client.files or [],
+        'contacts': client.contacts or [],
+        'logo_url': client.logo_url,
+        'active': client.active if client.active is not None else True,
+        'archived': client.archived if client.archived is not None else False,
+        'archived_at': client.archived_at,
+        'calculated_extra': client.calculated_extra or 0,
+        'calculated_retainer': client.calculated_retainer or 0,
+        'calculated_total': client.calculated_total or 0,
+        'calculated_open_charges': client.calculated_open_charges or 0,
+        'calculated_monthly_revenue': client.calculated_monthly_revenue or 0
+    }
+
+# ============ Projects / Tasks (normalized tables) ============
+
+def _task_assignee(task):
+    """Single assignee for the indexed column: 'assignee', else first of 'assigned_user'"""
+    assignee = task.get('assignee')
+    if not assignee:
+        assigned = task.get('assigned_user')
+        if isinstance(assigned, list):
+            assignee = assigned[0] if assigned else None
+        else:
+            assignee = assigned
+    return assignee or None
+
+def _load_projects_map(db, client_ids=None):
+    """Build {client_id: [project dicts with nested 'tasks']} from the projects/tasks
+    tables - same shape as the old clients.projects JSONB."""
+    project_query = db.query(Project)
+    task_query = db.query(Task)
+    if client_ids is not None:
+        if not client_ids:
+            return {}
+        project_query = project_query.filter(Project.client_id.in_(client_ids))
+        task_query = task_query.filter(Task.client_id.in_(client_ids))
+    
+    tasks_by_project = {}
+    for task in task_query.order_by(Task.project_id, Task.position).all():
+        tasks_by_project.setdefault(task.project_id, []).append(task.data or {})
+    
+    projects_map = {}
+    for project in project_query.order_by(Project.client_id, Project.position).all():
+        project_dict = dict(project.data or {})
+        project_dict['id'] = project.id
+        project_dict['tasks'] = tasks_by_project.get(project.id, [])
+        projects_map.setdefault(project.client_id, []).append(project_dict)
+    return projects_map
+
+def _sync_client_projects(db, client_id, projects):
+    """Write a client's projects list into the projects/tasks tables, touching only
+    rows that actually changed (a single task edit = a single row update)."""
+    existing_projects = {p.id: p for p in db.query(Project).filter(Project.client_id == client_id).all()}
+    existing_tasks = {t.id: t for t in db.query(Task).filter(Task.client_id == client_id).all()}
+    seen_projects = set()
+    seen_tasks = set()
+    
+    for p_index, project_data in enumerate(projects or []):
+        if not project_data.get('id'):
+            project_data['id'] = str(uuid.uuid4())
+        project_id = project_data['id']
+        seen_projects.add(project_id)
+        payload = {k: v for k, v in project_data.items() if k != 'tasks'}
+        
+        row = existing_projects.get(project_id)
+        if row is None:
+            db.merge(Project(id=project_id, client_id=client_id, position=p_index,
+                             title=project_data.get('title'), data=payload))
+        elif row.data != payload or row.position != p_index:
+            row.position = p_index
+            row.title = project_data.get('title')
+            row.data = payload
+            flag_modified(row, 'data')
+        
+        for t_index, task_data in enumerate(project_data.get('tasks') or []):
+            if not task_data.get('id'):
+                task_data['id'] = str(uuid.uuid4())
+            task_id = task_data['id']
+            seen_tasks.add(task_id)
+            
+            row = existing_tasks.get(task_id)
+            if row is None:
+                db.merge(Task(id=task_id, client_id=client_id, project_id=project_id,
+                              position=t_index, assignee=_task_assignee(task_data),
+                              status=task_data.get('status'), deadline=task_data.get('deadline'),
+                              data=task_data))
+            elif row.data != task_data or row.position != t_index or row.project_id != project_id:
+                row.project_id = project_id
+                row.position = t_index
+                row.assignee = _task_assignee(task_data)
+                row.status = task_data.get('status')
+                row.deadline = task_data.get('deadline')
+                row.data = task_data
+                flag_modified(row, 'data')
+    
+    for task_id, row in existing_tasks.items():
+        if task_id not in seen_tasks:
+            db.delete(row)
+    for project_id, row in existing_projects.items():
+        if project_id not in seen_projects:
+            db.delete(row)
+
+def migrate_projects_to_tables(db=None):
+    """One-time migration: move clients.projects JSONB into the projects/tasks tables.
+    Idempotent - only clients that are not normalized yet are touched."""
+    own_session = db is None
+    if own_session:
+        db = get_db()
+    try:
+        pending = db.query(Client).filter(
+            Client.projects_normalized.isnot(True)
+        ).all()
+        for client in pending:
+            _sync_client_projects(db, client.id, client.projects or [])
+            client.projects_normalized = True
+        if pending:
+            db.commit()
+        return len(pending)
+    finally:
+        if own_session:
+            db.close()
+
+def query_tasks(client_id=None, assignee=None, status=None, exclude_status=None,
+                has_deadline=False):
+    """Indexed task query. Returns a list of dicts:
+    {'client_id', 'client_name', 'project_id', 'project_title', 'task'}"""
+    _ensure_clients_schema()
+    db = get_db()
+    try:
+        query = db.query(Task, Client.name, Project.title).join(
+            Client, Client.id == Task.client_id
+        ).join(Project, Project.id == Task.project_id)
+        if client_id:
+            query = query.filter(Task.client_id == client_id)
+        if assignee:
+            query = query.filter(Task.assignee == assignee)
+        if status:
+            query = query.filter(Task.status == status)
+        if exclude_status:
+            query = query.filter((Task.status.is_(None)) | (Task.status != exclude_status))
+        if has_deadline:
+            query = query.filter(Task.deadline.isnot(None), Task.deadline != '')
+        
+        results = []
+        for task, client_name, project_title in query.order_by(Task.client_id, Task.position).all():
+            results.append({
+                'client_id': task.client_id,
+                'client_name': client_name,
+                'project_id': task.project_id,
+                'project_title': project_title,
+                'task': task.data or {}
+            })
+        
+        # לקוחות שעוד לא עברו מיגרציה - סריקה של ה-JSONB
+        legacy_query = db.query(Client).filter(
+            Client.projects_normalized.isnot(True)
+        )
+        if client_id:
+            legacy_query = legacy_query.filter(Client.id == client_id)
+        for client in legacy_query.all():
+            for project in client.projects or []:
+                for task in project.get('tasks', []):
+                    if assignee and _task_assignee(task) != assignee:
+                        continue
+                    if status and task.get('status') != status:
+                        continue
+                    if exclude_status and task.get('status') == exclude_status:
+                        continue
+                    if has_deadline and not task.get('deadline'):
+                        continue
+                    results.append({
+                        'client_id': client.id,
+                        'client_name': client.name,
+                        'project_id': project.get('id'),
+                        'project_title': project.get('title'),
+                        'task': task
+                    })
+        return results
+    finally:
+        db.close()
+
+@request_cached('data')
 def load_data():
     """Load clients data from database"""
     _ensure_clients_schema()
@@ -149,29 +414,9 @@ def load_data():
     try:
         clients = []
         db_clients = db.query(Client).all()
+        projects_map = _load_projects_map(db) if any(c.projects_normalized for c in db_clients) else {}
         for client in db_clients:
-            client_dict = {
-                'id': client.id,
-                'name': client.name,
-                'client_number': client.client_number,
-                'retainer': client.retainer or 0,
-                'retainer_payments': client.retainer_payments or {},
-                'extra_charges': client.extra_charges or [],
-                'projects': client.projects or [],
-                'assigned_user': client.assigned_user,
-                'files': client.files or [],
-                'contacts': client.contacts or [],
-                'logo_url': client.logo_url,
-                'active': client.active if client.active is not None else True,
-                'archived': client.archived if client.archived is not None else False,
-                'archived_at': client.archived_at,
-                'calculated_extra': client.calculated_extra or 0,
-                'calculated_retainer': client.calculated_retainer or 0,
-                'calculated_total': client.calculated_total or 0,
-                'calculated_open_charges': client.calculated_open_charges or 0,
-                'calculated_monthly_revenue': client.calculated_monthly_revenue or 0
-            }
-            clients.append(client_dict)
+            clients.append(_client_to_dict(client, projects_map))
         
         # Ensure client numbers are assigned (if any are missing)
         needs_update = False
@@ -209,88 +454,413 @@ def load_data():
     finally:
         db.close()
 
+@request_cached('client_summaries')
+def load_client_summaries():
+    """Light client list for list endpoints and name lookups:
+    id, name, client_number, assigned_user, archived - no JSONB payloads"""
+    db = get_db()
+    try:
+        rows = db.query(
+            Client.id, Client.name, Client.client_number, Client.assigned_user, Client.archived
+        ).all()
+        return [
+            {
+                'id': client_id,
+                'name': name,
+                'client_number': client_number,
+                'assigned_user': assigned_user,
+                'archived': archived if archived is not None else False
+            }
+            for client_id, name, client_number, assigned_user, archived in rows
+        ]
+    finally:
+        db.close()
+
+# {version, index} - the user -> clients access index, rebuilt only when the
+# clients table changes (count + max(updated_at), like the users cache)
+_client_access_cache = {'version': None, 'index': None}
+
+def _clients_version(db):
+    """Cheap version stamp for the clients table"""
+    row = db.execute(text("SELECT count(*), max(updated_at) FROM clients")).first()
+    return (row[0], row[1]) if row else (0, None)
+
+@request_cached('client_access_index')
+def load_client_access_index():
+    """{'all': client ids, 'by_user': {user_id lower-cased: client ids}} - see client_access"""
+    db = get_db()
+    try:
+        version = _clients_version(db)
+        if _client_access_cache['index'] is None or _client_access_cache['version'] != version:
+            rows = db.query(Client.id, Client.assigned_user).all()
+            _client_access_cache['index'] = build_client_access_index(
+                {'id': client_id, 'assigned_user': assigned_user} for client_id, assigned_user in rows
+            )
+            _client_access_cache['version'] = version
+        return _client_access_cache['index']
+    finally:
+        db.close()
+
+def load_client(client_id):
+    """Load a SINGLE client by id (primary-key lookup). Returns None if missing.
+    Use this in single-client routes instead of load_data() + scan."""
+    if not client_id:
+        return None
+    clients = load_clients_by_ids([client_id])
+    return clients[0] if clients else None
+
+def load_clients_by_ids(client_ids):
+    """Load only the given clients (single IN query). Order follows client_ids;
+    missing ids are skipped."""
+    ids = [cid for cid in dict.fromkeys(client_ids or []) if cid]
+    if not ids:
+        return []
+    # Identity map: clients already loaded/saved in this request are reused
+    by_id = {}
+    missing = []
+    for cid in ids:
+        found, cached = cached_client(__name__, cid)
+        if not found:
+            missing.append(cid)
+        elif cached is not None:
+            by_id[cid] = cached
+    if missing:
+        _ensure_clients_schema()
+        db = get_db()
+        try:
+            db_clients = db.query(Client).filter(Client.id.in_(missing)).all()
+            normalized_ids = [c.id for c in db_clients if c.projects_normalized]
+            projects_map = _load_projects_map(db, normalized_ids) if normalized_ids else {}
+            for c in db_clients:
+                by_id[c.id] = _client_to_dict(c, projects_map)
+        finally:
+            db.close()
+        for cid in missing:
+            remember_client(__name__, cid, by_id.get(cid))
+    return [by_id[cid] for cid in ids if cid in by_id]
+
+# Defaults applied by _client_to_dict, for partial client rows
+_CLIENT_DEFAULTS = {
+    'retainer': 0, 'active': True, 'archived': False,
+    'calculated_extra': 0, 'calculated_retainer': 0, 'calculated_total': 0,
+    'calculated_open_charges': 0, 'calculated_monthly_revenue': 0,
+}
+
+def _project_summaries(db, client_id):
+    """Projects of a normalized client without tasks, with task counts from SQL"""
+    open_task = and_(
+        func.coalesce(Task.status, '') != 'הושלם',
+        func.coalesce(Task.data['done'].astext, 'false') != 'true'
+    )
+    counts = {
+        project_id: (total, open_count)
+        for project_id, total, open_count in db.query(
+            Task.project_id, func.count(Task.id), func.count(Task.id).filter(open_task)
+        ).filter(Task.client_id == client_id).group_by(Task.project_id).all()
+    }
+    summaries = []
+    for project in db.query(Project).filter(Project.client_id == client_id).order_by(Project.position).all():
+        project_dict = dict(project.data or {})
+        project_dict['id'] = project.id
+        total, open_count = counts.get(project.id, (0, 0))
+        summaries.append(project_summary(project_dict, total, open_count))
+    return summaries
+
+def load_client_view(client_id, view):
+    """Load only what a ClientView needs (see backend/utils/client_view):
+    the requested columns, and for projects.summary on a normalized client the
+    projects table plus task counts - no task JSON. None if missing."""
+    if not client_id:
+        return None
+    # A client already loaded/saved in this request is complete - shape it
+    found, cached = cached_client(__name__, client_id)
+    if found and cached is not None:
+        return cached
+    _ensure_clients_schema()
+    keys = [k for k in view.keys() if k not in ('id', 'projects') and hasattr(Client, k)]
+    db = get_db()
+    try:
+        row = db.query(
+            Client.id, Client.projects_normalized, *[getattr(Client, k) for k in keys]
+        ).filter(Client.id == client_id).first()
+        if row is None:
+            return None
+        client = dict(zip(['id', 'projects_normalized'] + keys, row))
+        mode = view.sections.get('projects')
+        if mode and client['projects_normalized']:
+            if mode == 'summary':
+                client['projects'] = _project_summaries(db, client_id)
+            else:
+                client['projects'] = _load_projects_map(db, [client_id]).get(client_id, [])
+        elif mode:
+            client['projects'] = db.query(Client.projects).filter(Client.id == client_id).scalar() or []
+    finally:
+        db.close()
+    client.pop('projects_normalized')
+    for key, default in _CLIENT_DEFAULTS.items():
+        if key in client and client[key] is None:
+            client[key] = default
+    return client
+
+# JSONB columns of clients - compared by value against the loaded row, so a
+# small change (e.g. toggling `active`) doesn't rewrite every large blob
+_CLIENT_JSON_COLUMNS = ('retainer_payments', 'extra_charges', 'projects', 'assigned_user', 'files', 'contacts')
+
+# Counters for monitoring how much client data this process writes
+_client_write_stats = {'saves': 0, 'columns_written': 0, 'bytes_written': 0, 'last_save_bytes': 0}
+
+
+def _column_bytes(column, value):
+    """Approximate size of a column value as sent to the database"""
+    if value is None:
+        return 0
+    if column in _CLIENT_JSON_COLUMNS:
+        return len(json.dumps(value, ensure_ascii=False, default=str).encode('utf-8'))
+    return len(str(value).encode('utf-8'))
+
+
+def _record_client_write(columns_written, bytes_written):
+    _client_write_stats['saves'] += 1
+    _client_write_stats['columns_written'] += columns_written
+    _client_write_stats['bytes_written'] += bytes_written
+    _client_write_stats['last_save_bytes'] = bytes_written
+
+
+def get_client_write_stats():
+    """Client save counters for this process (saves, columns and bytes written)"""
+    return dict(_client_write_stats)
+
+
+def _client_columns(client_data, client=None):
+    """Column values for a client row (client: the existing row, for defaults)"""
+    return {
+        'name': client_data.get('name', client.name if client else ''),
+        'client_number': client_data.get('client_number'),
+        'retainer': client_data.get('retainer', 0),
+        'retainer_payments': client_data.get('retainer_payments', (client.retainer_payments or {}) if client else {}),
+        'extra_charges': client_data.get('extra_charges', []),
+        'assigned_user': client_data.get('assigned_user'),
+        'files': client_data.get('files', []),
+        'contacts': client_data.get('contacts', []),
+        'logo_url': client_data.get('logo_url'),
+        'active': client_data.get('active', True),
+        'archived': client_data.get('archived', False),
+        'archived_at': client_data.get('archived_at'),
+        'calculated_extra': client_data.get('calculated_extra', 0),
+        'calculated_retainer': client_data.get('calculated_retainer', 0),
+        'calculated_total': client_data.get('calculated_total', 0),
+        'calculated_open_charges': client_data.get('calculated_open_charges', 0),
+        'calculated_monthly_revenue': client_data.get('calculated_monthly_revenue', 0),
+    }
+
+
 def _upsert_client(db, client_data):
     """Find-or-create a single client row and apply all fields. Shared by
-    save_data (bulk) and save_client (single, fast path)."""
+    save_data (bulk) and save_client (single, fast path).
+    Only columns whose value changed are written. Returns (columns, bytes) written."""
     client_id = client_data.get('id')
     if not client_id:
-        return
+        return 0, 0
     client = db.query(Client).filter(Client.id == client_id).first()
     if client:
-        client.name = client_data.get('name', client.name)
-        client.client_number = client_data.get('client_number')
-        client.retainer = client_data.get('retainer', 0)
-        client.retainer_payments = client_data.get('retainer_payments', client.retainer_payments or {})
-        client.extra_charges = client_data.get('extra_charges', [])
-        client.projects = client_data.get('projects', [])
-        client.assigned_user = client_data.get('assigned_user')
-        client.files = client_data.get('files', [])
-        client.contacts = client_data.get('contacts', [])
-        client.logo_url = client_data.get('logo_url')
-        client.active = client_data.get('active', True)
-        client.archived = client_data.get('archived', False)
-        client.archived_at = client_data.get('archived_at')
-        client.calculated_extra = client_data.get('calculated_extra', 0)
-        client.calculated_retainer = client_data.get('calculated_retainer', 0)
-        client.calculated_total = client_data.get('calculated_total', 0)
-        client.calculated_open_charges = client_data.get('calculated_open_charges', 0)
-        client.calculated_monthly_revenue = client_data.get('calculated_monthly_revenue', 0)
-        # Flag JSONB fields so SQLAlchemy detects in-place changes (e.g. deletions)
-        flag_modified(client, 'retainer_payments')
-        flag_modified(client, 'extra_charges')
-        flag_modified(client, 'projects')
-        flag_modified(client, 'assigned_user')
-        flag_modified(client, 'files')
-        flag_modified(client, 'contacts')
-    else:
-        client = Client(
-            id=client_id,
-            name=client_data.get('name', ''),
-            client_number=client_data.get('client_number'),
-            retainer=client_data.get('retainer', 0),
-            retainer_payments=client_data.get('retainer_payments', {}),
-            extra_charges=client_data.get('extra_charges', []),
-            projects=client_data.get('projects', []),
-            assigned_user=client_data.get('assigned_user'),
-            files=client_data.get('files', []),
-            contacts=client_data.get('contacts', []),
-            logo_url=client_data.get('logo_url'),
-            active=client_data.get('active', True),
-            archived=client_data.get('archived', False),
-            archived_at=client_data.get('archived_at'),
-            calculated_extra=client_data.get('calculated_extra', 0),
-            calculated_retainer=client_data.get('calculated_retainer', 0),
-            calculated_total=client_data.get('calculated_total', 0),
-            calculated_open_charges=client_data.get('calculated_open_charges', 0),
-            calculated_monthly_revenue=client_data.get('calculated_monthly_revenue', 0)
-        )
-        db.add(client)
+        columns = _client_columns(client_data, client)
+        if client.projects_normalized:
+            _sync_client_projects(db, client_id, client_data.get('projects', []))
+        else:
+            columns['projects'] = client_data.get('projects', [])
 
+        columns_written = bytes_written = 0
+        for column, value in columns.items():
+            # Deep compare against the row as loaded - unchanged columns stay out of the UPDATE
+            if getattr(client, column) == value:
+                continue
+            setattr(client, column, value)
+            if column in _CLIENT_JSON_COLUMNS:
+                # Flag JSONB fields so SQLAlchemy detects in-place changes (e.g. deletions)
+                flag_modified(client, column)
+            columns_written += 1
+            bytes_written += _column_bytes(column, value)
+        return columns_written, bytes_written
+
+    # לקוח חדש נשמר ישר בטבלאות projects/tasks. save_data / save_client קוראים
+    # ל-_ensure_clients_schema לפני כן - False רק אם בדיקת הסכמה נכשלה
+    normalized = _schema_checked
+    columns = _client_columns(client_data)
+    columns['projects'] = [] if normalized else client_data.get('projects', [])
+    db.add(Client(id=client_id, projects_normalized=normalized, **columns))
+    if normalized:
+        _sync_client_projects(db, client_id, client_data.get('projects', []))
+    return len(columns), sum(_column_bytes(c, v) for c, v in columns.items())
 
+
+@write_through('data', invalidates=('client_summaries', 'client_access_index'))
 def save_data(data):
     """Save ALL clients data to database (bulk). Prefer save_client() when only
     one client changed - it is dramatically faster."""
+    # Before opening the session - _upsert_client stores new clients
+    # normalized only once the schema is ready
+    _ensure_clients_schema()
     db = get_db()
     try:
+        columns_written = bytes_written = 0
         for client_data in data:
-            _upsert_client(db, client_data)
+            columns, nbytes = _upsert_client(db, client_data)
+            columns_written += columns
+            bytes_written += nbytes
         db.commit()
+        _record_client_write(columns_written, bytes_written)
     finally:
         db.close()
 
 
+@write_through_client
 def save_client(client_data):
     """Fast path: persist a SINGLE client only. Avoids rewriting every client
     row (and their large JSONB blobs) on each small change like adding a task."""
     if not client_data or not client_data.get('id'):
         return
+    _ensure_clients_schema()
     db = get_db()
     try:
-        _upsert_client(db, client_data)
+        columns_written, bytes_written = _upsert_client(db, client_data)
         db.commit()
+        _record_client_write(columns_written, bytes_written)
     finally:
         db.close()
 
+# Task columns of the tasks table that mirror fields of the task data
+_TASK_COLUMNS = ('status', 'deadline')
+
+# Patch one task inside clients.projects (clients that are not normalized yet):
+# locate the task's array positions, then jsonb_set only that element
+_PATCH_LEGACY_TASK_SQL = text("""
+    WITH target AS (
+        SELECT (p.ord - 1)::int AS p_idx, (t.ord - 1)::int AS t_idx
+        FROM clients c,
+             jsonb_array_elements(c.projects) WITH ORDINALITY AS p(project, ord),
+             jsonb_array_elements(p.project -> 'tasks') WITH ORDINALITY AS t(task, ord)
+        WHERE c.id = :client_id
+          AND p.project ->> 'id' = :project_id
+          AND t.task ->> 'id' = :task_id
+        LIMIT 1
+    )
+    UPDATE clients c
+    SET projects = jsonb_set(
+            c.projects,
+            ARRAY[target.p_idx::text, 'tasks', target.t_idx::text],
+            ((c.projects -> target.p_idx -> 'tasks' -> target.t_idx) || CAST(:changes AS jsonb))
+                - CAST(:removed AS text[])
+        ),
+        updated_at = now()
+    FROM target
+    WHERE c.id = :client_id
+    RETURNING c.projects -> target.p_idx -> 'tasks' -> target.t_idx,
+              c.projects -> target.p_idx ->> 'title'
+""")
+
+
+@task_patch
+def patch_task(client_id, project_id, task_id, changes, removed=()):
+    """Write only the changed fields of one task: a row update of the tasks
+    table (normalized clients) or jsonb_set on the task's element of
+    clients.projects - the rest of the client is not read or rewritten.
+    changes: {field: new value}; removed: fields to delete from the task."""
+    _ensure_clients_schema()
+    db = get_db()
+    try:
+        client = db.query(
+            Client.name, Client.archived, Client.assigned_user, Client.projects_normalized
+        ).filter(Client.id == client_id).first()
+        if client is None:
+            return None
+        removed = list(removed)
+        if client.projects_normalized:
+            data = func.coalesce(Task.data, cast({}, JSONB)).op('||')(cast(changes, JSONB))
+            for key in removed:
+                data = data.op('-')(cast(key, Text))
+            values = {'data': data}
+            for column in _TASK_COLUMNS:
+                if column in changes or column in removed:
+                    values[column] = changes.get(column)
+            row = db.execute(
+                update(Task)
+                .where(Task.id == task_id, Task.client_id == client_id, Task.project_id == project_id)
+                .values(**values)
+                .returning(Task.data)
+            ).first()
+            if row is None:
+                db.rollback()
+                return None
+            task = row[0] or {}
+            if {'assignee', 'assigned_user'} & (set(changes) | set(removed)):
+                db.execute(update(Task).where(Task.id == task_id).values(assignee=_task_assignee(task)))
+            project_title = db.query(Project.title).filter(Project.id == project_id).scalar()
+        else:
+            row = db.execute(_PATCH_LEGACY_TASK_SQL, {
+                'client_id': client_id, 'project_id': project_id, 'task_id': task_id,
+                'changes': json.dumps(changes, ensure_ascii=False, default=str),
+                'removed': removed,
+            }).first()
+            if row is None:
+                db.rollback()
+                return None
+            task, project_title = row[0] or {}, row[1]
+        db.commit()
+        _record_client_write(1, _column_bytes('projects', changes))
+        return (
+            {'id': client_id, 'name': client.name, 'assigned_user': client.assigned_user,
+             'archived': client.archived if client.archived is not None else False},
+            {'id': project_id, 'title': project_title},
+            task,
+        )
+    finally:
+        db.close()
+
+# ============ Bulk upsert for id/data tables ============
+
+UPSERT_CHUNK_SIZE = 500
+
+def _bulk_upsert(model, items, id_getter=None, columns=None):
+    """INSERT ... ON CONFLICT (id) DO UPDATE for a list of items, in chunks,
+    inside a single transaction. Rows whose data did not change are left
+    alone by Postgres (IS DISTINCT FROM) - no rewrite, no updated_at bump.
+    columns(item) -> {column: value} fills extra columns copied from the data.
+    Returns the number of rows sent."""
+    table = model.__table__
+    id_getter = id_getter or (lambda item: item.get('id'))
+
+    rows = {}
+    for item in items:
+        item_id = id_getter(item)
+        if item_id:
+            rows[item_id] = item  # Last one wins - a statement can't update a row twice
+    if not rows:
+        return 0
+
+    now = datetime.utcnow()
+    values = [
+        dict(columns(item) if columns else {}, id=item_id, data=item, created_at=now, updated_at=now)
+        for item_id, item in rows.items()
+    ]
+    extra = [name for name in values[0] if name not in ('id', 'data', 'created_at', 'updated_at')]
+    db = get_db()
+    try:
+        for start in range(0, len(values), UPSERT_CHUNK_SIZE):
+            stmt = pg_insert(table).values(values[start:start + UPSERT_CHUNK_SIZE])
+            changed = [table.c[name].is_distinct_from(stmt.excluded[name]) for name in ['data'] + extra]
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.id],
+                set_=dict({name: stmt.excluded[name] for name in ['data'] + extra},
+                          updated_at=stmt.excluded.updated_at),
+                where=or_(*changed),
+            )
+            db.execute(stmt)
+        db.commit()
+    finally:
+        db.close()
+    return len(rows)
+
+@request_cached('suppliers')
 def load_suppliers():
     """Load suppliers from database"""
     db = get_db()
@@ -303,25 +873,17 @@ def load_suppliers():
     finally:
         db.close()
 
+@write_through('suppliers')
 def save_suppliers(suppliers):
     """Save suppliers to database"""
-    db = get_db()
-    try:
-        for supplier_data in suppliers:
-            supplier_id = supplier_data.get('id')
-            if not supplier_id:
-                continue
-            
-            supplier = db.query(Supplier).filter(Supplier.id == supplier_id).first()
-            if supplier:
-                supplier.data = supplier_data
-            else:
-                supplier = Supplier(id=supplier_id, data=supplier_data)
-                db.add(supplier)
-        db.commit()
-    finally:
-        db.close()
+    _bulk_upsert(Supplier, suppliers)
+
+@write_through_item('suppliers')
+def save_supplier(supplier_data):
+    """Save a single supplier to database"""
+    _bulk_upsert(Supplier, [supplier_data])
 
+@request_cached('quotes')
 def load_quotes():
     """Load quotes from database"""
     db = get_db()
@@ -334,25 +896,12 @@ def load_quotes():
     finally:
         db.close()
 
+@write_through('quotes')
 def save_quotes(quotes):
     """Save quotes to database"""
-    db = get_db()
-    try:
-        for quote_data in quotes:
-            quote_id = quote_data.get('id')
-            if not quote_id:
-                continue
-            
-            quote = db.query(Quote).filter(Quote.id == quote_id).first()
-            if quote:
-                quote.data = quote_data
-            else:
-                quote = Quote(id=quote_id, data=quote_data)
-                db.add(quote)
-        db.commit()
-    finally:
-        db.close()
+    _bulk_upsert(Quote, quotes)
 
+@request_cached('messages')
 def load_messages():
     """Load messages from database"""
     db = get_db()
@@ -365,25 +914,103 @@ def load_messages():
     finally:
         db.close()
 
+def _message_columns(message):
+    """The messages columns load_conversation_page filters and sorts on"""
+    return {
+        'from_user': message.get('from_user'),
+        'to_user': message.get('to_user'),
+        'created_ts': created_timestamp(message),
+    }
+
+@write_through('messages')
 def save_messages(messages):
     """Save messages to database"""
+    _ensure_clients_schema()
+    _bulk_upsert(Message, messages, columns=_message_columns)
+
+@write_through_item('messages')
+def save_message(message_data):
+    """Save a single message to database"""
+    _ensure_clients_schema()
+    _bulk_upsert(Message, [message_data], columns=_message_columns)
+
+def backfill_message_columns():
+    """Fill from_user / to_user / created_ts of messages saved before the
+    columns existed (rows already filled are left alone). Returns the number
+    of messages checked."""
+    _ensure_clients_schema()
+    return _bulk_upsert(Message, load_messages.uncached(), columns=_message_columns)
+
+# ============ Keyset pages (see backend/utils/pagination) ============
+# WHERE key > :after ORDER BY key LIMIT :limit + 1 - the extra row only tells
+# whether there is a next page. limit=None returns everything.
+
+def _id_page(model, limit, after=None):
+    """Page of an (id, data) table ordered by id"""
     db = get_db()
     try:
-        for message_data in messages:
-            message_id = message_data.get('id')
-            if not message_id:
-                continue
-            
-            message = db.query(Message).filter(Message.id == message_id).first()
-            if message:
-                message.data = message_data
-            else:
-                message = Message(id=message_id, data=message_data)
-                db.add(message)
-        db.commit()
+        query = db.query(model.id, model.data)
+        if after is not None:
+            query = query.filter(model.id > str(after[0]))
+        query = query.order_by(model.id)
+        if limit is not None:
+            query = query.limit(limit + 1)
+        rows = query.all()
+    finally:
+        db.close()
+    rows, next_key = split_page(rows, limit, lambda row: sort_key(row[0]))
+    return [data for _, data in rows], next_key
+
+def load_suppliers_page(limit, after=None):
+    """(suppliers, next_key) ordered by id"""
+    return _id_page(Supplier, limit, after)
+
+def load_quotes_page(limit, after=None):
+    """(quotes, next_key) ordered by id"""
+    return _id_page(Quote, limit, after)
+
+def load_archived_clients_page(limit, after=None):
+    """(archived clients, next_key) - newest archived_at first, then id"""
+    _ensure_clients_schema()
+    db = get_db()
+    try:
+        archived_at = func.coalesce(Client.archived_at, '')
+        query = db.query(Client).filter(Client.archived == True)  # noqa: E712 (= true can use the index)
+        if after is not None:
+            query = query.filter(tuple_(archived_at, Client.id) < tuple_(str(after[0]), str(after[-1])))
+        query = query.order_by(archived_at.desc(), Client.id.desc())
+        if limit is not None:
+            query = query.limit(limit + 1)
+        db_clients = query.all()
+        normalized_ids = [c.id for c in db_clients if c.projects_normalized]
+        projects_map = _load_projects_map(db, normalized_ids) if normalized_ids else {}
+        clients = [_client_to_dict(c, projects_map) for c in db_clients]
     finally:
         db.close()
+    return split_page(clients, limit, lambda c: sort_key(c.get('archived_at'), c.get('id')))
 
+def load_conversation_page(user_a, user_b, limit, after=None):
+    """(messages between two users, next_key) - newest first (created_ts, id)"""
+    _ensure_clients_schema()
+    db = get_db()
+    try:
+        created = Message.created_ts
+        query = db.query(Message.id, Message.data, created).filter(or_(
+            and_(Message.from_user == user_a, Message.to_user == user_b),
+            and_(Message.from_user == user_b, Message.to_user == user_a)
+        ))
+        if after is not None:
+            query = query.filter(tuple_(created, Message.id) < tuple_(str(after[0]), str(after[-1])))
+        query = query.order_by(created.desc(), Message.id.desc())
+        if limit is not None:
+            query = query.limit(limit + 1)
+        rows = query.all()
+    finally:
+        db.close()
+    rows, next_key = split_page(rows, limit, lambda row: sort_key(row[2], row[0]))
+    return [data for _, data, _ in rows], next_key
+
+@request_cached('events')
 def load_events():
     """Load events from database"""
     db = get_db()
@@ -396,25 +1023,17 @@ def load_events():
     finally:
         db.close()
 
+@write_through('events')
 def save_events(events):
     """Save events to database"""
-    db = get_db()
-    try:
-        for event_data in events:
-            event_id = event_data.get('id')
-            if not event_id:
-                continue
-            
-            event = db.query(Event).filter(Event.id == event_id).first()
-            if event:
-                event.data = event_data
-            else:
-                event = Event(id=event_id, data=event_data)
-                db.add(event)
-        db.commit()
-    finally:
-        db.close()
+    _bulk_upsert(Event, events)
+
+@write_through_item('events')
+def save_event(event_data):
+    """Save a single event to database"""
+    _bulk_upsert(Event, [event_data])
 
+@request_cached('equipment_bank')
 def load_equipment_bank():
     """Load equipment from database"""
     db = get_db()
@@ -439,6 +1058,7 @@ def load_equipment_bank():
     finally:
         db.close()
 
+@write_through('equipment_bank')
 def save_equipment_bank(equipment):
     """Save equipment to database"""
     db = get_db()
@@ -453,6 +1073,7 @@ def save_equipment_bank(equipment):
     finally:
         db.close()
 
+@request_cached('checklist_templates')
 def load_checklist_templates():
     """Load checklist templates from database"""
     db = get_db()
@@ -475,6 +1096,7 @@ def load_checklist_templates():
     finally:
         db.close()
 
+@write_through('checklist_templates')
 def save_checklist_templates(templates):
     """Save checklist templates to database"""
     db = get_db()
@@ -490,6 +1112,7 @@ def save_checklist_templates(templates):
     finally:
         db.close()
 
+@request_cached('forms')
 def load_forms():
     """Load forms from database"""
     db = get_db()
@@ -502,24 +1125,10 @@ def load_forms():
     finally:
         db.close()
 
+@write_through('forms')
 def save_forms(forms):
     """Save forms to database"""
-    db = get_db()
-    try:
-        for form_data in forms:
-            form_id = form_data.get('id') or form_data.get('token')
-            if not form_id:
-                continue
-            
-            form = db.query(Form).filter(Form.id == form_id).first()
-            if form:
-                form.data = form_data
-            else:
-                form = Form(id=form_id, data=form_data)
-                db.add(form)
-        db.commit()
-    finally:
-        db.close()
+    _bulk_upsert(Form, forms, id_getter=lambda form: form.get('id') or form.get('token'))
 
 # ============ Time Tracking Functions ============
 
@@ -537,6 +1146,47 @@ def _parse_datetime(dt_str):
             continue
     return None
 
+def _time_entry_to_dict(entry):
+    return {
+        'id': entry.id,
+        'user_id': entry.user_id,
+        'client_id': entry.client_id,
+        'project_id': entry.project_id,
+        'task_id': entry.task_id,
+        'start_time': entry.start_time.isoformat() if entry.start_time else None,
+        'end_time': entry.end_time.isoformat() if entry.end_time else None,
+        'duration_hours': float(entry.duration_hours) if entry.duration_hours else 0,
+        'note': entry.note or '',
+        'date': entry.date,
+        'manual_entry': entry.manual_entry or False
+    }
+
+def _time_entry_columns(entry_data):
+    """Column values for a TimeTrackingEntry row from an entry dict"""
+    return {
+        'user_id': entry_data.get('user_id'),
+        'client_id': entry_data.get('client_id'),
+        'project_id': entry_data.get('project_id'),
+        'task_id': entry_data.get('task_id'),
+        'start_time': _parse_datetime(entry_data.get('start_time')),
+        'end_time': _parse_datetime(entry_data.get('end_time')),
+        'duration_hours': str(entry_data.get('duration_hours', 0)),
+        'note': entry_data.get('note', ''),
+        'date': entry_data.get('date'),
+        'manual_entry': entry_data.get('manual_entry', False)
+    }
+
+def _active_session_to_dict(session):
+    return {
+        'id': session.session_id,
+        'user_id': session.user_id,
+        'client_id': session.client_id,
+        'project_id': session.project_id,
+        'task_id': session.task_id,
+        'start_time': session.start_time.isoformat() if session.start_time else None
+    }
+
+@request_cached('time_tracking')
 def load_time_tracking():
     """Load time tracking data from database"""
     db = get_db()
@@ -546,37 +1196,18 @@ def load_time_tracking():
         # Load entries
         db_entries = db.query(TimeTrackingEntry).all()
         for entry in db_entries:
-            entry_dict = {
-                'id': entry.id,
-                'user_id': entry.user_id,
-                'client_id': entry.client_id,
-                'project_id': entry.project_id,
-                'task_id': entry.task_id,
-                'start_time': entry.start_time.isoformat() if entry.start_time else None,
-                'end_time': entry.end_time.isoformat() if entry.end_time else None,
-                'duration_hours': float(entry.duration_hours) if entry.duration_hours else 0,
-                'note': entry.note or '',
-                'date': entry.date,
-                'manual_entry': entry.manual_entry or False
-            }
-            result['entries'].append(entry_dict)
+            result['entries'].append(_time_entry_to_dict(entry))
         
         # Load active sessions
         db_sessions = db.query(TimeTrackingActiveSession).all()
         for session in db_sessions:
-            result['active_sessions'][session.user_id] = {
-                'id': session.session_id,
-                'user_id': session.user_id,
-                'client_id': session.client_id,
-                'project_id': session.project_id,
-                'task_id': session.task_id,
-                'start_time': session.start_time.isoformat() if session.start_time else None
-            }
+            result['active_sessions'][session.user_id] = _active_session_to_dict(session)
         
         return result
     finally:
         db.close()
 
+@write_through('time_tracking')
 def save_time_tracking(data):
     """Save time tracking data to database"""
     db = get_db()
@@ -652,3 +1283,150 @@ def save_time_tracking(data):
     finally:
         db.close()
 
+def _next_month(month):
+    """'YYYY-MM' -> the following 'YYYY-MM'"""
+    year, mon = int(month[:4]), int(month[5:7])
+    return f"{year + mon // 12:04d}-{mon % 12 + 1:02d}"
+
+def query_time_entries(month=None, user_id=None, client_id=None, task_id=None,
+                       order='desc', limit=None, after=None):
+    """Time tracking entries filtered in SQL.
+    month: 'YYYY-MM' (matched on the entry date); order: 'desc'/'asc' by
+    (start_time, id) (None = unordered); limit: max rows; after: keyset cursor
+    key (start_time, id) of the last entry already returned."""
+    db = get_db()
+    try:
+        query = db.query(TimeTrackingEntry)
+        if month:
+            try:
+                # Range on the ISO date string - can use the (date, user_id) index
+                query = query.filter(TimeTrackingEntry.date >= month,
+                                     TimeTrackingEntry.date < _next_month(month))
+            except ValueError:
+                query = query.filter(TimeTrackingEntry.date.like(f'{month}%'))
+        if user_id:
+            query = query.filter(TimeTrackingEntry.user_id == user_id)
+        if client_id:
+            query = query.filter(TimeTrackingEntry.client_id == client_id)
+        if task_id:
+            query = query.filter(TimeTrackingEntry.task_id == task_id)
+        if after is not None and order in ('desc', 'asc'):
+            position = tuple_(TimeTrackingEntry.start_time, TimeTrackingEntry.id)
+            after_key = tuple_(_parse_datetime(after[0]), str(after[-1]))
+            query = query.filter(position < after_key if order == 'desc' else position > after_key)
+        if order == 'desc':
+            query = query.order_by(TimeTrackingEntry.start_time.desc(), TimeTrackingEntry.id.desc())
+        elif order == 'asc':
+            query = query.order_by(TimeTrackingEntry.start_time.asc(), TimeTrackingEntry.id.asc())
+        if limit:
+            query = query.limit(limit)
+        return [_time_entry_to_dict(entry) for entry in query.all()]
+    finally:
+        db.close()
+
+# ============ Time Tracking - entry level operations ============
+# Each operation touches only its own rows (a stop is one INSERT + one DELETE)
+
+def get_time_entry(entry_id):
+    """Load a single time tracking entry (or None)"""
+    db = get_db()
+    try:
+        entry = db.query(TimeTrackingEntry).filter(TimeTrackingEntry.id == entry_id).first()
+        return _time_entry_to_dict(entry) if entry else None
+    finally:
+        db.close()
+
+def add_entry(entry_data):
+    """Insert a new time tracking entry"""
+    db = get_db()
+    try:
+        db.add(TimeTrackingEntry(id=entry_data['id'], **_time_entry_columns(entry_data)))
+        db.commit()
+    finally:
+        db.close()
+    invalidate(__name__, 'time_tracking')
+
+def update_entry(entry_data):
+    """Update an existing time tracking entry. Returns False if it does not exist."""
+    db = get_db()
+    try:
+        updated = db.query(TimeTrackingEntry).filter(
+            TimeTrackingEntry.id == entry_data['id']
+        ).update(_time_entry_columns(entry_data), synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    invalidate(__name__, 'time_tracking')
+    return updated > 0
+
+def delete_entry(entry_id):
+    """Delete a time tracking entry. Returns False if it does not exist."""
+    db = get_db()
+    try:
+        deleted = db.query(TimeTrackingEntry).filter(
+            TimeTrackingEntry.id == entry_id
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    invalidate(__name__, 'time_tracking')
+    return deleted > 0
+
+def load_active_sessions():
+    """Load the active sessions only: {user_id: session}"""
+    db = get_db()
+    try:
+        return {
+            session.user_id: _active_session_to_dict(session)
+            for session in db.query(TimeTrackingActiveSession).all()
+        }
+    finally:
+        db.close()
+
+def start_session(session_data):
+    """Create (or replace) the active session of session_data['user_id']"""
+    db = get_db()
+    try:
+        db.merge(TimeTrackingActiveSession(
+            user_id=session_data['user_id'],
+            session_id=session_data.get('id', ''),
+            client_id=session_data.get('client_id'),
+            project_id=session_data.get('project_id'),
+            task_id=session_data.get('task_id'),
+            start_time=_parse_datetime(session_data.get('start_time'))
+        ))
+        db.commit()
+    finally:
+        db.close()
+    invalidate(__name__, 'time_tracking')
+
+def stop_session(user_id, entry_data):
+    """Remove the user's active session and record entry_data, in one transaction.
+    Returns False (and writes nothing) if the user has no active session."""
+    db = get_db()
+    try:
+        deleted = db.query(TimeTrackingActiveSession).filter(
+            TimeTrackingActiveSession.user_id == user_id
+        ).delete(synchronize_session=False)
+        if not deleted:
+            db.rollback()
+            return False
+        db.add(TimeTrackingEntry(id=entry_data['id'], **_time_entry_columns(entry_data)))
+        db.commit()
+    finally:
+        db.close()
+    invalidate(__name__, 'time_tracking')
+    return True
+
+def cancel_session(user_id):
+    """Remove the user's active session without recording it"""
+    db = get_db()
+    try:
+        deleted = db.query(TimeTrackingActiveSession).filter(
+            TimeTrackingActiveSession.user_id == user_id
+        ).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    invalidate(__name__, 'time_tracking')
+    return deleted > 0
@@ -28,6 +28,7 @@ from database import (
     TimeTrackingEntry, TimeTrackingActiveSession
 )
 from datetime import datetime
+from backend.utils.pagination import created_timestamp
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -238,7 +239,12 @@ def migrate_messages():
             if existing:
                 continue
             
-            message = Message(id=message_id, data=message_data)
+            message = Message(
+                id=message_id, data=message_data,
+                from_user=message_data.get('from_user'),
+                to_user=message_data.get('to_user'),
+                created_ts=created_timestamp(message_data),
+            )
             db.add(message)
         
         db.commit()
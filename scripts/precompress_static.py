@@ -0,0 +1,69 @@
+"""
+Build step: write precompressed .gz (and .br, if the brotli package is installed)
+copies of the React build assets in static/dist, so they are served without
+compressing on every request (see backend/utils/compression.send_precompressed).
+Safe to run more than once - up-to-date copies are skipped.
+
+Usage:
+    python scripts/precompress_static.py [directory]
+"""
+import os
+import sys
+import gzip
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DIR = os.path.join(BASE_DIR, 'static', 'dist')
+EXTENSIONS = ('.js', '.css', '.html', '.svg', '.json', '.map', '.txt', '.xml', '.ico', '.wasm')
+MIN_SIZE = 1024
+
+
+def _write_if_smaller(path, original_size, data):
+    if len(data) >= original_size:
+        return False
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def precompress(directory):
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.endswith(EXTENSIONS):
+                continue
+            path = os.path.join(root, name)
+            st = os.stat(path)
+            if st.st_size < MIN_SIZE:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            variants = [('.gz', lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+            if brotli:
+                variants.append(('.br', lambda d: brotli.compress(d, quality=11)))
+            for suffix, compress in variants:
+                target = path + suffix
+                if os.path.exists(target) and os.stat(target).st_mtime >= st.st_mtime:
+                    continue
+                if _write_if_smaller(target, st.st_size, compress(data)):
+                    written += 1
+    return written
+
+
+def main():
+    directory = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DIR
+    if not os.path.isdir(directory):
+        print(f"ERROR: {directory} not found - run 'npm run build' first")
+        sys.exit(1)
+    written = precompress(directory)
+    print(f"✓ Wrote {written} precompressed file(s){'' if brotli else ' (gzip only - brotli not installed)'}")
+
+
+if __name__ == '__main__':
+    main()